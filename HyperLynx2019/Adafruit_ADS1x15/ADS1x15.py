@@ -312,6 +312,96 @@ class ADS1x15(object):
         return self._conversion_value(result[1], result[0])
 
 
+class ADS1x15Scanner(object):
+    """Round-robin acquisition of several single ended ADC channels without
+    sleeping.  Each channel gets a single shot conversion in turn; poll()
+    checks whether the conversion in progress is finished and, if it is,
+    stores the result and starts the next channel.  read() returns the
+    latest stored value of a channel at any time.
+
+    Conversion complete is taken from the ALERT/RDY pin when a ready()
+    function is given (e.g. lambda: GPIO.input(pin) == 0), otherwise from the
+    OS bit of the config register, which costs one 2 byte read per poll.
+    """
+
+    def __init__(self, adc, channels, gain=1, data_rate=None, ready=None):
+        for channel in channels:
+            assert 0 <= channel <= 3, 'Channel must be a value within 0-3!'
+        if gain not in ADS1x15_CONFIG_GAIN:
+            raise ValueError('Gain must be one of: 2/3, 1, 2, 4, 8, 16')
+        self._adc = adc
+        self._device = adc._device
+        self.channels = list(channels)
+        self.data_rate = data_rate if data_rate is not None else adc._data_rate_default()
+        self._ready = ready
+        # Precomputed config register bytes to start a conversion on each channel.
+        base = ADS1x15_CONFIG_OS_SINGLE | ADS1x15_CONFIG_GAIN[gain] | \
+            ADS1x15_CONFIG_MODE_SINGLE | adc._data_rate_config(self.data_rate)
+        if ready is not None:
+            # ALERT/RDY pin as conversion ready: comparator on, thresholds
+            # high register MSB = 1, low register MSB = 0.
+            base |= ADS1x15_CONFIG_COMP_QUE[1]
+        else:
+            base |= ADS1x15_CONFIG_COMP_QUE_DISABLE
+        self._config = []
+        for channel in self.channels:
+            config = base | ((channel + 0x04) & 0x07) << ADS1x15_CONFIG_MUX_OFFSET
+            self._config.append([(config >> 8) & 0xFF, config & 0xFF])
+        self._slot = {channel: i for i, channel in enumerate(self.channels)}
+        self.values = [0] * len(self.channels)      # latest conversion of each channel
+        self.times = [0.0] * len(self.channels)     # time.time() of each conversion
+        self.count = 0                              # total conversions stored
+        self._current = 0
+        self._started = False
+
+    def start(self):
+        """Start the first conversion."""
+        if self._ready is not None:
+            self._device.writeList(ADS1x15_POINTER_HIGH_THRESHOLD, [0x80, 0x00])
+            self._device.writeList(ADS1x15_POINTER_LOW_THRESHOLD, [0x00, 0x00])
+        self._current = 0
+        self._device.writeList(ADS1x15_POINTER_CONFIG, self._config[0])
+        self._started = True
+
+    def _done(self):
+        if self._ready is not None:
+            return self._ready()
+        # OS bit reads 1 when no conversion is in progress.
+        return self._device.readList(ADS1x15_POINTER_CONFIG, 1)[0] & 0x80 != 0
+
+    def poll(self):
+        """Store the conversion in progress if it is finished and start the
+        next channel.  Never waits.  Returns True if a new value was stored.
+        """
+        if not self._started:
+            self.start()
+            return False
+        if not self._done():
+            return False
+        result = self._device.readList(ADS1x15_POINTER_CONVERSION, 2)
+        i = self._current
+        self.values[i] = self._adc._conversion_value(result[1], result[0])
+        self.times[i] = time.time()
+        self.count += 1
+        self._current = i + 1 if i + 1 < len(self.channels) else 0
+        self._device.writeList(ADS1x15_POINTER_CONFIG, self._config[self._current])
+        return True
+
+    def prime(self):
+        """Convert every channel once, waiting for each.  For start up, so
+        read() has a real value for every channel before the first loop.
+        """
+        self.start()
+        for _ in self.channels:
+            time.sleep(1.0/self.data_rate+0.0001)
+            while not self.poll():
+                time.sleep(0.0001)
+
+    def read(self, channel):
+        """Latest conversion result of channel as a signed integer."""
+        return self.values[self._slot[channel]]
+
+
 class ADS1115(ADS1x15):
     """ADS1115 16-bit analog to digital converter instance."""
 
@@ -1 +1 @@
-from .ADS1x15 import ADS1115, ADS1015
+from .ADS1x15 import ADS1115, ADS1015, ADS1x15Scanner
@@ -172,6 +172,21 @@ class BME280(object):
         self.dig_H5 = h5 | (
         self._device.readU8(BME280_REGISTER_DIG_H5) >> 4 & 0x0F)
 
+        # Compensation constants, scaled once here instead of every sample
+        self._T1a = float(self.dig_T1) / 1024.0
+        self._T1b = float(self.dig_T1) / 8192.0
+        self._T2 = float(self.dig_T2)
+        self._T3 = float(self.dig_T3)
+        self._P1 = float(self.dig_P1)
+        self._P2 = float(self.dig_P2)
+        self._P3 = float(self.dig_P3) / 524288.0
+        self._P4 = float(self.dig_P4) * 65536.0
+        self._P5 = float(self.dig_P5) * 2.0
+        self._P6 = float(self.dig_P6) / 32768.0
+        self._P7 = float(self.dig_P7)
+        self._P8 = float(self.dig_P8) / 32768.0
+        self._P9 = float(self.dig_P9) / 2147483648.0
+
         '''
         print '0xE4 = {0:2x}'.format (self._device.readU8 (BME280_REGISTER_DIG_H4))
         print '0xE5 = {0:2x}'.format (self._device.readU8 (BME280_REGISTER_DIG_H5))
@@ -185,11 +200,10 @@ class BME280(object):
         '''
 
     def read_raw_temp(self):
-        """Waits for reading to become available on device."""
         """Does a single burst read of all data values from device."""
         """Returns the raw (uncompensated) temperature from the sensor."""
-        while (self._device.readU8(BME280_REGISTER_STATUS) & 0x08):    # Wait for conversion to complete (TODO : add timeout)
-            time.sleep(0.002)
+        """The sensor runs in normal mode and shadows its data registers, so the"""
+        """burst always gets the latest complete conversion without waiting."""
         self.BME280Data = self._device.readList(BME280_REGISTER_DATA, 8)
         raw = ((self.BME280Data[3] << 16) | (self.BME280Data[4] << 8) | self.BME280Data[5]) >> 4
         return raw
@@ -208,35 +222,52 @@ class BME280(object):
         raw = (self.BME280Data[6] << 8) | self.BME280Data[7]
         return raw
 
-    def read_temperature(self):
-        """Gets the compensated temperature in degrees celsius."""
+    def read_sample(self):
+        """One burst read, compensated with the cached calibration.  Returns
+        (temperature in degrees celsius, pressure in Pascals) of the same
+        conversion; humidity is left to read_humidity().
+        """
+        return self.decode_sample(self._device.readList(BME280_REGISTER_DATA, 8))
+
+    def decode_sample(self, data):
+        """(temperature, pressure) from the 8 data bytes starting at
+        BME280_REGISTER_DATA, however they were read.  Humidity from the same
+        bytes is then available from read_humidity()."""
+        self.BME280Data = data
+        UT = ((data[3] << 16) | (data[4] << 8) | data[5]) >> 4
+        temp = self._compensate_temperature(float(UT))
+        return temp, self._compensate_pressure(float(self.read_raw_pressure()))
+
+    def _compensate_temperature(self, UT):
         # float in Python is double precision
-        UT = float(self.read_raw_temp())
-        var1 = (UT / 16384.0 - float(self.dig_T1) / 1024.0) * float(self.dig_T2)
-        var2 = ((UT / 131072.0 - float(self.dig_T1) / 8192.0) * (
-        UT / 131072.0 - float(self.dig_T1) / 8192.0)) * float(self.dig_T3)
+        var1 = (UT / 16384.0 - self._T1a) * self._T2
+        var2 = (UT / 131072.0 - self._T1b) ** 2 * self._T3
         self.t_fine = int(var1 + var2)
-        temp = (var1 + var2) / 5120.0
-        return temp
+        return (var1 + var2) / 5120.0
 
-    def read_pressure(self):
-        """Gets the compensated pressure in Pascals."""
-        adc = float(self.read_raw_pressure())
+    def _compensate_pressure(self, adc):
         var1 = float(self.t_fine) / 2.0 - 64000.0
-        var2 = var1 * var1 * float(self.dig_P6) / 32768.0
-        var2 = var2 + var1 * float(self.dig_P5) * 2.0
-        var2 = var2 / 4.0 + float(self.dig_P4) * 65536.0
-        var1 = (
-               float(self.dig_P3) * var1 * var1 / 524288.0 + float(self.dig_P2) * var1) / 524288.0
-        var1 = (1.0 + var1 / 32768.0) * float(self.dig_P1)
+        var2 = var1 * var1 * self._P6
+        var2 = var2 + var1 * self._P5
+        var2 = var2 / 4.0 + self._P4
+        var1 = (self._P3 * var1 * var1 + self._P2 * var1) / 524288.0
+        var1 = (1.0 + var1 / 32768.0) * self._P1
         if var1 == 0:
             return 0
         p = 1048576.0 - adc
         p = ((p - var2 / 4096.0) * 6250.0) / var1
-        var1 = float(self.dig_P9) * p * p / 2147483648.0
-        var2 = p * float(self.dig_P8) / 32768.0
-        p = p + (var1 + var2 + float(self.dig_P7)) / 16.0
-        return p
+        var1 = self._P9 * p * p
+        var2 = p * self._P8
+        return p + (var1 + var2 + self._P7) / 16.0
+
+    def read_temperature(self):
+        """Gets the compensated temperature in degrees celsius."""
+        return self._compensate_temperature(float(self.read_raw_temp()))
+
+    def read_pressure(self):
+        """Gets the compensated pressure in Pascals."""
+        """Uses the data of the last read_raw_temp(), read_temperature() or read_sample()."""
+        return self._compensate_pressure(float(self.read_raw_pressure()))
 
     def read_humidity(self):
         adc = float(self.read_raw_humidity())
@@ -20,6 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 import binascii
+import collections
 import logging
 import struct
 import time
@@ -105,6 +106,10 @@ BNO055_GRAVITY_DATA_Z_MSB_ADDR       = 0X33
 # Temperature data register
 BNO055_TEMP_ADDR                     = 0X34
 
+# Burst read of the whole data block, accel X LSB through gravity Z MSB
+BNO055_BURST_START_ADDR              = BNO055_ACCEL_DATA_X_LSB_ADDR
+BNO055_BURST_LENGTH                  = BNO055_TEMP_ADDR - BNO055_ACCEL_DATA_X_LSB_ADDR
+
 # Status registers
 BNO055_CALIB_STAT_ADDR               = 0X35
 BNO055_SELFTEST_RESULT_ADDR          = 0X36
@@ -210,6 +215,16 @@ OPERATION_MODE_NDOF                  = 0X0C
 logger = logging.getLogger(__name__)
 
 
+# One read_motion() sample.  Units as the individual read_* functions.
+BNO055Motion = collections.namedtuple('BNO055Motion', [
+    'accelerometer', 'magnetometer', 'gyroscope', 'euler', 'quaternion',
+    'linear_acceleration', 'gravity'])
+
+# 22 little endian int16 values: accel, mag, gyro, euler (3 each), quaternion
+# (w, x, y, z), linear accel, gravity (3 each)
+_BURST = struct.Struct('<22h')
+
+
 class BNO055(object):
 
     def __init__(self, rst=None, address=BNO055_ADDRESS_A, i2c=None, gpio=None,
@@ -626,12 +641,29 @@ class BNO055(object):
         # Read count number of 16-bit signed values starting from the provided
         # address. Returns a tuple of the values that were read.
         data = self._read_bytes(address, count*2)
-        result = [0]*count
-        for i in range(count):
-            result[i] = ((data[i*2+1] << 8) | data[i*2]) & 0xFFFF
-            if result[i] > 32767:
-                result[i] -= 65536
-        return result
+        return struct.unpack('<{0}h'.format(count), bytes(data))
+
+    def read_motion(self):
+        """Return every motion vector (registers 0x08-0x33) from one burst read,
+        as a BNO055Motion of tuples.  All vectors come from the same sensor
+        sample, and it is a single I2C transaction instead of one per vector.
+        """
+        return self.decode_motion(self._read_bytes(BNO055_BURST_START_ADDR, BNO055_BURST_LENGTH))
+
+    def decode_motion(self, data):
+        """BNO055Motion from the BNO055_BURST_LENGTH bytes of registers
+        0x08-0x33, for bursts read some other way (e.g. SMBus.prepare_batch).
+        """
+        v = _BURST.unpack(bytes(data))
+        quat = 1.0 / (1<<14)
+        return BNO055Motion(
+            (v[0]/100.0, v[1]/100.0, v[2]/100.0),
+            (v[3]/16.0, v[4]/16.0, v[5]/16.0),
+            (v[6]/900.0, v[7]/900.0, v[8]/900.0),
+            (v[9]/16.0, v[10]/16.0, v[11]/16.0),
+            (v[13]*quat, v[14]*quat, v[15]*quat, v[12]*quat),
+            (v[16]/100.0, v[17]/100.0, v[18]/100.0),
+            (v[19]/100.0, v[20]/100.0, v[21]/100.0))
 
     def read_euler(self):
         """Return the current absolute orientation as a tuple of heading, roll,
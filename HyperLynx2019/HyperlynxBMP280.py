@@ -23,7 +23,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 import logging
-import time
 
 
 # BMP280 default address.
@@ -50,7 +49,9 @@ BMP280_REGISTER_DIG_P7 = 0x9A
 BMP280_REGISTER_DIG_P8 = 0x9C
 BMP280_REGISTER_DIG_P9 = 0x9E
 
+BMP280_REGISTER_STATUS = 0xF3
 BMP280_REGISTER_CONTROL = 0xF4
+BMP280_REGISTER_CONFIG = 0xF5
 #Pressure measurments
 BMP280_REGISTER_PRESSUREDATA_MSB = 0xF7
 BMP280_REGISTER_PRESSUREDATA_LSB = 0xF8
@@ -61,12 +62,24 @@ BMP280_REGISTER_TEMPDATA_LSB = 0xFB
 BMP280_REGISTER_TEMPDATA_XLSB = 0xFC
 
 # Commands
+# osrs_t = 001, osrs_p = 111, mode = 11 (normal).  Adding mode << 6 raises osrs_t.
 BMP280_READCMD = 0x3F
 
+# Standby time between normal mode conversions (config register t_sb)
+BMP280_STANDBY_0p5       = 0
+BMP280_STANDBY_62p5      = 1
+BMP280_STANDBY_125       = 2
+BMP280_STANDBY_250       = 3
+BMP280_STANDBY_500       = 4
+BMP280_STANDBY_1000      = 5
+BMP280_STANDBY_2000      = 6
+BMP280_STANDBY_4000      = 7
+
 
 
 class BMP280(object):
-    def __init__(self, mode=BMP280_STANDARD, address=BMP280_I2CADDR, i2c=None, **kwargs):
+    def __init__(self, mode=BMP280_STANDARD, address=BMP280_I2CADDR, i2c=None,
+                 standby=BMP280_STANDBY_0p5, **kwargs):
         self._logger = logging.getLogger('BMP280')
         # Check that mode is valid.
         if mode not in [BMP280_ULTRALOWPOWER, BMP280_STANDARD, BMP280_HIGHRES, BMP280_ULTRAHIGHRES]:
@@ -77,9 +90,15 @@ class BMP280(object):
             import Adafruit_GPIO.I2C as I2C
             i2c = I2C
         self._device = i2c.get_i2c_device(address, **kwargs)
+        if standby not in range(8):
+            raise ValueError('Unexpected standby value {0}.'.format(standby))
+        self._standby = standby
         # Load calibration values.
         self._load_calibration()
         self._tfine = 0
+        # Free running conversions: every read just fetches the latest result.
+        self._device.write8(BMP280_REGISTER_CONFIG, standby << 5)
+        self._device.write8(BMP280_REGISTER_CONTROL, BMP280_READCMD + (self._mode << 6))
     #reading two bytes of data from each address as signed or unsigned, based on the Bosch docs
     def _load_calibration(self):
         self.cal_REGISTER_DIG_T1 = self._device.readU16LE(BMP280_REGISTER_DIG_T1)   # UINT16
@@ -123,59 +142,44 @@ class BMP280(object):
         self.cal_REGISTER_DIG_P9 = 6000 
     #reading raw data from registers, and combining into one raw measurment
     def read_raw_temp(self):
-            """Reads the raw (uncompensated) temperature from the sensor."""
-            self._device.write8(BMP280_REGISTER_CONTROL, BMP280_READCMD + (self._mode << 6))
-            if self._mode == BMP280_ULTRALOWPOWER:
-                    time.sleep(0.005)
-            elif self._mode == BMP280_HIGHRES:
-                    time.sleep(0.014)
-            elif self._mode == BMP280_ULTRAHIGHRES:
-                    time.sleep(0.026)
-            else:
-                    time.sleep(0.008)
-            msb = self._device.readU8(BMP280_REGISTER_TEMPDATA_MSB)
-            lsb = self._device.readU8(BMP280_REGISTER_TEMPDATA_LSB)
-            xlsb = self._device.readU8(BMP280_REGISTER_TEMPDATA_XLSB)
-            raw = ((msb << 8 | lsb) << 8 | xlsb) >> 4
-            self._logger.debug('Raw temperature 0x{0:04X} ({1})'.format(raw & 0xFFFF, raw))
-            return raw
+        """Reads the raw (uncompensated) temperature from the sensor."""
+        data = self._device.readList(BMP280_REGISTER_TEMPDATA_MSB, 3)
+        raw = ((data[0] << 8 | data[1]) << 8 | data[2]) >> 4
+        self._logger.debug('Raw temperature 0x{0:04X} ({1})'.format(raw & 0xFFFF, raw))
+        return raw
     #reading raw data from registers, and combining into one raw measurment
     def read_raw_pressure(self):
-            """Reads the raw (uncompensated) pressure level from the sensor."""
-            self._device.write8(BMP280_REGISTER_CONTROL, BMP280_READCMD + (self._mode << 6))
-            if self._mode == BMP280_ULTRALOWPOWER:
-                    time.sleep(0.005)
-            elif self._mode == BMP280_HIGHRES:
-                    time.sleep(0.014)
-            elif self._mode == BMP280_ULTRAHIGHRES:
-                    time.sleep(0.026)
-            else:
-                    time.sleep(0.008)
-            msb = self._device.readU8(BMP280_REGISTER_PRESSUREDATA_MSB)
-            lsb = self._device.readU8(BMP280_REGISTER_PRESSUREDATA_LSB)
-            xlsb = self._device.readU8(BMP280_REGISTER_PRESSUREDATA_XLSB)
-            raw = ((msb << 8 | lsb) << 8 | xlsb) >> 4
-            self._logger.debug('Raw pressure 0x{0:04X} ({1})'.format(raw & 0xFFFF, raw))
-            return raw
+        """Reads the raw (uncompensated) pressure level from the sensor."""
+        data = self._device.readList(BMP280_REGISTER_PRESSUREDATA_MSB, 3)
+        raw = ((data[0] << 8 | data[1]) << 8 | data[2]) >> 4
+        self._logger.debug('Raw pressure 0x{0:04X} ({1})'.format(raw & 0xFFFF, raw))
+        return raw
+
+    def read_sample(self):
+        """Reads pressure and temperature of the same conversion in one burst.
+        The sensor runs in normal mode, so there is no conversion to wait for;
+        the data registers always hold the latest complete result.
+        Returns (temperature in degrees celsius, pressure in PSI).
+        """
+        return self.decode_sample(self._device.readList(BMP280_REGISTER_PRESSUREDATA_MSB, 6))
+
+    def decode_sample(self, data):
+        """(temperature, pressure) from the 6 data bytes starting at
+        BMP280_REGISTER_PRESSUREDATA_MSB, however they were read."""
+        adc_P = ((data[0] << 8 | data[1]) << 8 | data[2]) >> 4
+        adc_T = ((data[3] << 8 | data[4]) << 8 | data[5]) >> 4
+        temp = self._compensate_temperature(adc_T)
+        return temp, self._compensate_pressure(adc_P)
+
     #applying calibration data to the raw reading
-    def read_temperature(self):
-        """Gets the compensated temperature in degrees celsius."""
-        adc_T = self.read_raw_temp()
+    def _compensate_temperature(self, adc_T):
         TMP_PART1 = (((adc_T>>3) - (self.cal_REGISTER_DIG_T1<<1)) * self.cal_REGISTER_DIG_T2) >> 11
         TMP_PART2 = (((((adc_T>>4) - (self.cal_REGISTER_DIG_T1)) * ((adc_T>>4) - (self.cal_REGISTER_DIG_T1))) >> 12) * (self.cal_REGISTER_DIG_T3)) >> 14
         TMP_FINE = TMP_PART1 + TMP_PART2
         self._tfine = TMP_FINE
-        temp = ((TMP_FINE*5+128)>>8)/100.0
-        self._logger.debug('Calibrated temperature {0} C'.format(temp))
-        return temp
-    #applying calibration data to the raw reading
-    def read_pressure(self):
-        """Gets the compensated pressure in Pascals."""
-        #for pressure calculation we need a temperature, checking if we have one, and reading data if not
-        if self._tfine == 0:
-            self.read_temperature()
-            
-        adc_P = self.read_raw_pressure()
+        return ((TMP_FINE*5+128)>>8)/100.0
+    #applying calibration data to the raw reading, uses _tfine from the temperature
+    def _compensate_pressure(self, adc_P):
         var1 = self._tfine - 128000
         var2 = var1 * var1 * self.cal_REGISTER_DIG_P6
         var2 = var2 + ((var1*self.cal_REGISTER_DIG_P5)<<17);
@@ -196,9 +200,19 @@ class BMP280(object):
         #CHANGE TO PSI
         return p / 6894.76
 
+    def read_temperature(self):
+        """Gets the compensated temperature in degrees celsius."""
+        temp = self._compensate_temperature(self.read_raw_temp())
+        self._logger.debug('Calibrated temperature {0} C'.format(temp))
+        return temp
+
+    def read_pressure(self):
+        """Gets the compensated pressure in PSI."""
+        return self.read_sample()[1]
+
     def read_altitude(self, sealevel_pa=101325.0):
         """Calculates the altitude in meters."""
-        pressure = float(self.read_pressure())
+        pressure = float(self.read_pressure()) * 6894.76
         altitude = 44330.0 * (1.0 - pow(pressure / sealevel_pa, (1.0/5.255)))
         self._logger.debug('Altitude {0} m'.format(altitude))
         return altitude
@@ -206,7 +220,7 @@ class BMP280(object):
     def read_sealevel_pressure(self, altitude_m=0.0):
         """Calculates the pressure at sealevel when given a known altitude in
         meters. Returns a value in Pascals."""
-        pressure = float(self.read_pressure())
+        pressure = float(self.read_pressure()) * 6894.76
         p0 = pressure / pow(1.0 - altitude_m/44330.0, 5.255)
         self._logger.debug('Sealevel pressure {0} Pa'.format(p0))
         return p0
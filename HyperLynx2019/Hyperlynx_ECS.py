@@ -76,19 +76,30 @@
 		X-----------
 """
 import smbus
-from time import sleep, clock
+from time import sleep, perf_counter
 from mlx90614 import MLX90614
-from Adafruit_BNO055 import BNO055
+from Adafruit_BNO055 import BNO055, BNO055_BURST_START_ADDR, BNO055_BURST_LENGTH
 import Adafruit_ADS1x15
-from HyperlynxBMP280 import BMP280
-from Adafruit_BME280 import BME280
+from HyperlynxBMP280 import BMP280, BMP280_REGISTER_PRESSUREDATA_MSB
+from Adafruit_BME280 import BME280, BME280_STANDBY_0p5, BME280_REGISTER_DATA
 import Lidar
-import RPi.GPIO
+try:
+	import RPi.GPIO
+except ImportError:
+	#Off the Pi, pass io (e.g. fake_i2c.FakeGPIO) to HyperlynxECS
+	RPi = None
 import os
 import math	#cos()
+from collections import deque
 
 class HyperlynxECS():
-	def __init__(self, bus_num=1):
+	"""HyperlynxECS()
+		-Parameters:	bus_num - I2C bus of the multiplexer
+						i2c - None for /dev/i2c-<bus_num>, or a simulated bus
+							  (fake_i2c.FakeI2CBus) for running without hardware
+						io - None for RPi.GPIO, or a stand in (fake_i2c.FakeGPIO)
+	"""
+	def __init__(self, bus_num=1, i2c=None, io=None):
 		#Default I2C Addresses for Each Sensor
 		self.MUX_ADDR = 0x70
 		self.IR_ADDR = 0x5B
@@ -101,7 +112,9 @@ class HyperlynxECS():
 		self.ADC_ADDR = 0x48
 		self.MICRO_ADDR = 0x5F
 		#Open I2C Bus
-		self.bus = smbus.SMBus(bus_num)
+		#	-Drivers are handed i2c too, None makes them open the real bus
+		self.i2c = i2c
+		self.bus = smbus.SMBus(bus_num) if i2c is None else i2c.SMBus(bus_num)
 		#Assign Sensor Locations to Multiplexer Channels
 		self.tcaNOSE = 0
 		self.tcaPVL = 1
@@ -113,6 +126,8 @@ class HyperlynxECS():
 		self.connectAttempt = 5
 		#Initialize Stripe Count to Zero
 		self.STRIPE_COUNT = 0
+		#Lidar Free Running Measurement Rate [Hz]
+		self.LID_RATE = 100
 		#Conversion Factors for Acceleration, Analog Sensors and ADC
 		self.METER2G = (3.28084/32.2)
 		self.PASC2PSI = (1 / 6894.757)
@@ -126,8 +141,10 @@ class HyperlynxECS():
 		self.AMP = 1
 		#Set ADC Gain for 4.096V Max
 		self.ADC_GAIN = 1
+		#ADC Samples per Second, Fastest for ADS1115 (Each Channel Gets a Third)
+		self.ADC_RATE = 860
 		#Initialize GPIO Control-Use BCM Pin Numbering-Disable Warnings for Pin Mode Overide
-		self.IO = RPi.GPIO
+		self.IO = RPi.GPIO if io is None else io
 		self.IO.setmode(self.IO.BCM)
 		self.IO.setwarnings(False)
 		#Assign DROK CMOS Signal Switches to Rpi IO Pin Numbers
@@ -143,6 +160,20 @@ class HyperlynxECS():
 		self.contactorPIN2 = 18
 		#Active Low Reset for IR Thermometer
 		self.MLXrstPIN = 19
+		#Actuator Outputs, Desired and Applied Level of Every Output Pin
+		#	-switch*() set the desired level, a pin is only written when it changes
+		#	-holdOutputs() collects changes until applyOutputs() writes them in one batch
+		#	-Every write is time stamped (perf_counter) in ACT_time and ACT_log for the pod log
+		self.ACT_names = {self.NOsolPIN: 'Vent_Sol', self.NCsol1PIN: 'Res1_Sol', self.NCsol2PIN: 'Res2_Sol',
+						  self.CoolPumpPIN: 'MC_Pump', self.greenPIN: 'Green_LED', self.contactorPIN1: 'Contactor1',
+						  self.contactorPIN2: 'Contactor2', self.MLXrstPIN: 'MLX_Reset'}
+		self.ACT_desired = {}
+		self.ACT_applied = {}
+		self.ACT_time = {}
+		self.ACT_log = deque(maxlen=1000)
+		self.ACT_hold = False
+		self.ACT_writes = 0
+		self.ACT_skipped = 0
 		#Active Low Reset Count (For Testing and Debugging)
 		self.MLXRST = 0
 		#Initialize Orientation Offset Angles for IMUs to Zero
@@ -150,6 +181,24 @@ class HyperlynxECS():
 		self.X2OFFSET = 0
 		self.Z1OFFSET = 0
 		self.Z2OFFSET = 0
+		#Last Burst Read of Each IMU and When It Was Read
+		#	-BNO055 Fusion Output Runs at 100Hz, Newer Reads Return the Same Sample
+		self.IMU_MAX_AGE = 0.005
+		self.IMU_data = {1: None, 2: None}
+		self.IMU_time = {1: 0, 2: 0}
+		#Last Burst Read of Tube BMP280 (0) and PV BME280s (1 = Right, 2 = Left)
+		self.ENV_MAX_AGE = 0.005
+		self.ENV_data = {0: None, 1: None, 2: None}
+		self.ENV_time = {0: 0, 1: 0, 2: 0}
+		#Batched Reads, One I2C_RDWR Transaction per Multiplexer Channel
+		#	-Built by prepareBatches() for channels with more than one sensor
+		#	-Fill the IMU, environment, Lidar and stripe count readings together
+		#	-A failed batch falls back to single sensor reads for BATCH_RETRY seconds
+		self.BATCH = {}
+		self.BATCH_MAX_AGE = 0.005
+		self.BATCH_RETRY = 1.0
+		self.BATCH_time = {}
+		self.BATCH_fail = {}
 		#Sensor Status Monitoring for NACK Recieved to Filter True Data
 		self.MLX_status = False
 		self.BNO1_status = False
@@ -162,16 +211,19 @@ class HyperlynxECS():
 		self.TCA_status = False
 		self.MICRO_status = False
 		#Establish Connection to I2C Multiplexer
-		try:
-			#Attempt to Connect to Multiplexer
-			self.bus.write_byte(self.MUX_ADDR, 0)
-			print("TCA I2C Multiplexer Ready")
-			self.TCA_status = True
-		except IOError:
-			#If Connection Fails Stop Module
-			print("Connection Error with TCA I2C Multiplexer")
-			while True:
-				pass
+		#	-Unsuccessful Connection => Wait and Retry
+		for x in range(0, self.connectAttempt):
+			try:
+				#Attempt to Connect to Multiplexer
+				self.bus.write_byte(self.MUX_ADDR, 0)
+				print("TCA I2C Multiplexer Ready")
+				self.TCA_status = True
+				break
+			except IOError:
+				sleep(0.5)
+		#If Connection Fails Stop Module, Every Sensor Is Behind the Multiplexer
+		if(not self.TCA_status):
+			raise IOError("Connection Error with TCA I2C Multiplexer")
 		#Close All Multiplexer Channels
 		self.closeAllBus()
 		
@@ -198,8 +250,9 @@ class HyperlynxECS():
 		#	-Create Object
 		#	-Test Write to Verify Connection
 		try:
-			self.Lidar = Lidar.Lidar_Lite()
+			self.Lidar = Lidar.Lidar_Lite(bus=self.bus)
 			self.bus.write_quick(self.LID_ADDR)
+			self.Lidar.startFreeRunning(self.LID_RATE)
 			#print("Lidar Ready")
 			self.LID_status = True
 		except IOError:
@@ -211,7 +264,7 @@ class HyperlynxECS():
 		#	-If Unsuccessful Connection => Wait and Retry
 		try:
 			for x in range(0, self.connectAttempt):
-				self.BMP = BMP280(address=self.BMP_ADDR)
+				self.BMP = BMP280(address=self.BMP_ADDR, i2c=self.i2c)
 				if(self.BMP.read_raw_temp()):
 					#print("BMP Ready")
 					self.BMP_status = True
@@ -252,7 +305,7 @@ class HyperlynxECS():
 		#	-If Unsuccessful Connection => Wait and Retry
 		try:
 			for x in range(0, self.connectAttempt):
-				self.BMEL = BME280(address=self.BME_ADDR2)
+				self.BMEL = BME280(standby=BME280_STANDBY_0p5, address=self.BME_ADDR2, i2c=self.i2c)
 				if(self.BMEL.read_raw_temp()):
 					#print("BME LPV Ready")
 					self.BME2_status = True
@@ -282,7 +335,7 @@ class HyperlynxECS():
 		#	-If Unsuccessful Connection => Wait and Retry
 		try:
 			for x in range(0, self.connectAttempt):
-				self.Therm = MLX90614(address=self.IR_ADDR)
+				self.Therm = MLX90614(address=self.IR_ADDR, bus=self.bus)
 				if(self.Therm.check_connect):
 					print("MLX90614 Ready")
 					self.MLX_status = True
@@ -294,8 +347,12 @@ class HyperlynxECS():
 			#return 0
 		# Attempt Connection to ADS1115
 		#	-Create Object
+		#	-Start Scanning Voltage, Current and Brake Pressure Channels
 		try:
-			self.ADC = Adafruit_ADS1x15.ADS1115(address=self.ADC_ADDR, busnum=1)
+			self.ADC = Adafruit_ADS1x15.ADS1115(address=self.ADC_ADDR, i2c=self.i2c, busnum=1)
+			self.ADC_scan = Adafruit_ADS1x15.ADS1x15Scanner(self.ADC,
+				[self.VOLT, self.AMP, self.PRESSURE], self.ADC_GAIN, self.ADC_RATE)
+			self.ADC_scan.prime()
 			print("ADC Ready")	
 			self.ADC_status = True
 		# Unsuccessful After Max Attempts
@@ -322,7 +379,7 @@ class HyperlynxECS():
 		#	-If Unsuccessful Connection => Wait and Retry
 		try:
 			for x in range(0, self.connectAttempt):
-				self.BMER = BME280(address=self.BME_ADDR1)
+				self.BMER = BME280(standby=BME280_STANDBY_0p5, address=self.BME_ADDR1, i2c=self.i2c)
 				if(self.BMER.read_raw_temp()):
 					print("BME RPV Ready")
 					self.BME1_status = True
@@ -339,7 +396,7 @@ class HyperlynxECS():
 		#	-If Unsuccessful Connection => Wait and Retry
 		try:
 			for x in range(0, self.connectAttempt):
-				self.IMU1 = BNO055(address=self.IMU_ADDR1)
+				self.IMU1 = BNO055(address=self.IMU_ADDR1, i2c=self.i2c)
 				if(self.IMU1.begin(mode=0x08)):
 					while(self.IMU1.get_calibration_status()[1] != 3):
 						pass
@@ -369,7 +426,7 @@ class HyperlynxECS():
 		#	-If Unsuccessful Connection => Wait and Retry
 		try:
 			for x in range(0, self.connectAttempt):
-				self.IMU2 = BNO055(address=self.IMU_ADDR2)
+				self.IMU2 = BNO055(address=self.IMU_ADDR2, i2c=self.i2c)
 				if(self.IMU2.begin(mode=0x08)):
 					while(self.IMU2.get_calibration_status()[1] != 3):
 						pass
@@ -392,8 +449,32 @@ class HyperlynxECS():
 			print("IMU2 Z offset angle set")
 		except IOError:
 			print("IMU2 Z offset angle not set")
+		self.prepareBatches()
 		return 1
 
+	"""prepareBatches()
+		-No parameters
+		-Prepares one I2C_RDWR transaction per multiplexer channel that reads
+		 every sensor on it, for the channels whose sensors all initialized
+			tcaPVR2:	IMU1, IMU2 motion burst, BME RPV data
+			tcaNOSE:	Lidar distance, BMP280 data, Arduino Micro stripe count
+	"""
+	def prepareBatches(self):
+		self.BATCH = {}
+		if(self.BNO1_status and self.BNO2_status and self.BME1_status):
+			self.BATCH[self.tcaPVR2] = self.bus.prepare_batch([
+				(self.IMU_ADDR1, BNO055_BURST_START_ADDR, BNO055_BURST_LENGTH),
+				(self.IMU_ADDR2, BNO055_BURST_START_ADDR, BNO055_BURST_LENGTH),
+				(self.BME_ADDR1, BME280_REGISTER_DATA, 8)])
+		if(self.LID_status and self.BMP_status):
+			self.BATCH[self.tcaNOSE] = self.bus.prepare_batch([
+				(self.LID_ADDR, self.Lidar.distReadReg1, 2),
+				(self.BMP_ADDR, BMP280_REGISTER_PRESSUREDATA_MSB, 6),
+				(self.MICRO_ADDR, None, 1)])
+		for bus in self.BATCH:
+			self.BATCH_time[bus] = 0
+			self.BATCH_fail[bus] = -self.BATCH_RETRY
+
 	"""closeAllBus()
 		-No parameters
 		-Closes all channels on Multiplexer
@@ -433,95 +514,145 @@ class HyperlynxECS():
 			data = 0
 			self.MLX_status = False
 		return data
-	"""getOrientation()
+	"""readBatch()
+		-Parameters:	bus_num - multiplexer channel
+		-Checks open bus, opens if necessary
+		-Reads every sensor on the channel in one I2C_RDWR transaction and
+		 updates their readings and status
+		-A batch younger than BATCH_MAX_AGE is reused
+		-Returns True if the channel's readings are fresh, False if the channel
+		 is not batched or the batch failed (caller reads its sensor alone)
+	"""
+	def readBatch(self, bus_num):
+		batch = self.BATCH.get(bus_num)
+		if(batch is None):
+			return False
+		now = perf_counter()
+		if(now - self.BATCH_time[bus_num] < self.BATCH_MAX_AGE):
+			return True
+		if(now - self.BATCH_fail[bus_num] < self.BATCH_RETRY):
+			return False
+		if(self.currentBus != bus_num):
+			try:
+				self.openBus(bus_num)
+				self.TCA_status = True
+			except IOError:
+				self.TCA_status = False
+				return False
+		try:
+			data = self.bus.execute(batch)
+		except IOError:
+			#One sensor NACKed, single reads find out which
+			self.BATCH_fail[bus_num] = now
+			return False
+		if(bus_num == self.tcaPVR2):
+			self.IMU_data[1] = self.IMU1.decode_motion(data[0])
+			self.IMU_data[2] = self.IMU2.decode_motion(data[1])
+			temp, pressure = self.BMER.decode_sample(data[2])
+			self.ENV_data[1] = (temp, pressure * self.PASC2PSI)
+			self.IMU_time[1] = self.IMU_time[2] = self.ENV_time[1] = now
+			self.BNO1_status = self.BNO2_status = self.BME1_status = True
+		else:
+			self.Lidar.decodeDistance(data[0])
+			self.ENV_data[0] = self.BMP.decode_sample(data[1])
+			self.ENV_time[0] = now
+			self.STRIPE_COUNT = data[2][0]
+			self.LID_status = self.BMP_status = self.MICRO_status = True
+		self.BATCH_time[bus_num] = now
+		return True
+
+	"""readIMU()
 		-Parameters:	imu_num - desired IMU (1 or 2)
 		-Checks open bus, opens if necessary
 		-Updates BNO055 and Multiplexer status
-		-Adjusts orientation reading according to offset angles
-		-Returns Tuple of x, y, and z orientation in degrees
+		-Reads all motion vectors in one burst, batched with the rest of
+		 tcaPVR2 by readBatch() or alone (BNO055.read_motion())
+		-A sample younger than IMU_MAX_AGE is reused, so getAcceleration() and
+		 getOrientation() in the same loop cost one I2C transaction per IMU
+		-Returns BNO055Motion record, None on failure
 	"""
-	def getOrientation(self, imu_num):
+	def readIMU(self, imu_num):
+		now = perf_counter()
+		if(now - self.IMU_time[imu_num] < self.IMU_MAX_AGE):
+			return self.IMU_data[imu_num]
+		if(self.readBatch(self.tcaPVR2)):
+			return self.IMU_data[imu_num]
 		if(self.currentBus != self.tcaPVR2):
 			try:
 				self.openBus(self.tcaPVR2)
 				self.TCA_status = True
 			except IOError:
 				self.TCA_status = False
-				return [0, 0, 0]
+				return None
+		imu = self.IMU1 if imu_num == 1 else self.IMU2
+		try:
+			data = imu.read_motion()
+			status = True
+		except IOError:
+			data = None
+			status = False
+		if(imu_num == 1):
+			self.BNO1_status = status
+		else:
+			self.BNO2_status = status
+		self.IMU_data[imu_num] = data
+		self.IMU_time[imu_num] = now if data is not None else 0
+		return data
+
+	"""getOrientation()
+		-Parameters:	imu_num - desired IMU (1 or 2)
+		-Reads IMU through readIMU()
+		-Adjusts orientation reading according to offset angles
+		-Returns Tuple of x, y, and z orientation in degrees
+	"""
+	def getOrientation(self, imu_num):
+		if(imu_num != 1 and imu_num != 2):
+			#print("Illegal Selection")
+			return 0
+		data = self.readIMU(imu_num)
+		if(data is None):
+			return [0, 0, 0]
+		data = data.euler
 		if(imu_num == 1):
-			try:
-				data = self.IMU1.read_euler()
-				self.BNO1_status = True
-			except IOError:
-				data = [0, 0, 0]
-				self.BNO1_status = False
 			y = data[0]
 			x = data[1] - self.X1OFFSET
 			z = data[2] - self.Z1OFFSET
-			return [x, y, z]
-		elif(imu_num == 2):
-			try:
-				data = self.IMU2.read_euler()
-				self.BNO2_status = True
-			except IOError:
-				data = [0, 0, 0]
-				self.BNO2_status = False
+		else:
 			y = data[0]
 			x = data[1] - self.X2OFFSET
 			z = data[2] - self.Z2OFFSET
-			return [x, y, z]
-		else:
-			#print("Illegal Selection")
-			return 0
+		return [x, y, z]
 
 	"""getAcceleration()
 		-Parameters:	imu_num - desired IMU (1 or 2)
-		-Checks open bus, opens if necessary
-		-Updates BNO055 and Multiplexer status
+		-Reads IMU through readIMU()
 		-Converts from ms^-2 to G's
 		-Returns Tuple of x, y, and z linear acceleration
 	"""
 	def getAcceleration(self, imu_num):
-		if(self.currentBus != self.tcaPVR2):
-			try:
-				self.openBus(self.tcaPVR2)
-				self.TCA_status = True
-			except IOError:
-				self.TCA_status = False
-				return (0, 0, 0)
-		if(imu_num == 1):
-			try:
-				data = self.IMU1.read_linear_acceleration()
-				z = data[0] * self.METER2G
-				x = data[1] * self.METER2G
-				y = data[2] * self.METER2G
-				self.BNO1_status = True
-			except IOError:
-				self.BNO1_status = False
-				return (0, 0, 0)
-			return (z, x, y)
-		elif(imu_num == 2):
-			try:
-				data = self.IMU2.read_linear_acceleration()
-				z = data[0] * self.METER2G
-				x = data[1] * self.METER2G
-				y = data[2] * self.METER2G
-				self.BNO2_status = True
-			except IOError:
-				self.BNO2_status = False
-				return (0, 0, 0)
-			return (z, x, y)
-		else:
+		if(imu_num != 1 and imu_num != 2):
 			#print("Illegal Selection")
 			return 0
+		data = self.readIMU(imu_num)
+		if(data is None):
+			return (0, 0, 0)
+		data = data.linear_acceleration
+		z = data[0] * self.METER2G
+		x = data[1] * self.METER2G
+		y = data[2] * self.METER2G
+		return (z, x, y)
 
 	"""getLidarDistance()
 		-No parameters
 		-Checks open bus, opens if necessary
 		-Updates Lidar and Multiplexer status
+		-Lidar runs free at LID_RATE, reads the latest measurement without waiting
+		-Batched with the rest of tcaNOSE by readBatch() when possible
 		-Returns distance in feet
 	"""
 	def getLidarDistance(self):
+		if(self.readBatch(self.tcaNOSE)):
+			return self.Lidar.distance * 0.0328084
 		if(self.currentBus != self.tcaNOSE):
 			try:
 				self.openBus(self.tcaNOSE)
@@ -530,20 +661,21 @@ class HyperlynxECS():
 				self.TCA_status = False
 				return 0
 		try:
-			data = self.Lidar.getDistance()
+			data = self.Lidar.readDistance()
 			self.LID_status = True
 		except IOError:
 			data = 0
 			self.LID_status = False
 		return data * 0.0328084
 
-	"""getTubePressure()
+	"""getLidarVelocity()
 		-No parameters
 		-Checks open bus, opens if necessary
-		-Updates BMP280 and Multiplexer status
-		-Returns pressure in PSI
+		-Updates Lidar and Multiplexer status
+		-Lidar's own change in distance between its last two measurements
+		-Returns closing speed in feet per second (negative = approaching)
 	"""
-	def getTubePressure(self):
+	def getLidarVelocity(self):
 		if(self.currentBus != self.tcaNOSE):
 			try:
 				self.openBus(self.tcaNOSE)
@@ -552,121 +684,123 @@ class HyperlynxECS():
 				self.TCA_status = False
 				return 0
 		try:
-			data = self.BMP.read_pressure()
-			self.BMP_status = True
+			data = self.Lidar.readVelocity()
+			self.LID_status = True
 		except IOError:
 			data = 0
-			self.BMP_status = False
-		return data
-	"""getTubeTemp()
-		-No parameters
+			self.LID_status = False
+		return data * self.Lidar.rate * 0.0328084
+
+	"""readEnvironment()
+		-Parameters:	sensor - 0 = tube BMP280, 1 = right PV BME280, 2 = left PV BME280
 		-Checks open bus, opens if necessary
-		-Updates BMP280 and Multiplexer status
-		-Returns temperature in degrees Celsius
+		-Updates BMP280/BME280 and Multiplexer status
+		-Sensors run in normal mode, one burst read returns the latest conversion
+		-BMP280 and BME RPV are batched with the rest of their channel by readBatch()
+		-A sample younger than ENV_MAX_AGE is reused, so the pressure and temperature
+		 getters in the same loop cost one I2C transaction per sensor
+		-Returns (temperature in degrees Celsius, pressure in PSI), None on failure
 	"""
-	def getTubeTemp(self):
-		if(self.currentBus != self.tcaNOSE):
+	def readEnvironment(self, sensor):
+		now = perf_counter()
+		if(now - self.ENV_time[sensor] < self.ENV_MAX_AGE):
+			return self.ENV_data[sensor]
+		if(sensor == 0):
+			bus = self.tcaNOSE
+		elif(sensor == 1):
+			bus = self.tcaPVR2
+		else:
+			bus = self.tcaPVL
+		if(self.readBatch(bus)):
+			return self.ENV_data[sensor]
+		if(self.currentBus != bus):
 			try:
-				self.openBus(self.tcaNOSE)
+				self.openBus(bus)
 				self.TCA_status = True
 			except IOError:
 				self.TCA_status = False
-				return 0
+				return None
 		try:
-			data = self.BMP.read_temperature()
-			self.BMP_status = True
+			if(sensor == 0):
+				data = self.BMP.read_sample()
+			elif(sensor == 1):
+				temp, pressure = self.BMER.read_sample()
+				data = (temp, pressure * self.PASC2PSI)
+			else:
+				temp, pressure = self.BMEL.read_sample()
+				data = (temp, pressure * self.PASC2PSI)
+			status = True
 		except IOError:
-			data = 0
-			self.BMP_status = False
+			data = None
+			status = False
+		if(sensor == 0):
+			self.BMP_status = status
+		elif(sensor == 1):
+			self.BME1_status = status
+		else:
+			self.BME2_status = status
+		self.ENV_data[sensor] = data
+		self.ENV_time[sensor] = now if data is not None else 0
 		return data
 
+	"""getTubePressure()
+		-No parameters
+		-Reads BMP280 through readEnvironment()
+		-Returns pressure in PSI
+	"""
+	def getTubePressure(self):
+		data = self.readEnvironment(0)
+		if(data is None):
+			return 0
+		return data[1]
+
+	"""getTubeTemp()
+		-No parameters
+		-Reads BMP280 through readEnvironment()
+		-Returns temperature in degrees Celsius
+	"""
+	def getTubeTemp(self):
+		data = self.readEnvironment(0)
+		if(data is None):
+			return 0
+		return data[0]
+
 	"""getBMEpressure()
 		-Parameters	vessel - desired PV (1 = Right, 2 = Left)
-		-Checks open bus, opens if necessary
-		-Updates BME280 and Multiplexer status
+		-Reads BME280 through readEnvironment()
 		-Returns pressure in PSI
 	"""
 	def getBMEpressure(self, vessel):
-		if(vessel == 1):
-			if(self.currentBus != self.tcaPVR2):
-				try:
-					self.openBus(self.tcaPVR2)
-					self.TCA_status = True
-				except IOError:
-					self.TCA_status = 0
-					return 0
-			try:
-				data = self.BMER.read_pressure()
-				self.BME1_status = True
-			except IOError:
-				data = 0
-				self.BME1_status = False
-			return data	* self.PASC2PSI
-		elif(vessel == 2):
-			if(self.currentBus != self.tcaPVL):
-				try:
-					self.openBus(self.tcaPVL)
-					self.TCA_status = True
-				except IOError:
-					self.TCA_status = False
-					return 0
-			try:
-				data = self.BMEL.read_pressure()
-				self.BME2_status = True
-			except IOError:
-				data = 0
-				self.BME2_status = False
-			return data * self.PASC2PSI
-		else:
+		if(vessel != 1 and vessel != 2):
 			print("Illegal vessel")
+			return None
+		data = self.readEnvironment(vessel)
+		if(data is None):
+			return 0
+		return data[1]
 
 	"""getBMEtemperature
 		-Parameters	vessel - desired PV (1 = Right, 2 = Left)
-		-Checks open bus, opens if necessary
-		-Updates BME280 and Multiplexer status
+		-Reads BME280 through readEnvironment()
 		-Returns temperature in degrees Celsius
 	"""
 	def getBMEtemperature(self, vessel):
-		if(vessel == 1):
-			if(self.currentBus != self.tcaPVR2):
-				try:
-					self.openBus(self.tcaPVR2)
-					self.TCA_status = True
-				except IOError:
-					self.TCA_status = False
-					return 0
-			try:
-				data = self.BMER.read_temperature()
-				self.BME1_status = True
-			except IOError:
-				data = 0
-				self.BME1_status = False
-			return data
-		elif(vessel == 2):
-			if(self.currentBus != self.tcaPVL):
-				try:
-					self.openBus(self.tcaPVL)
-					self.TCA_status = True
-				except IOError:
-					self.TCA_status = False
-					return 0
-			try:
-				data = self.BMEL.read_temperature()
-				self.BME2_status = True
-			except IOError:
-				self.BME2_status = False
-				return 0
-			return data
-		else:
+		if(vessel != 1 and vessel != 2):
 			#print("Illegal Selection")
 			return 0
-	"""getVoltageLevel()
-		-No parameters
+		data = self.readEnvironment(vessel)
+		if(data is None):
+			return 0
+		return data[0]
+
+	"""readADC()
+		-Parameters:	pin - ADC channel (VOLT, AMP or PRESSURE)
 		-Checks open bus, opens if necessary
 		-Updates ADC and Multiplexer status
-		-Returns LV battery voltage in Volts
+		-Collects a finished conversion and starts the next channel, never waits
+		-Returns latest raw conversion for the channel
 	"""
-	def getVoltageLevel(self):
+	def readADC(self, pin):
 		if(self.currentBus != self.tcaPVR):
 			try:
 				self.openBus(self.tcaPVR)
@@ -675,64 +809,51 @@ class HyperlynxECS():
 				self.TCA_status = False
 				return 0
 		try:
-			data = self.ADC.read_adc(self.VOLT, self.ADC_GAIN)
+			self.ADC_scan.poll()
+			data = self.ADC_scan.read(pin)
 			self.ADC_status = True
 		except IOError:
 			data = 0
 			self.ADC_status = False
+		return data
+
+	"""getVoltageLevel()
+		-No parameters
+		-Latest scanned conversion from readADC(), no conversion wait
+		-Returns LV battery voltage in Volts
+	"""
+	def getVoltageLevel(self):
+		data = self.readADC(self.VOLT)
 		return (data-4700) * self.ADC_CONVERT * self.vRatio
 
 	"""getCurrentLevel()#DOES NOT WORK YET, SOURCING NEW SENSOR	
 		-No parameters
-		-Checks open bus, opens if necessary
-		-Updates ADC and Multiplexer status
+		-Latest scanned conversion from readADC(), no conversion wait
 		-Returns current in Amps
 	"""
 	def getCurrentLevel(self):
-		if(self.currentBus != self.tcaPVR):
-			try:
-				self.openBus(self.tcaPVR)
-				self.TCA_status = True
-			except IOError:
-				self.TCA_status = False
-				return 0
-		try:
-			data = self.ADC.read_adc(self.AMP, self.ADC_GAIN)
-			self.ADC_status = True
-		except IOError:
-			data = 0
-			self.ADC_status = False
+		data = self.readADC(self.AMP)
 		return (data-4700) * self.ADC_CONVERT * self.iRatio
 
 	"""getBrakePressure()
 		-No parameters
-		-Checks open bus, opens if necessary
-		-Updates ADC and Multiplexer status
+		-Latest scanned conversion from readADC(), no conversion wait
 		-Returns brake pressure in PSI
 	"""
 	def getBrakePressure(self):
-		if(self.currentBus != self.tcaPVR):
-			try:
-				self.openBus(self.tcaPVR)
-				self.TCA_status = True
-			except IOError:
-				self.TCA_status = False
-				return 0
-		try:
-			data = self.ADC.read_adc(self.PRESSURE, self.ADC_GAIN)
-			self.ADC_status = True
-		except IOError:
-			data = 0
-			self.ADC_status = False
+		data = self.readADC(self.PRESSURE)
 		return (data-4700) * self.ADC_CONVERT * self.VOLT2PSI
 
 	"""getStripeCount()
 		-No parameters
 		-Checks open bus, opens if necessary
 		-Updates Arduino Micro and Multiplexer status
-		-Returns stripe count tally from SICK lasers
+		-Batched with the rest of tcaNOSE by readBatch() when possible
+		-Returns stripe count tally from SICK lasers (8 bit, wraps at 256)
 	"""
 	def getStripeCount(self):
+		if(self.readBatch(self.tcaNOSE)):
+			return self.STRIPE_COUNT
 		if(self.currentBus != self.tcaNOSE):
 			try:
 				self.openBus(self.tcaNOSE)
@@ -740,12 +861,12 @@ class HyperlynxECS():
 			except IOError:
 				self.TCA_status = False
 				return 0
-			try:
-				self.STRIPE_COUNT = self.bus.read_byte(self.MICRO_ADDR)
-				self.MICRO_status = True
-			except IOError:
-				self.MICRO_status = False
-			return self.STRIPE_COUNT
+		try:
+			self.STRIPE_COUNT = self.bus.read_byte(self.MICRO_ADDR)
+			self.MICRO_status = True
+		except IOError:
+			self.MICRO_status = False
+		return self.STRIPE_COUNT
 
 	"""initializeIO()
 		-No parameters
@@ -760,46 +881,90 @@ class HyperlynxECS():
 		self.IO.setup(self.NCsol2PIN, self.IO.OUT, initial=self.IO.LOW)	#SET NC SOLENOID RES 2 PIN AS OUTPUT, INITIALIZE LOW
 		self.IO.setup(self.CoolPumpPIN, self.IO.OUT, initial=self.IO.LOW)#SET COOLANT PUMP PIN TO OUTPUT, INITIALIZE LOW
 		self.IO.setup(self.MLXrstPIN, self.IO.OUT, initial=self.IO.HIGH)
+		#Setup Levels Are the First Applied State of Every Actuator
+		now = perf_counter()
+		for pin in self.ACT_names:
+			level = self.IO.HIGH if pin == self.MLXrstPIN else self.IO.LOW
+			self.ACT_desired[pin] = level
+			self.ACT_applied[pin] = level
+			self.ACT_time[pin] = now
+			self.ACT_log.append((now, pin, level))
+
+	"""setOutput()
+		-Parameters:	pin - output pin, level - desired level (0 = LOW, 1 = HIGH)
+		-Writes the pin only if the level differs from the one applied
+		-While outputs are held the write waits for applyOutputs()
+	"""
+	def setOutput(self, pin, level):
+		level = self.IO.HIGH if level else self.IO.LOW
+		self.ACT_desired[pin] = level
+		if(self.ACT_applied.get(pin) == level):
+			self.ACT_skipped = self.ACT_skipped + 1
+		elif(not self.ACT_hold):
+			self.writeOutputs({pin: level})
+
+	"""holdOutputs()
+		-No parameters
+		-Collects setOutput() changes until applyOutputs()
+	"""
+	def holdOutputs(self):
+		self.ACT_hold = True
+
+	"""applyOutputs()
+		-No parameters
+		-Writes every pin whose desired level differs from the applied one, in one batch
+		-Returns the number of pins written
+	"""
+	def applyOutputs(self):
+		self.ACT_hold = False
+		changed = {pin: level for pin, level in self.ACT_desired.items() if self.ACT_applied.get(pin) != level}
+		if(changed):
+			self.writeOutputs(changed)
+		return len(changed)
+
+	"""writeOutputs()
+		-Parameters:	pins - dict of pin to level
+		-Writes the pins, batched like GPIO.BaseGPIO.output_pins()
+			*RPi.GPIO takes lists of channels and levels in one call
+			*Other IO with output_pins() (Adafruit GPIO) uses it, else one output() per pin
+		-Time stamps every write in ACT_time and the ACT_log audit trail
+	"""
+	def writeOutputs(self, pins):
+		if(RPi is not None and self.IO is RPi.GPIO):
+			self.IO.output(list(pins), list(pins.values()))
+		elif(hasattr(self.IO, 'output_pins')):
+			self.IO.output_pins(pins)
+		else:
+			for pin, level in pins.items():
+				self.IO.output(pin, level)
+		now = perf_counter()
+		for pin, level in pins.items():
+			self.ACT_applied[pin] = level
+			self.ACT_time[pin] = now
+			self.ACT_log.append((now, pin, level))
+		self.ACT_writes = self.ACT_writes + len(pins)
 
 	"""switchGreenLED()
 		-Parameters:	status - desired level (0 = LOW, 1 = HIGH)
 		-Sets Green LED IO pin to desired level
 	"""
 	def switchGreenLED(self, status):
-		if(status == 0):
-			self.IO.output(self.greenPIN, self.IO.LOW)
-		else:
-			self.IO.output(self.greenPIN, self.IO.HIGH)
+		self.setOutput(self.greenPIN, status != 0)
 			
 	"""switchSolenoid()
 		-Parameters:	solenoid(1 = NC res 1, 2 = NC res 2, 3 = NO), status(0 = LOW, 1 = HIGH)
 		-Sets selected solenoid to desired IO level
 	"""
 	def switchSolenoid(self, solenoid, status):
-		if(solenoid == 1):
-			if(status == 0):
-				self.IO.output(self.NCsol1PIN, self.IO.LOW)
-			elif(status == 1):
-				self.IO.output(self.NCsol1PIN, self.IO.HIGH)
-		elif(solenoid == 2):
-			if(status == 0):
-				self.IO.output(self.NCsol2PIN, self.IO.LOW)
-			elif(status == 1):
-				self.IO.output(self.NCsol2PIN, self.IO.HIGH)
-		elif(solenoid == 3):
-			if(status == 0):
-				self.IO.output(self.NOsolPIN, self.IO.LOW)
-			elif(status == 1):
-				self.IO.output(self.NOsolPIN, self.IO.HIGH)
+		pin = {1: self.NCsol1PIN, 2: self.NCsol2PIN, 3: self.NOsolPIN}.get(solenoid)
+		if(pin is not None and (status == 0 or status == 1)):
+			self.setOutput(pin, status)
 	"""switchCoolantPump()
 		-Parameters:	status - desired IO level(0 = LOW, 1 = HIGH)
 		-Switches coolant pump on and off
 	"""
 	def switchCoolantPump(self, status):
-		if(status == 0):
-			self.IO.output(self.CoolPumpPIN, self.IO.LOW)
-		else:
-			self.IO.output(self.CoolPumpPIN, self.IO.HIGH)
+		self.setOutput(self.CoolPumpPIN, status != 0)
 
 	"""switchContactor()
 		-Parameters:	contactor(1 = Contactor 1; 2 = Contactor 2), status - desired level(0 = LOW; 1 = HIGH)
@@ -807,35 +972,31 @@ class HyperlynxECS():
 		-Red LED will light when both contactors set high
 	"""
 	def switchContactor(self, contactor, status):
-		if(contactor == 1):
-			if(status == 0):
-				self.IO.output(self.contactorPIN1, self.IO.LOW)
-			elif(status == 1):
-				self.IO.output(self.contactorPIN1, self.IO.HIGH)
-		elif(contactor == 2):
-			if(status == 0):
-				self.IO.output(self.contactorPIN2, self.IO.HIGH)
-			elif(status == 1):
-				self.IO.output(self.contactorPIN2, self.IO.HIGH)
+		pin = {1: self.contactorPIN1, 2: self.contactorPIN2}.get(contactor)
+		if(pin is not None and (status == 0 or status == 1)):
+			self.setOutput(pin, status)
 	"""MLX_RESET()
 		-No parameters
 		-Resets IR Thermometer with active low reset
 		-Pulls low for 10us then sets high again
 	"""
 	def MLX_RESET(self):
-		self.IO.output(self.MLXrstPIN, self.IO.LOW)
+		self.writeOutputs({self.MLXrstPIN: self.IO.LOW})
 		sleep(0.00001)
-		self.IO.output(self.MLXrstPIN, self.IO.HIGH)
+		self.writeOutputs({self.MLXrstPIN: self.IO.HIGH})
+		self.ACT_desired[self.MLXrstPIN] = self.IO.HIGH
 
 	"""statusCheck()
 		-No parameters
 		-Checks Status of all sensors
 		-Resets IR thermometer if necessary
 			*IR therm crashed I2C bus during testing, this fixes all resulting issues
+			*Multiplexer is on the main bus, it only fails to answer when the bus is held
+			 low (other sensors keep their last status while their channel can't open)
 	"""
 	def statusCheck(self):
 		data = self.MLX_status + self.BNO1_status + self.BNO2_status + self.BME1_status + self.BME2_status + self.BMP_status + self.LID_status + self.ADC_status + self.TCA_status + self.MICRO_status
-		if(data == 0):
+		if(data == 0 or not self.TCA_status):
 			self.MLX_RESET()
 			self.MLXRST = self.MLXRST + 1
 			self.TCA_status = True
@@ -846,7 +1007,7 @@ if __name__ == '__main__':
 	system.initializeIO()
 	if(system.initializeSensors()):
 		while True:
-			startTime = clock()
+			startTime = perf_counter()
 			distance = system.getLidarDistance()
 			tubepress = system.getTubePressure()
 			tubetemp = system.getTubeTemp()
@@ -864,7 +1025,7 @@ if __name__ == '__main__':
 			press1 = system.getBMEpressure(1)
 			stripes = system.getStripeCount()
 			stat = system.statusCheck()
-			endTime = clock() - startTime
+			endTime = perf_counter() - startTime
 			print(stat)
 			print(system.MLXRST)
 			print(endTime)
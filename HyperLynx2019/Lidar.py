@@ -1,12 +1,20 @@
 """
 https://github.com/Sanderi44/Lidar-Lite/blob/master/python/lidar_lite.py
+
+Two ways to use it without waiting on the sensor:
+  startFreeRunning()   the sensor measures continuously at the given rate;
+                       readDistance()/readVelocity() return the latest result
+  trigger() + poll()   one measurement at a time; poll() reads it once the
+                       status register busy bit clears and starts the next
+getDistance()/getVelocity() still take a complete measurement, but poll the
+busy bit instead of sleeping 20 ms per register access.
 """
 
 import smbus
 import time
 
 class Lidar_Lite():
-  def __init__(self):
+  def __init__(self, bus=None):
     self.address = 0x62
     self.distWriteReg = 0x00
     self.distWriteVal = 0x04
@@ -15,33 +23,73 @@ class Lidar_Lite():
     self.velWriteReg = 0x04
     self.velWriteVal = 0x08
     self.velReadReg = 0x09
-    self.bus = smbus.SMBus(1)
-    
+    self.statusReg = 0x01
+    self.busyBit = 0x01
+    self.loopCountReg = 0x11      # 0xff = measure continuously
+    self.measureDelayReg = 0x45   # delay between automatic measurements, 0x14 = 100Hz
+    self.useDelayBit = 0x20       # acquisition config bit: use measureDelayReg
+    self.timeout = 0.05           # [s] longest wait for one measurement
+    self.rate = 0                 # [Hz] free running rate, 0 when triggered
+    self.distance = 0             # [cm] last distance read
+    self.bus = bus if bus is not None else smbus.SMBus(1)
+
+  def startFreeRunning(self, rate=100):
+    """Measure continuously at about rate [Hz] (10 to 2000)"""
+    delay = min(max(int(round(2000.0 / rate)), 1), 0xff)
+    self.bus.write_byte_data(self.address, self.measureDelayReg, delay)
+    self.bus.write_byte_data(self.address, self.velWriteReg, self.velWriteVal | self.useDelayBit)
+    self.bus.write_byte_data(self.address, self.loopCountReg, 0xff)
+    self.bus.write_byte_data(self.address, self.distWriteReg, self.distWriteVal)
+    self.rate = 2000.0 / delay
+
+  def trigger(self):
+    """Start one measurement, returns immediately"""
+    self.bus.write_byte_data(self.address, self.distWriteReg, self.distWriteVal)
+
+  def isBusy(self):
+    return self.bus.read_byte_data(self.address, self.statusReg) & self.busyBit != 0
+
+  def readDistance(self):
+    """Latest distance [cm] in the result registers, no waiting"""
+    return self.decodeDistance(self.bus.read_i2c_block_data(self.address, self.distReadReg1, 2))
+
+  def decodeDistance(self, res):
+    """Distance [cm] from the two bytes at distReadReg1, however they were read"""
+    self.distance = res[0] << 8 | res[1]
+    return self.distance
 
-  def writeAndWait(self, register, value):
-    self.bus.write_byte_data(self.address, register, value);
-    time.sleep(0.02)
+  def readVelocity(self):
+    """Change in distance between the last two measurements [cm], no waiting"""
+    return self.signedInt(self.bus.read_byte_data(self.address, self.velReadReg))
 
-  def readAndWait(self, register):
-    res = self.bus.read_byte_data(self.address, register)
-    time.sleep(0.02)
-    return res
+  def poll(self):
+    """
+    Triggered mode: if the measurement in progress is done, read it and start
+    the next one.  Returns True when self.distance was updated.
+    """
+    if self.isBusy():
+      return False
+    self.readDistance()
+    self.trigger()
+    return True
 
-  def readDistAndWait(self, register):
-    res = self.bus.read_i2c_block_data(self.address, register, 2)
-    time.sleep(0.02)
-    return (res[0] << 8 | res[1])
+  def waitReady(self):
+    end = time.time() + self.timeout
+    while self.isBusy():
+      if time.time() > end:
+        raise IOError('Lidar measurement timed out')
 
   def getDistance(self):
-    self.writeAndWait(self.distWriteReg, self.distWriteVal)
-    dist = self.readDistAndWait(self.distReadReg1)
-    return dist
+    self.trigger()
+    self.waitReady()
+    return self.readDistance()
 
   def getVelocity(self):
-    self.writeAndWait(self.distWriteReg, self.distWriteVal)
-    self.writeAndWait(self.velWriteReg, self.velWriteVal)
-    vel = self.readAndWait(self.velReadReg)
-    return self.signedInt(vel)
+    # Velocity is the difference of two back to back measurements
+    self.bus.write_byte_data(self.address, self.velWriteReg, self.velWriteVal)
+    self.getDistance()
+    self.getDistance()
+    return self.readVelocity()
 
   def signedInt(self, value):
     if value > 127:
@@ -1,5 +1,5 @@
 from time import clock
-import pandas as pd
+import abort_table
 
 
 class Status:
@@ -99,17 +99,7 @@ class Status:
         self.log_rate = 10                      # Hz
 
     def load_abort_ranges(self, file):
-        df = pd.read_csv(file, sep='\t').set_index('Sensor')
-        df.columns = [col.strip() for col in df.columns]
-        df.rename(columns={'Fault (INIT TO ZERO)':'Fault'}, inplace=True)
-        values = ['Low', 'High', 'Trigger', 'Fault']
-        states = {
-            self.SafeToApproach: df.loc[df['1 - S2A'] == 1, values].to_dict('index'),
-            self.Launching: df.loc[df['3 - Launch'] == 1, values].to_dict('index'),
-            self.BrakingHigh:df.loc[df['5 - Brake1'] == 1, values].to_dict('index'),
-            self.Crawling: df.loc[df['6 - Crawling'] == 1, values].to_dict('index'),
-            self.BrakingLow:df.loc[df['7 - Brake2'] == 1, values].to_dict('index')}
-        self.abort_ranges.update(states)
+        self.abort_ranges.update(abort_table.load_abort_ranges(file))
 
     # debug
     sensor_data['Brake_Pressure'] = 178
@@ -56,15 +56,21 @@ Each main loop will have a separate timestamp
 from time import clock
 import socket, struct
 import numpy
-import datetime
-import os, psutil
 import pickle
 #from argparse import ArgumentParser
 #import smbus
 import Hyperlynx_ECS, flight_sim
-from network_transfer.libclient import BaseClient
+import abort_table
+import pod_ipc
+import state_estimator
+import stripe_map
+import filter_bank
+import host_health
+import sensor_registry
 from Client import send_server
+from network_transfer import command_link
 import timeouts
+import pod_fsm
 import can_bms
 
 
@@ -76,6 +82,9 @@ class Status():
     BrakingHigh = 5
     Crawling = 6
     BrakingLow = 7
+    # State names used for the per state poll rates in sensors_config.yaml
+    state_names = {'SafeToApproach': SafeToApproach, 'PreLaunch': PreLaunch, 'Launching': Launching,
+                   'BrakingHigh': BrakingHigh, 'Crawling': Crawling, 'BrakingLow': BrakingLow}
 
     # Init dictionaries
     abort_ranges = {}           # Dict of dicts (below)
@@ -129,10 +138,6 @@ class Status():
         self.IMU_bad_time = None
         self.V_bad_time = None
 
-        self.state_timeout = [0,0,0,0,0,0,0,0]
-        self.state_timeout_limits = timeouts.get()
-        self.filter_length = 10         # Moving average for sensor data filter
-
         # SPACEX CONFIG DATA
         self.spacex_state = 0
         self.spacex_team_id = 69
@@ -150,9 +155,21 @@ class Status():
         # DEBUG init for script:
         self.Quit = False
 
-        # Set filter on priority data:
-        self.filter_items = ['IMU1_X', 'IMU1_Y', 'IMU1_Z', 'IMU2_X', 'IMU2_Y',
-                             'IMU2_Z', 'LIDAR', 'Brake_Pressure']
+        # Every data channel is declared once in sensors_config.yaml (see sensor_registry.py)
+        self.registry = sensor_registry.SensorRegistry.from_yaml('sensors_config.yaml')
+        self.pollers = {}                   # {flight_sim: bound, state scheduled acquisition plan}, set in init()
+
+        # Raspberry Pi health (RPi_* channels), sampled at 1 Hz by its own thread
+        self.host = host_health.HostMonitor(period=1.0, loop_budget=0.01)
+
+        # Per channel sensor filters, from the registry's 'filter' keys
+        self.filter_bank = filter_bank.FilterBank(self.registry.filter_config())
+
+        # Kalman filter fusing IMU, motor RPM, LIDAR and stripes into D, V, A (see sensor_fusion())
+        self.estimator = state_estimator.PodKalman(wheel_circum=self.wheel_circum)
+        self.stripes = stripe_map.StripeLocalizer()     # Stripe map position fixes
+        self.D_bound = 0                    # [ft] bound on the error of true_data['D']
+        self.D_diff = 0                     # [ft] distance past the last matched stripe
 
         # init True values for Distance, Velocity, and Acceleration, with moving average queue, true value, and dev
         self.true_data = {'D': {'q': [], 'val': 0, 'std_dev': 0},
@@ -166,24 +183,31 @@ class Status():
 
         # INITIATE STATE TO S2A
         self.state = self.SafeToApproach
+        self.fsm = build_fsm()                  # states, transitions and timeouts (see run_state())
+        self.fsm.start(self, clock())
 
         # INITIATE LOG RATE INFO
-        self.log_lastwrite = clock()            # Saves last time of file write to control log rate
         self.log_rate = 10                      # Hz
+        self.log_seq = 0                        # Incremented to have the logger process start a new file
+
+        # GUI TELEMETRY CONFIG
+        self.gui_server_ip = 'localhost'
+        self.gui_server_port = 5050
+        self.telemetry_rate = 10                # [Hz] rate of GUI data sends
+
+        # GUI COMMAND UPLINK CONFIG (see rec_data())
+        self.cmd_port = 5055                    # the GUI connects to this port
+        self.cmd_link = None
+        self.cmd_traced = []                    # (seq, key) of GUI commands staged for do_commands()
+
+        # Shared memory state publisher for the logger/telemetry processes (see init_ipc())
+        self.ipc = None
 
     def create_log(self):
-        ### Create log file ###
-        date = datetime.datetime.today()
-        new_number = str(date.year) + str(date.month) + str(date.day) \
-                     + str(date.hour) + str(date.minute) + str(date.second)
-        self.file_name = 'log_' + new_number
-        file = open(os.path.join('logs/', self.file_name), 'a')
-        columns = ['Label', 'Value', 'Fault', 'Time']
-        with file:
-            file.write('\t'.join(map(lambda column_title: "\"" + column_title + "\"", columns)))
-            file.write("\n")
-        file.close()
-        print("Log file created: " + str(self.file_name))
+        ### Start a new log file ###
+        # The file itself is opened by the logger process (pod_ipc.run_logger)
+        # as soon as it sees the new log_seq in the shared state record.
+        self.log_seq += 1
     
     def data_dump(self):
         data_dict = {}
@@ -192,56 +216,41 @@ class Status():
         data_dict['spd'] = self.true_data['V']['val']
         data_dict['accl'] = self.true_data['A']['val']
         data_dict['IMU1_Z'] = self.sensor_filter['IMU1_Z']['val']
-        data_dict['IMU2_z'] = self.sensor_filter['IMU2_Z']['val']
+        data_dict['IMU2_Z'] = self.sensor_filter['IMU2_Z']['val']
         data_dict['thrtl'] = self.throttle
         data_dict['lidar'] = self.sensor_filter['LIDAR']['val']
         return data_dict
 
 
 def init():
-    # Create Abort Range and init sensor_data Dictionary from template file
-    abort_names = numpy.genfromtxt('abortranges.dat', skip_header=1, delimiter='\t', usecols=numpy.arange(0, 1),
-                                   dtype=str)
-    abort_vals = numpy.genfromtxt('abortranges.dat', skip_header=1, delimiter='\t', usecols=numpy.arange(1, 12))
-
-    # Assign abort conditions to each state
-    for i in range(0, len(abort_names)):
-        if not str(abort_names[i]) in PodStatus.sensor_data:
-            PodStatus.sensor_data[abort_names[i]] = 0
-        if not str(abort_names[i]) in PodStatus.sensor_filter:
-            PodStatus.sensor_filter[abort_names[i]] = {'q': [], 'val': 0, 'mean': 0, 'true': 0}
-
-        if abort_vals[i, 2] == 1:
-            PodStatus.abort_ranges[PodStatus.SafeToApproach][abort_names[i]] = {'Low': abort_vals[i, 0],
-                                                                      'High': abort_vals[i, 1],
-                                                                      'Trigger': abort_vals[i, 9],
-                                                                      'Fault': abort_vals[i, 10]
-                                                                      }
-        if abort_vals[i, 4] == 1:
-            PodStatus.abort_ranges[PodStatus.Launching][abort_names[i]] = {'Low': abort_vals[i, 0],
-                                                                 'High': abort_vals[i, 1],
-                                                                 'Trigger': abort_vals[i, 9],
-                                                                 'Fault': abort_vals[i, 10]
-                                                                 }
-            PodStatus.abort_ranges[PodStatus.PreLaunch] = PodStatus.abort_ranges[PodStatus.Launching]
-        if abort_vals[i, 5] == 1:
-            PodStatus.abort_ranges[PodStatus.BrakingHigh][abort_names[i]] = {'Low': abort_vals[i, 0],
-                                                                   'High': abort_vals[i, 1],
-                                                                   'Trigger': abort_vals[i, 9],
-                                                                   'Fault': abort_vals[i, 10]
-                                                                   }
-        if abort_vals[i, 7] == 1:
-            PodStatus.abort_ranges[PodStatus.Crawling][abort_names[i]] = {'Low': abort_vals[i, 0],
-                                                                'High': abort_vals[i, 1],
-                                                                'Trigger': abort_vals[i, 9],
-                                                                'Fault': abort_vals[i, 10]
-                                                                }
-        if abort_vals[i, 8] == 1:
-            PodStatus.abort_ranges[PodStatus.BrakingLow][abort_names[i]] = {'Low': abort_vals[i, 0],
-                                                                  'High': abort_vals[i, 1],
-                                                                  'Trigger': abort_vals[i, 9],
-                                                                  'Fault': abort_vals[i, 10]
-                                                                  }
+    # Init sensor_data from the sensor registry
+    for key in PodStatus.registry.sensor_channels():
+        PodStatus.sensor_data[key] = 0
+        PodStatus.sensor_filter[key] = {'q': [], 'val': 0, 'mean': 0, 'true': 0}
+    PodStatus.host.start()
+    getters = {'getHostHealth': PodStatus.host.snapshot}
+    PodStatus.pollers = {sim: PodStatus.registry.bind(PodStatus.sensor_poll, sim, PodStatus.state_names, getters)
+                         for sim in (False, True)}
+
+    # Abort ranges for each state from the template file (see abort_table.py)
+    abort_names = abort_table.load('abortranges.dat').names
+    for key in PodStatus.registry.check(abort_names):
+        print('Abort range for ' + str(key) + ' is not a channel in sensors_config.yaml')
+
+    for key in abort_names:
+        if not key in PodStatus.sensor_data:
+            PodStatus.sensor_data[key] = 0
+        if not key in PodStatus.sensor_filter:
+            PodStatus.sensor_filter[key] = {'q': [], 'val': 0, 'mean': 0, 'true': 0}
+    PodStatus.abort_ranges.update(abort_table.load_abort_ranges('abortranges.dat'))
+
+    if gui == '2':
+        PodStatus.cmd_link = command_link.CommandServer('', PodStatus.cmd_port)
+        PodStatus.cmd_link.start()
+
+    for key in PodStatus.filter_bank.chains:
+        if not key in PodStatus.sensor_filter:
+            PodStatus.sensor_filter[key] = {'q': [], 'val': 0, 'mean': 0, 'true': 0}
 
     PodStatus.cmd_int = {"Abort": 0,
                          "HV": 0,
@@ -289,78 +298,25 @@ def poll_sensors():
     PodStatus.poll_oldtime = PodStatus.poll_newtime
     PodStatus.poll_newtime = clock()
     PodStatus.poll_interval = PodStatus.poll_newtime-PodStatus.poll_oldtime
+    PodStatus.host.loop(PodStatus.poll_interval)
 
     ### CAN DATA ###
     # None Yet Added
 
 
-    ### I2C DATA ###
+    ### I2C AND RPI DATA ###
+    # Getters, mux order, poll rates per state and flight sim substitutions come from
+    # sensors_config.yaml.  Channels not due this cycle keep their last value.
+    PodStatus.pollers[PodStatus.flight_sim].poll(PodStatus.sensor_data, PodStatus.poll_newtime, PodStatus.state)
 
-    # If you want to run the flight sim:
     if PodStatus.flight_sim is True:
-
-        # PodStatus.sensor_data['Brake_Pressure'] = PodStatus.sensor_poll.getBrakePressure()
-        PodStatus.sensor_data['LVBatt_Temp'] = PodStatus.sensor_poll.getBatteryTemp()
-        PodStatus.sensor_data['LVBatt_Current'] = 4
-        PodStatus.sensor_data['LVBatt_Voltage'] = 12
-        PodStatus.sensor_data['PV_Left_Temp'] = PodStatus.sensor_poll.getBMEtemperature(2)
-        PodStatus.sensor_data['PV_Left_Pressure'] = PodStatus.sensor_poll.getBMEpressure(2)
-        PodStatus.sensor_data['PV_Right_Temp'] = PodStatus.sensor_poll.getBMEtemperature(1)
-        PodStatus.sensor_data['PV_Right_Pressure'] = PodStatus.sensor_poll.getBMEpressure(1)
-        PodStatus.sensor_data['Ambient_Pressure'] = PodStatus.sensor_poll.getTubePressure()
-        tempAccel1 = PodStatus.sensor_poll.getAcceleration(1)
-        PodStatus.sensor_data['IMU1_X'] = tempAccel1[1]
-        PodStatus.sensor_data['IMU1_Y'] = tempAccel1[2]
-        # PodStatus.sensor_data['IMU1_Z'] = tempAccel1[0]
-        tempAccel2 = PodStatus.sensor_poll.getAcceleration(2)
-        PodStatus.sensor_data['IMU2_X'] = tempAccel2[1]
-        PodStatus.sensor_data['IMU2_Y'] = tempAccel2[2]
-        # PodStatus.sensor_data['IMU2_Z'] = tempAccel2[0]
-        PodStatus.sensor_data['LIDAR'] = PodStatus.para_max_tube_length - PodStatus.true_data['D']['val']
-        if PodStatus.sensor_data['LIDAR'] > 150: PodStatus.sensor_data['LIDAR'] = 150
-
         flight_sim.sim(PodStatus)
 
-    else:
-        # Uncomment Brake Pressure for pulling in actual data when we have this set up
-        # PodStatus.sensor_data['Brake_Pressure'] = PodStatus.sensor_poll.getBrakePressure()
-        PodStatus.sensor_data['LVBatt_Temp'] = PodStatus.sensor_poll.getBatteryTemp()
-        PodStatus.sensor_data['LVBatt_Current'] = PodStatus.sensor_poll.getCurrentLevel()
-        PodStatus.sensor_data['LVBatt_Voltage'] = PodStatus.sensor_poll.getVoltageLevel()
-        PodStatus.sensor_data['PV_Left_Temp'] = PodStatus.sensor_poll.getBMEtemperature(2)
-        PodStatus.sensor_data['PV_Left_Pressure'] = PodStatus.sensor_poll.getBMEpressure(2)
-        PodStatus.sensor_data['PV_Right_Temp'] = PodStatus.sensor_poll.getBMEtemperature(1)
-        PodStatus.sensor_data['PV_Right_Pressure'] = PodStatus.sensor_poll.getBMEpressure(1)
-        PodStatus.sensor_data['Ambient_Pressure'] = PodStatus.sensor_poll.getTubePressure()
-        tempAccel1 = PodStatus.sensor_poll.getAcceleration(1)
-        PodStatus.sensor_data['IMU1_X'] = tempAccel1[1]
-        PodStatus.sensor_data['IMU1_Y'] = tempAccel1[2]
-        PodStatus.sensor_data['IMU1_Z'] = tempAccel1[0]
-        tempAccel2 = PodStatus.sensor_poll.getAcceleration(2)
-        PodStatus.sensor_data['IMU2_X'] = tempAccel2[1]
-        PodStatus.sensor_data['IMU2_Y'] = tempAccel2[2]
-        PodStatus.sensor_data['IMU2_Z'] = tempAccel2[0]
-        PodStatus.sensor_data['LIDAR'] = PodStatus.sensor_poll.getLidarDistance()
-
     if abs(PodStatus.sensor_data['IMU1_Z']) > 20:
         PodStatus.sensor_data['IMU1_Z'] = 0
     if abs(PodStatus.sensor_data['IMU2_Z']) > 20:
         PodStatus.sensor_data['IMU2_Z'] = 0
 
-    ### RPI DATA ###
-    rpi_data = psutil.disk_usage('/')
-    PodStatus.sensor_data['RPi_Disk_Space_Free'] = rpi_data.free / (1024 ** 2)
-    PodStatus.sensor_data['RPi_Disk_Space_Used'] = rpi_data.used / (1024 ** 2)
-    PodStatus.sensor_data['RPi_Proc_Load'] = round(psutil.cpu_percent(),1)
-    rpi_data2 = psutil.virtual_memory()
-    PodStatus.sensor_data['RPi_Mem_Load'] = rpi_data2.percent
-    PodStatus.sensor_data['RPi_Mem_Free'] = rpi_data2.free / 2 ** 20
-    PodStatus.sensor_data['RPi_Mem_Used'] = rpi_data2.used / 2 ** 20
-    # temp = os.popen("vcgencmd measure_temp").readline()
-    # temp = temp.replace("temp=",'')
-    # temp = temp.replace("'C",'')
-    # PodStatus.sensor_data['RPi_Temp'] = temp
-
     ### SPACEX DATA ###
 
     ### CONVERT DATA ###
@@ -374,191 +330,55 @@ def poll_sensors():
     PodStatus.Res1_Sol = PodStatus.cmd_int['Res1_Sol']
     PodStatus.Res2_Sol = PodStatus.cmd_int['Res2_Sol']
 
-    # Integrate distance
-    if PodStatus.state != 1:
-        PodStatus.true_data['D']['val'] += PodStatus.true_data['V']['val'] * PodStatus.poll_interval
-
     # Update MET
     if PodStatus.MET > 0:
         PodStatus.MET = clock()-PodStatus.MET_starttime
 
 
 def filter_data():
-    """ Filters sensor data based on moving average.
+    """ Runs each configured channel of sensor_data through its filter chain (filter_bank.py)
+    into sensor_filter[key]['val'].  Channels the poller skipped this cycle hold their value,
+    the others are filtered with the time since their own previous reading.
     """
-    ### Search all sensor_data points
-    for key in PodStatus.sensor_data:
-
-        ### Refine search to just priority items specified in PodStatus.init()
-        if key in PodStatus.filter_items:
-
-            # If queue is not full, fill queue
-            if len(PodStatus.sensor_filter[str(key)]['q']) < PodStatus.filter_length:
-                PodStatus.sensor_filter[str(key)]['q'] = numpy.append(PodStatus.sensor_filter[str(key)]['q'],
-                                                                      PodStatus.sensor_data[str(key)])
-            else:
-                PodStatus.sensor_filter[str(key)]['std_dev'] = 3*numpy.std(PodStatus.sensor_filter[str(key)]['q'])
-                PodStatus.sensor_filter[str(key)]['mean'] = numpy.mean(PodStatus.sensor_filter[str(key)]['q'])
-
-                # if new value is inside range of std_dev (hence valid), then add to q
-                if abs(PodStatus.sensor_data[str(key)]-PodStatus.sensor_filter[str(key)]['q'][(PodStatus.filter_length-1)]) <= \
-                        PodStatus.sensor_filter[str(key)]['std_dev']:
-
-                    # shift q values over
-                    for i in range(0, (len(PodStatus.sensor_filter[str(key)]['q'])-1)):
-                        PodStatus.sensor_filter[str(key)]['q'][i] = PodStatus.sensor_filter[str(key)]['q'][i+1]
-                    # add new value to end of queue
-                    PodStatus.sensor_filter[str(key)]['q'][(PodStatus.filter_length-1)] = PodStatus.sensor_data[str(key)]
-                    # set the filtered value to the mean of the new queue
-                else:
-                    print('Did not add ' + str(key) + ' to q: ' + str(PodStatus.sensor_data[str(key)]) + str(PodStatus.MET))
-                    print('Current std dev: ' + str(PodStatus.sensor_filter[str(key)]['std_dev']))
-            PodStatus.sensor_filter[str(key)]['val'] = numpy.mean(PodStatus.sensor_filter[str(key)]['q'])
+    poller = PodStatus.pollers[PodStatus.flight_sim]
+    PodStatus.filter_bank.apply(PodStatus.sensor_data, PodStatus.sensor_filter, PodStatus.poll_interval,
+                                poller.stale, poller.sample_dt)
 
 
 def sensor_fusion():
-    """ Combines various filtered sensor data to a common solution."""
-
-    ### BEGIN ACCELERATION FUSION
-    # If queue is not full, fill queue
-
-    PodStatus.true_data['A']['val'] = numpy.mean([PodStatus.sensor_filter['IMU1_Z']['val'],
-                                                  PodStatus.sensor_filter['IMU2_Z']['val']])
-
-    # good_IMUs = []  # reset good_IMUs to empty set
-    # if len(PodStatus.true_data['A']['q']) < PodStatus.filter_length:
-    #     # Add mean of IMU values to
-    #     print('Adding to Q')
-    #     PodStatus.true_data['A']['q'] = numpy.append(PodStatus.true_data['A']['q'],
-    #                                     numpy.mean([PodStatus.sensor_filter['IMU1_Z']['val'],
-    #                                                 PodStatus.sensor_filter['IMU2_Z']['val']]))
-    #
-    # else:
-    #     PodStatus.true_data['A']['std_dev'] = numpy.std(PodStatus.true_data['A']['q'])
-    #     numpy.append(good_IMUs, PodStatus.sensor_filter['IMU1_Z']['val'])
-    #     numpy.append(good_IMUs, PodStatus.sensor_filter['IMU2_Z']['val'])
-    #
-    #     # # determine valid IMU data
-    #     # # if new sensor_filter data is within 2*std_dev of true q, include in good_IMUs calc
-    #     # if abs(PodStatus.sensor_filter['IMU1_Z']['val']-numpy.mean(PodStatus.true_data['A']['q'])) < \
-    #     #         3 * PodStatus.true_data['A']['std_dev']:
-    #     #     numpy.append(good_IMUs, PodStatus.sensor_filter['IMU1_Z']['val'])
-    #     # else:
-    #     #     print('Fusion: IMUZ_1 Data Bad\n')
-    #     #     print('IMUZ Value ' + str(abs(PodStatus.sensor_filter['IMU1_Z']['val'])) + '\n')
-    #     #     print('A Mean ' + str(numpy.mean(PodStatus.true_data['A']['q'])) + '\n')
-    #     #     print('A two times STD ' + str(3 * PodStatus.true_data['A']['std_dev']) + '\n')
-    #     # if abs(PodStatus.sensor_filter['IMU2_Z']['val'] - numpy.mean(PodStatus.true_data['A']['q'])) < \
-    #     #         3 * PodStatus.true_data['A']['std_dev']:
-    #     #     numpy.append(good_IMUs, PodStatus.sensor_filter['IMU2_Z']['val'])
-    #     # else:
-    #     #     print('Fusion: IMUZ_2 Data Bad\n')
-    #     #     print('IMUZ Value ' + str(abs(PodStatus.sensor_filter['IMU2_Z']['val'])) + '\n')
-    #     #     print('A Mean ' + str(numpy.mean(PodStatus.true_data['A']['q'])) + '\n')
-    #     #     print('A two times STD ' + str(3 * PodStatus.true_data['A']['std_dev']) + '\n')
-    #
-    #     # if good_IMUs is not empty set, take mean value and add to true_data q
-    #     if good_IMUs:
-    #         print("Good data found for A")
-    #         # reset IMU_bad_time timer
-    #         PodStatus.IMU_bad_time_elapsed = 0
-    #         PodStatus.IMU_bad_time = None
-    #
-    #         # Set true value to mean of good_IMUs array
-    #         PodStatus.true_data['A']['val'] = numpy.mean(good_IMUs)
-    #
-    #         # add valid data to true_data q
-    #         # shift q values over
-    #         for i in range(0, (len(PodStatus.true_data['A']['q']) - 1)):
-    #             PodStatus.true_data['A']['q'][i] = PodStatus.true_data['A']['q'][i + 1]
-    #         # add new value to end of queue
-    #         PodStatus.true_data['A']['q'][(PodStatus.filter_length - 1)] = PodStatus.true_data['A']['val']
-    #
-    #     # if no good IMU data, start or progress the bad IMU data timer
-    #     else:
-    #         if not PodStatus.IMU_bad_time:
-    #             PodStatus.IMU_bad_time = clock()
-    #             print("Bad IMU data, starting 2 second clock at " + str(PodStatus.IMU_bad_time))
-    #
-    #         else:
-    #             PodStatus.IMU_bad_time_elapsed = clock()-PodStatus.IMU_bad_time
-    #             print("Bad IMU data, elapsed time: " + str(PodStatus.IMU_bad_time_elapsed))
-
-
-    ### END ACCELERATION FUSION
-
-    ### BEGIN VELOCITY FUSION
-    PodStatus.true_data['V']['val'] = PodStatus.sensor_data['SD_MotorData_MotorRPM'] * PodStatus.wheel_circum / 60
+    """ Combines raw IMU, motor RPM, LIDAR and stripe data into D, V and A.
 
+    The Kalman filter in state_estimator.py rejects outliers and failed reads on each sensor;
+    the time since each sensor last gave a usable reading is reported as IMU_bad_time_elapsed and
+    V_bad_time_elapsed for the abort ranges.  Each stripe edge is matched against the
+    stripe map (stripe_map.py) and applied as a position fix.
+    """
+    est = PodStatus.estimator
+    # IMU health from the drivers; the flight sim writes its own IMU values
+    status = None
+    if PodStatus.flight_sim is False:
+        status = {'IMU1_Z': PodStatus.sensor_poll.BNO1_status, 'IMU2_Z': PodStatus.sensor_poll.BNO2_status}
+    est.step(PodStatus.poll_interval, PodStatus.poll_newtime, PodStatus.sensor_data,
+             PodStatus.para_max_tube_length, stationary=(PodStatus.state == PodStatus.SafeToApproach),
+             status=status)
+
+    stripe_count = max(PodStatus.sensor_data['LST_Left'], PodStatus.sensor_data['LST_Right'])
+    PodStatus.stripes.update(stripe_count, PodStatus.poll_newtime, est)
+    PodStatus.true_data['stripe_count'] = PodStatus.stripes.count
+
+    std_dev = est.std_dev()
+    for i, key in enumerate(('D', 'V', 'A')):
+        PodStatus.true_data[key]['val'] = est.x[i]
+        PodStatus.true_data[key]['std_dev'] = std_dev[i]
     if PodStatus.true_data['V']['val'] < 0: PodStatus.true_data['V']['val'] = 0
-    # If queue is not full, fill queue
-    # if len(PodStatus.true_data['V']['q']) < PodStatus.filter_length:
-    #     # Add mean of IMU values to
-    #     PodStatus.true_data['V']['q'] = numpy.append(PodStatus.true_data['V']['q'],
-    #                                                  (PodStatus.sensor_filter['SD_MotorData_MotorRPM']['val'] * \
-    #                                                   PodStatus.wheel_circum / 60))
-    #
-    # else:
-    #     # Estimate new velocity
-    #     Vdr = PodStatus.true_data['V']['val'] + PodStatus.poll_interval * PodStatus.true_data['A']['val'] * 32.174
-    #
-    #     # Set std_dev
-    #     PodStatus.true_data['V']['std_dev'] = numpy.std(PodStatus.true_data['V']['q'])
-    #
-    #     # Evaluate new data compared to true q and std dev
-    #     # if abs(PodStatus.sensor_filter['SD_MotorData_MotorRPM']['val'] - numpy.mean(PodStatus.true_data['V']['q'])) < \
-    #     #         2 * PodStatus.true_data['V']['std_dev']:
-    #     #     PodStatus.V_bad_time_elapsed = 0
-    #     #     PodStatus.V_bad_time = None
-    #
-    #     PodStatus.true_data['V']['val'] = numpy.mean([Vdr, \
-    #                                                   (PodStatus.sensor_filter['SD_MotorData_MotorRPM']['val'] * PodStatus.wheel_circum / 60)])
-
-        # if new data is invalid:
-        # else:
-        #     # RUN TRACTION CONTROL FUNCTION
-        #
-        #     # Start or progress bad V data timer
-        #     if not PodStatus.V_bad_time:
-        #         PodStatus.V_bad_time = clock()
-        #         print("Bad V data, starting clock at " + str(PodStatus.IMU_bad_time))
-        #
-        #     else:
-        #         PodStatus.V_bad_time_elapsed = clock()-PodStatus.V_bad_time
-        #         print("Bad V data, elapsed time: " + str(PodStatus.V_bad_time_elapsed))
-    ### END VELOCITY FUSION
-
-    ### BEGIN DISTANCE FUSION
-    PodStatus.true_data['D']['val'] = PodStatus.true_data['D']['val'] + PodStatus.poll_interval * \
-        PodStatus.true_data['V']['val']
-
-    PodStatus.true_data['stripe_count'] = numpy.maximum(PodStatus.sensor_data['LST_Left'],
-                                                    PodStatus.sensor_data['LST_Right'])
-
-    PodStatus.D_diff = PodStatus.true_data['D']['val'] - PodStatus.stripe_count
-
-    ### Unnecessary block, since we count stripes independently and take max as true_data
-    # if PodStatus.true_data['D']['val'] > 25:
-    #     temp_count = PodStatus.true_data['D']['val'] / 100
-    #     temp_dec = abs(temp_count - numpy.around(temp_count))
-    #     if temp_dec < 0.2 and PodStatus.D_diff > 20:
-    #         print("Looking for stripe")
-    #         if PodStatus.sensor_data['LST_Left'] == temp_count:
-    #             print("Left stripe counted!")
-    #             PodStatus.stripe_count = PodStatus.sensor_data['LST_Left']
-    #             PodStatus.sensor_data['LST_Right'] = PodStatus.sensor_data['LST_Left']
-    #         elif PodStatus.sensor_data['LST_Right'] == temp_count:
-    #             print("Right stripe counted!")
-    #             PodStatus.stripe_count = PodStatus.sensor_data['LST_Right']
-    #             PodStatus.sensor_data['LST_Left'] = PodStatus.sensor_data['LST_Right']
-    #         else:
-    #             print("No stripe counted, still waiting.")
-    #
-    #     else:
-    #         pass
-
-
-    ### END DISTANCE FUSION
+
+    PodStatus.sensor_data['IMU_bad_time_elapsed'] = est.bad_time('IMU1_Z', 'IMU2_Z')
+    PodStatus.sensor_data['V_bad_time_elapsed'] = est.bad_time('RPM')
+
+    PodStatus.D_bound = PodStatus.stripes.error_bound(est)
+    PodStatus.D_diff = PodStatus.true_data['D']['val'] - PodStatus.stripes.last_position
+    PodStatus.sensor_data['D_diff'] = PodStatus.D_diff
+
 
 def eval_abort():
     """
@@ -584,7 +404,7 @@ def eval_abort():
 
     for key in PodStatus.abort_ranges[PodStatus.state]:     # Search abort_ranges dict for current state
         # if data is not being filtered, record abort criteria based on raw
-        if not key in PodStatus.sensor_filter[str(key)]:
+        if not key in PodStatus.filter_bank:
             # if out of range, log 'Fault' key as 1
             if PodStatus.sensor_data[str(key)] < PodStatus.abort_ranges[PodStatus.state][str(key)]['Low'] \
                     or PodStatus.sensor_data[str(key)] > PodStatus.abort_ranges[PodStatus.state][str(key)]['High']:
@@ -638,12 +458,30 @@ def rec_data():
     ###__ACTUAL GUI__###
     if gui == '2':
         ### RECEIVE DATA FROM GUI ###
-        # Need to receive: cmd_ext{} and para{} into temp values.
+        # Commands arrive on the command link thread (network_transfer/command_link.py),
+        # which acks them at once; here the ones received since the last loop are applied.
         # If state = 1, then load all cmd_ext{} and para_ into the PodStatus dicts.
         # If state != 1, then *only* load the cmd_ext['Abort'] value to the PodStatus.cmd_int['Abort'] var.
-        # Have a running clock for GUI; if loss of connection > 2 seconds, will abort
+        for command in PodStatus.cmd_link.poll():
+            key, value = command.key, command.value
+            if key == 'Abort' and value:
+                PodStatus.cmd_ext['Abort'] = 1
+                PodStatus.cmd_int['Abort'] = 1
+                PodStatus.Abort = True      # abort() runs in the next do_commands()
+                print("ABORT COMMANDED BY GUI")
+            elif PodStatus.state != PodStatus.SafeToApproach:
+                print("Ignoring GUI command " + key + " outside of S2A")
+                continue
+            elif key in PodStatus.cmd_ext:
+                PodStatus.cmd_ext[key] = int(value)
+            else:
+                setattr(PodStatus, key, value)
+            PodStatus.cmd_traced.append((command.seq, key))
 
-        pass
+        # Link health; abortranges.dat aborts on a loss of connection > 2 seconds in Launching,
+        # BrakingHigh and Crawling (not in BrakingLow, where an abort would end the final braking)
+        PodStatus.sensor_data['GUI_Conn_time'] = PodStatus.cmd_link.since_heartbeat()
+        PodStatus.sensor_data['GUI_RTT'] = PodStatus.cmd_link.srtt * 1000
 
     ###DEBUG CONSOLE GUI###
     if gui == '1':
@@ -787,7 +625,12 @@ def do_commands():
     as well as the pod's current commands.
 
     This is the ONLY function that will allow the pod to transition from S2A to Launching.
+
+    The switch calls only set each output's desired level; the pins that changed are
+    written together by applyOutputs() (see HyperlynxECS.setOutput()).
     """
+    trace_commands('apply')
+    PodStatus.sensor_poll.holdOutputs()
 
     if PodStatus.state == 1:    # Load ALL commands for full GUI control
         PodStatus.cmd_int = PodStatus.cmd_ext
@@ -795,7 +638,8 @@ def do_commands():
         ### POD WILL LAUNCH WITH THIS SECTION ###
         # Launch pod ONLY if conditions in run_state() for spacex_state are met
         if PodStatus.cmd_ext['Launch'] == 1 and PodStatus.spacex_state == 2:
-            transition()
+            PodStatus.fsm.fire('launch', PodStatus, clock())
+            trace_commands('actuate', ('Launch',))
         elif PodStatus.cmd_ext['Launch'] == 1 and PodStatus.spacex_state != 2:
             print("Pod not configured for launch, resetting Launch command to 0.")
             PodStatus.cmd_ext['Launch'] = 0
@@ -822,9 +666,15 @@ def do_commands():
     PodStatus.sensor_poll.switchContactor(2, PodStatus.cmd_int['HV'])
     PodStatus.HV = bool(PodStatus.cmd_int['HV'])
 
+    PodStatus.sensor_poll.applyOutputs()
+    trace_commands('actuate', ('MC_Pump', 'Vent_Sol', 'Res1_Sol', 'Res2_Sol', 'HV'))
+
     # Abort Command
     if PodStatus.Abort:
         abort()
+        trace_commands('actuate', ('Abort',))
+    # Flight parameters were set by rec_data(); rejected launches end here too
+    trace_commands('actuate')
 
     # Isolation green LED   DEBUG NEED VAR DATA FOR BMS
     # if PodStatus.sensor_data['BMS_something'] < 4.5:
@@ -833,6 +683,24 @@ def do_commands():
     #     PodStatus.sensor_poll.switchGreenLED(1);
 
 
+def trace_commands(hop, keys=None):
+    """
+    Records hop for the GUI commands staged by rec_data() (only those for keys, if given)
+    on the command link, which reports it back to the GUI's latency trace.
+    """
+    if not PodStatus.cmd_traced:
+        return
+    remaining = []
+    for seq, key in PodStatus.cmd_traced:
+        if keys is None or key in keys:
+            PodStatus.cmd_link.trace_hop(seq, hop)
+            if hop != 'actuate':
+                remaining.append((seq, key))
+        else:
+            remaining.append((seq, key))
+    PodStatus.cmd_traced = remaining
+
+
 def spacex_data():
     """
     This function passes the required SpaceX data packet at the defined rate.
@@ -867,378 +735,326 @@ def send_data():        # Sends data to TCP (GUI) and CAN (BMS/MC)
 
 def run_state():
     """
-    This is the primary "run" function for each state.
+    This is the primary "run" function for each state: one step of PodStatus.fsm, the
+    state machine declared in build_fsm().
     """
+    PodStatus.fsm.step(PodStatus, clock())
 
-    # S2A STATE
-    if PodStatus.state == 1:
-        # Determine if SpaceX state = 1 (S2A) or 2 (Ready to Launch)
-        if (PodStatus.Fault is False and
-            PodStatus.Abort is False and
-            PodStatus.HV is True and
-            PodStatus.Brakes is False and
-            PodStatus.para_BBP > 0 and
-            PodStatus.para_max_accel > 0 and
-            PodStatus.para_max_speed > 0 and
-            PodStatus.para_max_time > 0 and
-            PodStatus.para_max_crawl_speed > -1):
-                PodStatus.spacex_state = 2
-                print("Pod is Ready for Launch (SpaceX State 2)")
-        else:
-            PodStatus.spacex_state = 1
-
-        # TRANSITIONS
-        # None.  Only transition from S2A comes from do_commands() function
-
-    # PRELAUNCH State
-    elif PodStatus.state == 2:
-        # Set Motor Controller Parameters
-        # Emerg Brake / Active? / Forward
 
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
+def abort():
+    """
+    Determines how the pod will abort from each specific state.  Generally, the pod will be
+    sent to the final braking state (7), skipping the state (6) crawling reconfigurations and
+    sending the pod back to S2A as soon as it comes to a stop (see the 'abort' events in build_fsm()).
+    """
+    PodStatus.fsm.fire('abort', PodStatus, clock())
 
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
 
+def build_fsm():
+    """
+    Declares the pod states for pod_fsm.StateMachine: what each state does every loop, the
+    ONLY transitions between them (plus the launch from do_commands() and the aborts), and
+    the state timeouts from timeouts.py.  The time in state is kept by the state machine.
+    """
+    limits = timeouts.get()
+    fsm = pod_fsm.StateMachine()
+
+    fsm.state(Status.SafeToApproach, 'S2A', run=run_s2a)
+    fsm.state(Status.PreLaunch, 'PRELAUNCH',
+              timeout=limits[Status.PreLaunch], on_timeout=timeout_fault)
+    fsm.state(Status.Launching, 'LAUNCH', run=run_launching, enter=enter_launching,
+              timeout=limits[Status.Launching], on_timeout=timeout_fault)
+    fsm.state(Status.BrakingHigh, 'BRAKE', run=run_braking_high,
+              timeout=limits[Status.BrakingHigh], on_timeout=timeout_fault)
+    fsm.state(Status.Crawling, 'CRAWLING', run=run_crawling,
+              timeout=limits[Status.Crawling], on_timeout=timeout_fault)
+    fsm.state(Status.BrakingLow, 'BRAKE FINAL', run=run_braking_low, enter=enter_braking_low,
+              timeout=limits[Status.BrakingLow], on_timeout=timeout_fault)
+
+    # TRANSITIONS, checked in order after the state's run action
+    # Brake on the worst case position, not just the estimate
+    fsm.transition(Status.Launching, Status.BrakingHigh, label='Pod has crossed BBP.',
+                   guard=lambda pod: (pod.true_data['D']['val'] + pod.D_bound) > pod.para_BBP)
+    fsm.transition(Status.Launching, Status.BrakingHigh, label='Pod has reached max speed.',
+                   guard=lambda pod: pod.true_data['V']['val'] > pod.para_max_speed)
+    fsm.transition(Status.Launching, Status.BrakingHigh, label='Pod has exceeded max time.',
+                   guard=lambda pod: pod.MET > pod.para_max_time)
+    # TRANSITIONS FOR BAD DATA
+    fsm.transition(Status.Launching, Status.BrakingHigh, label='Transition for bad IMU data.',
+                   guard=lambda pod: pod.abort_ranges[pod.state]['IMU_bad_time_elapsed']['Fault'] == 1)
+    # Reconfig: brake vent closed and brakes retracted by res#1 (see run_braking_high())
+    fsm.transition(Status.BrakingHigh, Status.Crawling, guard=brakes_retracted, action=close_res1,
+                   label='Brakes retracted, closing Res1 solenoid.')
+    # Probably needs a 2nd/3rd stop point (time/dist)
+    fsm.transition(Status.Crawling, Status.BrakingLow, label='LIDAR is less than 90 feet',
+                   guard=lambda pod: pod.sensor_data['LIDAR'] < 90 or
+                   (pod.para_max_tube_length - pod.true_data['D']['val']) < 150)
+    fsm.transition(Status.BrakingLow, Status.SafeToApproach, action=end_run,
+                   guard=lambda pod: pod.true_data['V']['val'] <= 0.5)
+
+    # EVENTS
+    fsm.event('launch', Status.SafeToApproach, Status.Launching)
+    fsm.event('abort', Status.SafeToApproach, action=lambda pod: print("Abort flagged in S2A."))
+    fsm.event('abort', (Status.PreLaunch, Status.Launching, Status.BrakingHigh, Status.Crawling),
+              Status.BrakingLow)
+    fsm.event('abort', Status.BrakingLow, Status.SafeToApproach, guard=lambda pod: pod.speed <= 0.1)
+    fsm.event('abort', Status.BrakingLow, action=lambda pod: print("Waiting for pod to stop."))
+
+    return fsm.compile(invalid=Status.BrakingLow, on_invalid=invalid_fault)
+
+
+def timeout_fault(pod):
+    pod.Fault = True
+    pod.Abort = True
+
+
+def invalid_fault(pod):
+    print("Invalid pod state found: " + str(pod.state))
+    pod.Fault = True
+
+
+def run_s2a(pod):
+    # Determine if SpaceX state = 1 (S2A) or 2 (Ready to Launch)
+    if (pod.Fault is False and
+        pod.Abort is False and
+        pod.HV is True and
+        pod.Brakes is False and
+        pod.para_BBP > 0 and
+        pod.para_max_accel > 0 and
+        pod.para_max_speed > 0 and
+        pod.para_max_time > 0 and
+        pod.para_max_crawl_speed > -1):
+            pod.spacex_state = 2
+            print("Pod is Ready for Launch (SpaceX State 2)")
+    else:
+        pod.spacex_state = 1
 
-    # LAUNCHING STATE
-    elif PodStatus.state == 3:
-        PodStatus.spacex_state = 3
-        # print("Resetting Launch command to 0")
-        PodStatus.commands['Launch'] = 0        # Resets launch command once successfully launched
+    # TRANSITIONS
+    # None.  Only transition from S2A comes from do_commands() function
 
-        # Start the flight clock
-        if PodStatus.MET_starttime == -1:
-            print("The MET clock has started.")
-            PodStatus.MET_starttime = clock()
-        else:
-            PodStatus.MET = clock()-PodStatus.MET_starttime
-
-        # ACCEL UP TO MAX G within 2%
-        # Linear inputs; MC has a built-in throttle damper
-        if PodStatus.true_data['A']['val'] < (0.98 * PodStatus.para_max_accel):
-            if PodStatus.throttle < 1:
-                PodStatus.throttle = PodStatus.throttle + 0.1
-                if PodStatus.throttle > 1:
-                    PodStatus.throttle = 1
-        elif PodStatus.true_data['A']['val'] > (1.02*PodStatus.para_max_accel):
-            if PodStatus.throttle > 0:
-                PodStatus.throttle = PodStatus.throttle - 0.1
-                if PodStatus.throttle < 0:
-                    PodStatus.throttle = 0
-
-        # TRANSITIONS
-        if (PodStatus.true_data['D']['val'] > PodStatus.para_BBP) or \
-                (PodStatus.true_data['stripe_count']*100 > PodStatus.para_BBP):
-            print("Pod has crossed BBP.")
-            transition()
-        elif PodStatus.true_data['V']['val'] > PodStatus.para_max_speed:
-            print("Pod has reached max speed.")
-            transition()
-        elif PodStatus.MET > PodStatus.para_max_time:
-            print("Pod has exceeded max time.")
-            transition()
-        # TRANSITIONS FOR BAD DATA
-        elif PodStatus.abort_ranges[PodStatus.state]['IMU_bad_time_elapsed']['Fault'] == 1:
-            print("Transition for bad IMU data.")
-            transition()
-
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
-
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
-
-    # COAST (NOT USED)
-
-    # BRAKE, HIGH SPEED
-    elif PodStatus.state == 5:
-        PodStatus.sensor_filter['IMU1_Z']['q'] = []
-        PodStatus.sensor_filter['IMU2_Z']['q'] = []
-        PodStatus.sensor_filter['Brake_Pressure']['q'] = []
-        PodStatus.MET = clock()-PodStatus.MET_starttime
-        PodStatus.spacex_state = 5
 
-        PodStatus.throttle = 0  # SET THROTTLE TO 0
+def enter_launching(pod):
+    pod.estimator.reset(now=clock())     # Pod is at rest at the start of the tube
+    pod.stripes.reset(pod.para_max_tube_length, max(pod.sensor_data['LST_Left'],
+                      pod.sensor_data['LST_Right']), clock())
 
-        if PodStatus.true_data['V']['val'] <= 0.5 and PodStatus.stopped_time <= 0:
-            PodStatus.stopped_time = clock()
 
-        # THIS VALUE NEEDS TO BE THOROUGHLY TESTED;
-        # IF ERRANT SPEED VALUES > 0.5 WHILE ACTUALLY
-        # STOPPED, COULD CAUSE EXCESSIVE DISCHARGE
-        # OF RESERVOIRS AND LOSS OF BRAKE RETRACTION ABILITY
-        if PodStatus.true_data['V']['val'] > 0.5:
-            PodStatus.stopped_time = 0              # RESET STOPPED TIME
-            if PodStatus.cmd_int['Vent_Sol'] == 1:    # Is brake vent closed?
-                print("Opening Vent Sol")
-                PodStatus.cmd_int['Vent_Sol'] = 0       # open brake vent
+def run_launching(pod):
+    pod.spacex_state = 3
+    # print("Resetting Launch command to 0")
+    pod.commands['Launch'] = 0        # Resets launch command once successfully launched
 
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
+    # Start the flight clock
+    if pod.MET_starttime == -1:
+        print("The MET clock has started.")
+        pod.MET_starttime = clock()
+    else:
+        pod.MET = clock()-pod.MET_starttime
+
+    # ACCEL UP TO MAX G within 2%
+    # Linear inputs; MC has a built-in throttle damper
+    if pod.true_data['A']['val'] < (0.98 * pod.para_max_accel):
+        if pod.throttle < 1:
+            pod.throttle = pod.throttle + 0.1
+            if pod.throttle > 1:
+                pod.throttle = 1
+    elif pod.true_data['A']['val'] > (1.02*pod.para_max_accel):
+        if pod.throttle > 0:
+            pod.throttle = pod.throttle - 0.1
+            if pod.throttle < 0:
+                pod.throttle = 0
+
+
+def run_braking_high(pod):
+    pod.filter_bank.reset('IMU1_Z', 'IMU2_Z', 'Brake_Pressure')
+    pod.MET = clock()-pod.MET_starttime
+    pod.spacex_state = 5
+
+    pod.throttle = 0  # SET THROTTLE TO 0
+
+    if pod.true_data['V']['val'] <= 0.5 and pod.stopped_time <= 0:
+        pod.stopped_time = clock()
+
+    # THIS VALUE NEEDS TO BE THOROUGHLY TESTED;
+    # IF ERRANT SPEED VALUES > 0.5 WHILE ACTUALLY
+    # STOPPED, COULD CAUSE EXCESSIVE DISCHARGE
+    # OF RESERVOIRS AND LOSS OF BRAKE RETRACTION ABILITY
+    if pod.true_data['V']['val'] > 0.5:
+        pod.stopped_time = 0              # RESET STOPPED TIME
+        if pod.cmd_int['Vent_Sol'] == 1:    # Is brake vent closed?
+            print("Opening Vent Sol")
+            pod.cmd_int['Vent_Sol'] = 0       # open brake vent
+
+    # DO NOTHING ELSE UNTIL STOPPED
+
+    ## RECONFIGURE FOR CRAWLING STATE
+    # Close Brake Vent, open res#1 solenoid, then close res#1 solenoid in the transition
+    # APPLIES TO CONFIGS WITH NO RES IN-LINE REGULATOR
+    if stopped(pod):
+        if pod.cmd_int['Vent_Sol'] == 0:
+            pod.cmd_int['Vent_Sol'] = 1     # CLOSE BRAKE VENT SOLENOID
+            print("Closing Vent Sol")
+        if pod.Vent_Sol == 1 and pod.sensor_data['Brake_Pressure'] < 20:
+            pod.cmd_int['Res1_Sol'] = 1     # OPEN RES#1 SOLENOID
+            print("Opening Res#1, pausing for 2 seconds.")
 
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
+        else:
+            print("Waiting for pod to achieve braking pressure")
+            print("Vent_Sol: " + str(pod.Vent_Sol))
+            print("Res1_Sol: " + str(pod.Res1_Sol))
+            print("Brake Pressure: " + str(pod.sensor_data['Brake_Pressure']))
 
-        # DO NOTHING ELSE UNTIL STOPPED
 
+def stopped(pod):
+    return pod.true_data['V']['val'] < 0.5 and (clock() - pod.stopped_time) > 5
 
-        ## RECONFIGURE FOR CRAWLING STATE
 
-        if PodStatus.true_data['V']['val'] < 0.5 and (clock() - PodStatus.stopped_time) > 5:
-            if PodStatus.cmd_int['Vent_Sol'] == 0:
-                PodStatus.cmd_int['Vent_Sol'] = 1     # CLOSE BRAKE VENT SOLENOID
-                print("Closing Vent Sol")
-            if PodStatus.Vent_Sol == 1 and PodStatus.sensor_data['Brake_Pressure'] < 20:
-                PodStatus.cmd_int['Res1_Sol'] = 1     # OPEN RES#1 SOLENOID
-                print("Opening Res#1, pausing for 2 seconds.")
+def brakes_retracted(pod):
+    return stopped(pod) and pod.Vent_Sol == 1 and pod.sensor_data['Brake_Pressure'] > 177
 
-            else:
-                print("Waiting for pod to achieve braking pressure")
-                print("Vent_Sol: " + str(PodStatus.Vent_Sol))
-                print("Res1_Sol: " + str(PodStatus.Res1_Sol))
-                print("Brake Pressure: " + str(PodStatus.sensor_data['Brake_Pressure']))
-
-            if PodStatus.Vent_Sol == 1 and PodStatus.sensor_data['Brake_Pressure'] > 177:
-                print("Brakes retracted, closing Res1 solenoid.")
-                PodStatus.cmd_int['Res1_Sol'] = 0  # CLOSE RES#1 SOLENOID
-                transition()
-
-    # CRAWLING
-    # ONLY way to transition() is if LIDAR < 90ft.  Probably needs a 2nd/3rd stop point (time/dist)
-    elif PodStatus.state == 6:
-        PodStatus.spacex_state = 6
-        PodStatus.sensor_filter['IMU1_Z']['q'] = []
-        PodStatus.sensor_filter['IMU2_Z']['q'] = []
-        PodStatus.sensor_filter['Brake_Pressure']['q'] = []
-
-        # ACCEL UP TO MAX G within 2%
-        if PodStatus.true_data['A']['val'] < (0.98 * PodStatus.para_max_accel)\
-                and PodStatus.true_data['V']['val'] < PodStatus.para_max_crawl_speed:
-            PodStatus.throttle = PodStatus.throttle + 0.05
-            if PodStatus.throttle > 1:
-                PodStatus.throttle = 1
-        elif PodStatus.true_data['A']['val'] > (1.02*PodStatus.para_max_accel)\
-                or PodStatus.true_data['V']['val'] > PodStatus.para_max_crawl_speed:
-            PodStatus.throttle = PodStatus.throttle - 0.05
-            if PodStatus.throttle < 0:
-                PodStatus.throttle = 0
-
-        if PodStatus.sensor_data['LIDAR'] < 90 or (PodStatus.para_max_tube_length - PodStatus.true_data['D']['val']) < 150:
-            print("LIDAR is less than 90 feet")
-            transition()
-
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
-
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
-
-    # BRAKE, FINAL
-    elif PodStatus.state == 7:
-        PodStatus.spacex_state = 5
-        print("Entering final braking state.")
-
-        PodStatus.throttle = 0
-        PodStatus.cmd_int['HV'] = 0
-
-        #     PodStatus.stopped_time = 0
-        if PodStatus.true_data['V']['val'] > 0.5:
-            if PodStatus.cmd_int['Vent_Sol'] == 1:    # OPEN BRAKE VENT SOLENOID
-                print("Opening Vent Sol")
-                PodStatus.cmd_int['Vent_Sol'] = 0
-
-        # TRANSITION TO S2A
-        else:
-            transition()
 
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
+def close_res1(pod):
+    pod.cmd_int['Res1_Sol'] = 0  # CLOSE RES#1 SOLENOID
 
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
 
-    else:
-        PodStatus.state = PodStatus.BrakingLow
+def run_crawling(pod):
+    ### RECONFIG 4 STATE
+    # TELL SD100 TO CHANGE DRIVE MODE, SET EMERG BRAKE
+    pod.spacex_state = 6
+    pod.filter_bank.reset('IMU1_Z', 'IMU2_Z', 'Brake_Pressure')
 
-        #DEBUG
-        print("Invalid pod state found: " + str(PodStatus.state))
-        print("Quitting")
-        PodStatus.Fault = True
-        x = input("1 to Quit, 2 to reset to S2A, 3 to reset to BrakingLow(7) ")
-        if x == '1': PodStatus.Quit = True
-        elif x == '2': PodStatus.state = PodStatus.SafeToApproach
-        else: PodStatus.state = PodStatus.BrakingLow
+    # ACCEL UP TO MAX G within 2%
+    if pod.true_data['A']['val'] < (0.98 * pod.para_max_accel)\
+            and pod.true_data['V']['val'] < pod.para_max_crawl_speed:
+        pod.throttle = pod.throttle + 0.05
+        if pod.throttle > 1:
+            pod.throttle = 1
+    elif pod.true_data['A']['val'] > (1.02*pod.para_max_accel)\
+            or pod.true_data['V']['val'] > pod.para_max_crawl_speed:
+        pod.throttle = pod.throttle - 0.05
+        if pod.throttle < 0:
+            pod.throttle = 0
 
 
-def transition():
-    """
-    This functions defines the ONLY way to perform a state transition (not including aborts).
-    """
-    if PodStatus.state == 1:          # S2A trans
-        PodStatus.state = 3
-        print("TRANS: S2A(1) to LAUNCH(3)")
-
-    elif PodStatus.state == 3:          # LAUNCH trans
-        PodStatus.state = 5
-        print("TRANS: LAUNCH(3) TO BRAKE(5)")
-
-    elif PodStatus.state == 5:
-        # Reconfig1-2-3 States
-        # Close Brake Vent, open res#1 solenoid, close res#1 solenoid
-        # APPLIES TO CONFIGS WITH NO RES IN-LINE REGULATOR
-        if PodStatus.cmd_int['Vent_Sol'] == 0:
-            PodStatus.cmd_int['Vent_Sol'] = 1     # CLOSE VENT SOL
-        elif PodStatus.Vent_Sol:
-            PodStatus.cmd_int['Res1_Sol'] = 1       # OPEN RES#1 SOL
-        elif PodStatus.Res1_Sol:
-            if PodStatus.sensor_data['Brake_Pressure'] > 177:
-                PodStatus.cmd_int['Res1_Sol'] = 0   # CLOSE RES#1 SOL
-                PodStatus.state = 6
-                print("TRANS: BRAKE(5) to CRAWLING(6)")
-
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
-
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
-
-    elif PodStatus.state == 6:
-        ### RECONFIG 4 STATE
-        # TELL SD100 TO CHANGE DRIVE MODE, SET EMERG BRAKE
-        # Timeout
-        if PodStatus.state_timeout[PodStatus.state] == 0:
-            PodStatus.state_timeout[PodStatus.state] = clock()
-        PodStatus.state_timeout[PodStatus.state] = clock() - PodStatus.state_timeout[PodStatus.state]
-
-        # Timeout Transition
-        if PodStatus.state_timeout[PodStatus.state] > PodStatus.state_timeout_limits[PodStatus.state]:
-            PodStatus.Fault = True
-            PodStatus.Abort = True
-
-        PodStatus.state = 7
-        print("TRANS: CRAWLING(6) TO BRAKE(7)")
-
-    elif PodStatus.state == 7:
-        PodStatus.state = 1
-        print("TRANS: BRAKE(7) TO S2A(1)")
-        print("Creating new log file.")
-        PodStatus.create_log()
-
-    else:
-        print("POD IN INVALID STATE: " + str(PodStatus.state))
-        PodStatus.state = 7
-        PodStatus.Fault = True
-        PodStatus.Quit = True
+def enter_braking_low(pod):
+    print("Entering final braking state.")
 
 
-def abort():
-    """
-    Determines how the pod will abort from each specific state.  Generally, the pod will be
-    sent to the final braking state (7), skipping the state (6) crawling reconfigurations and
-    sending the pod back to S2A as soon as it comes to a stop.
-    """
-    if PodStatus.state == 1:          # S2A STATE FUNCTIONS
-        print("Abort flagged in S2A.")
+def run_braking_low(pod):
+    pod.spacex_state = 5
 
-    elif PodStatus.state == 2:          # PreLaunch Abort
-        PodStatus.state = 7
+    pod.throttle = 0
+    pod.cmd_int['HV'] = 0
 
-    elif PodStatus.state == 3:          # LAUNCH STATE FUNCTIONS
-        print("ABORTING from 3 to 7")
-        PodStatus.state = 7
+    if pod.true_data['V']['val'] > 0.5:
+        if pod.cmd_int['Vent_Sol'] == 1:    # OPEN BRAKE VENT SOLENOID
+            print("Opening Vent Sol")
+            pod.cmd_int['Vent_Sol'] = 0
 
-    elif PodStatus.state == 5:
-        print("ABORTING from 5 to 7")
-        PodStatus.state = 7
 
-    elif PodStatus.state == 6:
-        print("ABORTING FROM 6 to 7")
-        PodStatus.state = 7
+def end_run(pod):
+    print("Creating new log file.")
+    pod.create_log()
 
-    elif PodStatus.state == 7:
-        if PodStatus.speed > 0.1:
-            print("Waiting for pod to stop.")
-        else:
-            PodStatus.state = 1
-    else:
-        PodStatus.state = 1
 
+def init_ipc():
+    """
+    Sets up the shared memory state record and starts the logger and GUI telemetry
+    processes.  Disk and network I/O happen only in those processes; the control
+    loop just calls publish_state() once per loop, which never blocks.
 
-def write_file():
+    The channel layout is fixed here, after init() has populated sensor_data.  Which
+    channels are logged and sent to the GUI comes from the sensor registry.
     """
-    Stores sensor_data and commands dicts to onboard SD card at the specified rate (10Hz)
+    sensor_keys = [str(key) for key in PodStatus.sensor_data]
+    cmd_keys = [str(key) for key in PodStatus.cmd_ext]
+
+    PodStatus.ipc_state_vars = [
+        ('state', lambda: PodStatus.state),
+        ('spacex_state', lambda: PodStatus.spacex_state),
+        ('total_faults', lambda: PodStatus.total_faults),
+        ('throttle', lambda: PodStatus.throttle),
+        ('D', lambda: PodStatus.true_data['D']['val']),
+        ('V', lambda: PodStatus.true_data['V']['val']),
+        ('A', lambda: PodStatus.true_data['A']['val']),
+        ('A_std_dev', lambda: PodStatus.true_data['A']['std_dev']),
+        ('A_filter_val', lambda: PodStatus.sensor_filter['IMU1_Z']['val']),
+        ('Clock_interval', lambda: PodStatus.poll_interval),
+        ('Brakes', lambda: PodStatus.Brakes),
+        ('HV', lambda: PodStatus.HV),
+        ('Vent_Sol', lambda: PodStatus.Vent_Sol),
+        ('stripe_count', lambda: PodStatus.true_data['stripe_count'])
+    ]
+    # Actuation audit: level and perf_counter() time of the last write of every output pin
+    ecs = PodStatus.sensor_poll
+    for pin, name in ecs.ACT_names.items():
+        PodStatus.ipc_state_vars.append(('act_' + name, lambda pin=pin: ecs.ACT_applied[pin]))
+        PodStatus.ipc_state_vars.append(('act_time_' + name, lambda pin=pin: ecs.ACT_time[pin]))
+    PodStatus.ipc_state_vars.append(('act_writes', lambda: ecs.ACT_writes))
+    dump_keys = list(PodStatus.data_dump())
+
+    channels = ['clock', 'log_seq']
+    for key in sensor_keys:
+        channels += [key, 'fault:' + key]
+    channels += ['ext_' + key for key in cmd_keys]
+    channels += ['int_' + key for key in cmd_keys]
+    channels += ['var:' + name for name, getter in PodStatus.ipc_state_vars]
+    channels += ['gui:' + key for key in dump_keys]
+
+    PodStatus.ipc = pod_ipc.StatePublisher(channels)
+    index = PodStatus.ipc.index
+    PodStatus.ipc_sensor_idx = [(index[key], key) for key in sensor_keys]
+    PodStatus.ipc_cmd_idx = [(index['ext_' + key], index['int_' + key], key) for key in cmd_keys]
+    PodStatus.ipc_var_idx = [(index['var:' + name], getter) for name, getter in PodStatus.ipc_state_vars]
+    PodStatus.ipc_gui_idx = [(index['gui:' + key], key) for key in dump_keys]
+
+    # Same rows, order and Fault column as the old in-loop write_file()
+    registry = PodStatus.registry
+    log_rows = [(key, key, 'fault:' + key) for key in sensor_keys
+                if key not in registry or registry[key].log]
+    log_rows += [('ext_' + key, 'ext_' + key, '') for key in cmd_keys]
+    log_rows += [('int_' + key, 'int_' + key, '') for key in cmd_keys]
+    log_rows += [(name, 'var:' + name, '0') for name, getter in PodStatus.ipc_state_vars]
+
+    # GUI gets the sensor data, the pod state and the data_dump() summary
+    gui_fields = [('state', 'var:state')]
+    for key in registry.telemetry_channels():
+        if key in dump_keys:
+            gui_fields.append((key, 'gui:' + key))
+        elif key in PodStatus.sensor_data:
+            gui_fields.append((key, key))
+
+    PodStatus.ipc.start(pod_ipc.run_logger, log_rows, 'logs/', PodStatus.log_rate)
+    PodStatus.ipc.start(pod_ipc.run_telemetry, gui_fields, PodStatus.gui_server_ip,
+                        PodStatus.gui_server_port, PodStatus.telemetry_rate)
+
+
+def publish_state():
     """
+    Copies this loop's sensor_data, commands and pod state variables into the shared
+    memory ring for the logger and telemetry processes.
+    """
+    record = PodStatus.ipc.record
+    record[0] = clock()
+    record[1] = PodStatus.log_seq
+
+    faults = PodStatus.abort_ranges[PodStatus.state]
+    for i, key in PodStatus.ipc_sensor_idx:
+        record[i] = PodStatus.sensor_data[key]
+        if key in faults:
+            record[i + 1] = faults[key]['Fault']
+        else:
+            record[i + 1] = 0
+    for i_ext, i_int, key in PodStatus.ipc_cmd_idx:
+        record[i_ext] = PodStatus.cmd_ext[key]
+        record[i_int] = PodStatus.cmd_int[key]
+    for i, getter in PodStatus.ipc_var_idx:
+        record[i] = getter()
+    dump = PodStatus.data_dump()
+    for i, key in PodStatus.ipc_gui_idx:
+        record[i] = dump[key]
 
-    if (clock() - PodStatus.log_lastwrite) < (1/PodStatus.log_rate):
-        pass
-
-    else:
-        file = open(os.path.join('logs/', PodStatus.file_name), 'a')
-        with file:
-
-            ### Log sensor_data
-            for key in PodStatus.sensor_data:
-                if str(key) in PodStatus.abort_ranges[PodStatus.state]:
-                    fault_code = PodStatus.abort_ranges[PodStatus.state][str(key)]['Fault']
-                else:
-                    fault_code = 0
-
-                line = str(key) + '\t' + str(PodStatus.sensor_data[str(key)]) + '\t' \
-                       + str(int(fault_code)) + '\t' + str(round(clock(),2)) + '\n'
-                file.write(line)
-
-            ### Log commands
-            for key in PodStatus.cmd_ext:
-                line = 'ext_' + str(key) + '\t' + str(PodStatus.cmd_ext[str(key)]) + '\t\t' + str(round(clock(),2)) + '\n'
-                file.write(line)
-            for key in PodStatus.cmd_int:
-                line = 'int_' + str(key) + '\t' + str(PodStatus.cmd_int[str(key)]) + '\t\t' + str(round(clock(),2)) + '\n'
-                file.write(line)
-
-            ### Log pod state variables
-            line = 'state' + '\t' + str(PodStatus.state) + '\t' + str(0) + '\t' + str(round(clock(),2)) + '\n' \
-                    + 'spacex_state' + '\t' + str(PodStatus.spacex_state) + '\t' + str(0) + '\t' + str(round(clock(),2)) + '\n' \
-                    + 'total_faults' + '\t' + str(PodStatus.total_faults) + '\t' + str(0) + '\t' + str(round(clock(),2)) + '\n' \
-                    + 'throttle' + '\t' + str(PodStatus.throttle) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'D' + '\t' + str(PodStatus.true_data['D']['val']) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'V' + '\t' + str(PodStatus.true_data['V']['val']) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'A' + '\t' + str(PodStatus.true_data['A']['val']) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'A_std_dev' + '\t' + str(PodStatus.true_data['A']['std_dev']) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'A_filter_val' + '\t' + str(PodStatus.sensor_filter['IMU1_Z']['val']) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'Clock_interval' + '\t' + str(PodStatus.poll_interval) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'Brakes' + '\t' + str(int(PodStatus.Brakes)) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'HV' + '\t' + str(int(PodStatus.HV)) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n' \
-                    + 'Vent_Sol' + '\t' + str(int(PodStatus.Vent_Sol)) + '\t' + str(0) + '\t' + str(round(clock(), 2)) + '\n'\
-                    + 'stripe_count' + '\t' + str(PodStatus.true_data['stripe_count']) + '\t' + str(0) + '\t' + str(round(clock(),2)) + '\n'
-            file.write(line)
-
-        PodStatus.log_lastwrite = clock()
+    PodStatus.ipc.publish()
 
 
 if __name__ == "__main__":
@@ -1257,9 +1073,10 @@ if __name__ == "__main__":
     if PodStatus.init is False:
         PodStatus.Quit = True
         print("Failed to init.")
+    else:
+        init_ipc()
 
     while PodStatus.Quit is False:
-        write_file()
         poll_sensors()
         filter_data()
         sensor_fusion()
@@ -1268,7 +1085,13 @@ if __name__ == "__main__":
         eval_abort()
         rec_data()
         spacex_data()
-        client.send_message(*addr, 'send_data', PodStatus.data_dump())
+        publish_state()
+
+    if PodStatus.ipc is not None:
+        PodStatus.ipc.close()
+    if PodStatus.cmd_link is not None:
+        PodStatus.cmd_link.stop()
+    PodStatus.host.stop()
 
     # DEBUG...REMOVE BEFORE FLIGHT
     print("Quitting")
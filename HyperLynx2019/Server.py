@@ -4,11 +4,9 @@
 
 import socket
 import pickle
-from queue import Queue
 import random
 import sys
 import os
-import yaml
 from time import clock
 import numpy as np
 from PyQt5.QtWidgets import QApplication, QPushButton, QTextEdit, QTableWidget
@@ -19,7 +17,9 @@ from PyQt5 import QtCore, Qt
 from PyQt5.QtWidgets import QMainWindow, QTextEdit, QTableWidget, QPushButton, QCheckBox, QSlider, QApplication, \
     QTableWidgetItem
 from gui_data_simulator import load_abort_ranges
-from network_transfer.libserver import BaseServer, ThreadedServer
+from sensor_registry import SensorRegistry
+from network_transfer.telemetry_hub import TelemetryHub
+from network_transfer.command_link import CommandClient
 # from SDA import Status
 
 # set up connection
@@ -65,23 +65,32 @@ class HyperGui(QMainWindow):
     # 'V_bad_time_elapsed'
 
     # ******* Constructor for the class *******
-    def __init__(self, host='localhost', port=5050, **kwargs):
+    def __init__(self, host='localhost', port=5050, hub=None, pod=None, **kwargs):
         super().__init__()
 
-        self.data_q = Queue()
+        # Pod telemetry comes from a TelemetryHub, shared with any other GUIs,
+        # recorders and relays; without one the GUI serves host:port itself
         self.host = host
         self.port = port
-        self.server = ThreadedServer(q=self.data_q, host=self.host, port=self.port)
-        self.server.setDaemon(True)
-        self.server.start()
+        if hub is None:
+            hub = TelemetryHub()
+            hub.serve(self.host, self.port)
+        self.hub = hub
+        self.data_sub = hub.subscribe('gui', size=64)
+
+        # Commands go to the pod over the command link (pod = (host, port) of SDA's
+        # cmd_port); the buttons send at once, from the Qt thread
+        self.link = None
+        if pod is not None:
+            self.link = CommandClient(*pod)
+            self.link.start()
 
         # static for testing, need to change with data
         self.state = ''
 
         self.abort_ranges = load_abort_ranges('abortranges.dat')
 
-        with open('sensors_config.yaml') as f:
-            tables = yaml.safe_load(f)
+        tables = SensorRegistry.from_yaml('sensors_config.yaml').gui_tables()
         self.pod_dyn_nms = tables['pod_dyn_table']
         self.pod_hlth_nms = tables['pod_health']
         self.env_tbl_nms = tables['environment_table']
@@ -246,8 +255,8 @@ class HyperGui(QMainWindow):
         self.abort_bttn.resize(90, 90)
         self.abort_bttn.move(250, 180)
 
-        # When you click abort button you stop the thread
-        self.abort_bttn.clicked.connect(self.stop)
+        # When you click abort button the pod is commanded to abort
+        self.abort_bttn.clicked.connect(self.abort_handler)
 
         # ******* This is the log text box *******
 
@@ -310,67 +319,87 @@ class HyperGui(QMainWindow):
     def start(self):
         self.state = 1
         self.timer.start()
+        self.send_command('Launch', 1)
 
     # This function will stop the thread
     def stop(self):
         self.timer.stop()
 
+    # This function sends a command to the pod, if there is a command link
+    def send_command(self, key, value):
+        if self.link is not None:
+            self.link.send(key, value)
+
+    # This function will handle when the abort button is clicked
+    def abort_handler(self):
+        self.send_command('Abort', 1)
+
     # This function will handle when bv close button is clicked
     def bv_close_handler(self):
+        self.send_command('Vent_Sol', 1)
         self.bv_close.setEnabled(False)
         self.bv_open.setEnabled(True)
         self.update()
 
     # This function will handle when bv open button is clicked
     def bv_open_handler(self):
+        self.send_command('Vent_Sol', 0)
         self.bv_close.setEnabled(True)
         self.bv_open.setEnabled(False)
         self.update()
 
     # This function will handle when res1 close button is clicked
     def res1_close_handler(self):
+        self.send_command('Res1_Sol', 0)
         self.res1_close.setEnabled(False)
         self.res1_open.setEnabled(True)
         self.update()
 
     # This function will handle when res1 open button is clicked
     def res1_open_handler(self):
+        self.send_command('Res1_Sol', 1)
         self.res1_close.setEnabled(True)
         self.res1_open.setEnabled(False)
         self.update()
 
     # This function will handle when res2 close button is clicked
     def res2_close_handler(self):
+        self.send_command('Res2_Sol', 0)
         self.res2_close.setEnabled(False)
         self.res2_open.setEnabled(True)
         self.update()
 
     # This function will handle when res2 open button is clicked
     def res2_open_handler(self):
+        self.send_command('Res2_Sol', 1)
         self.res2_close.setEnabled(True)
         self.res2_open.setEnabled(False)
         self.update()
 
     # This function will handle when hv+ off close button is clicked
     def hv_plus_off_handler(self):
+        self.send_command('HV', 0)
         self.hv_plus_off.setEnabled(False)
         self.hv_plus_on.setEnabled(True)
         self.update()
 
     # This function will handle when hv+ on button is clicked
     def hv_plus_on_handler(self):
+        self.send_command('HV', 1)
         self.hv_plus_off.setEnabled(True)
         self.hv_plus_on.setEnabled(False)
         self.update()
 
     # This function will handle when hv- off button is clicked
     def hv_minus_off_handler(self):
+        self.send_command('HV', 0)
         self.hv_minus_off.setEnabled(False)
         self.hv_minus_on.setEnabled(True)
         self.update()
 
     # This function will handle when hv- on button is clicked
     def hv_minus_on_handler(self):
+        self.send_command('HV', 1)
         self.hv_minus_off.setEnabled(True)
         self.hv_minus_on.setEnabled(False)
         self.update()
@@ -399,12 +428,17 @@ class HyperGui(QMainWindow):
         # Random number generator
         test_val = random.uniform(0, 3)
 
-        # check for new data
-        if not self.data_q.empty():
-            self.data_dict.update(self.data_q.get())
+        # check for new data, everything received since the last update
+        for seq, stamp, data in self.data_sub.drain():
+            self.data_dict.update(data)
         #     pstatus = pickle.loads(self.data_q.get())
         #     self._read_status(pstatus)
 
+        # latency breakdown of every command that reached the pod hardware
+        if self.link is not None:
+            for cmd_seq in self.link.trace.completed():
+                self.pd_log_txt.append(self.link.trace.format(cmd_seq))
+
         # update current state
         state = self.state
         self.state_tbox.setText(self._state_txt(state))
@@ -465,6 +499,7 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description='GUI for Hyperlynx 2019 pod')
     parser.add_argument('--server', help='<host>:<port>')
+    parser.add_argument('--pod', help='<host>:<port> of the pod command link')
     args = parser.parse_args()
 
     params = {
@@ -475,6 +510,9 @@ if __name__ == "__main__":
     if args.server:
         host, port = args.server.split(':')
         params.update({'host': host, 'port': int(port)})
+    if args.pod:
+        host, port = args.pod.split(':')
+        params['pod'] = (host, int(port))
 
     app = QApplication([])
     my_gui = HyperGui(**params)
@@ -0,0 +1,147 @@
+"""
+   HyperLynx: abort_table.py
+
+   Purpose:
+   One loader for abortranges.dat, shared by SDA and the GUI side
+   (gui_data_simulator, Server, Packet_Structure).  The file is tab separated,
+   one row per sensor:
+
+       Sensor  Low  High  <state flags...>  Trigger  Fault (INIT TO ZERO)  NOTES
+
+   A 1 in a state's flag column checks the sensor against [Low, High] in that
+   state.  Trigger 1 makes a fault abort the pod; Fault is the initial fault flag.
+
+   load() parses and validates the file once and compiles it into per state
+   arrays (AbortTable.arrays) and the {state: {sensor: {'Low', 'High', 'Trigger',
+   'Fault'}}} dicts SDA.eval_abort() uses (AbortTable.ranges()).  The compiled
+   table is cached by path and modification time, so later loads of an
+   unchanged file are a stat().
+
+   PreLaunch has no ranges of its own (its FC2L column is unused); it checks the
+   Launching ranges and shares their dict, so a fault latched in PreLaunch is
+   still set in Launching.
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+import os
+from collections import namedtuple
+
+import numpy
+
+# State numbers as in SDA.Status
+SafeToApproach = 1
+PreLaunch = 2
+Launching = 3
+BrakingHigh = 5
+Crawling = 6
+BrakingLow = 7
+
+HEADER = ('Sensor', 'Low', 'High', '1 - S2A', 'FC2L', '3 - Launch', '5 - Brake1', 'Postflight',
+          '6 - Crawling', '7 - Brake2', 'Trigger', 'Fault (INIT TO ZERO)')
+FLAG_COLUMNS = HEADER[3:10]
+
+# Flag column checked in each state
+STATE_COLUMNS = {SafeToApproach: '1 - S2A',
+                 Launching: '3 - Launch',
+                 BrakingHigh: '5 - Brake1',
+                 Crawling: '6 - Crawling',
+                 BrakingLow: '7 - Brake2'}
+# States using another state's ranges (same dict)
+STATE_ALIASES = {PreLaunch: Launching}
+
+# One state's ranges as arrays, rows in file order
+StateRanges = namedtuple('StateRanges', 'names low high trigger fault')
+
+_cache = {}     # {path: (mtime, AbortTable)}
+
+
+class AbortTable():
+    def __init__(self, names, values, path='abortranges.dat'):
+        """names: sensor names, values: (len(names), 11) array of the numeric columns"""
+        self.path = path
+        self.names = list(names)
+        self.values = values
+        self.low = values[:, 0]
+        self.high = values[:, 1]
+        self.flags = values[:, 2:9] == 1
+        self.trigger = values[:, 9]
+        self.fault = values[:, 10]
+
+        self.arrays = {}
+        for state, column in STATE_COLUMNS.items():
+            rows = numpy.flatnonzero(self.flags[:, FLAG_COLUMNS.index(column)])
+            self.arrays[state] = StateRanges([self.names[i] for i in rows], self.low[rows], self.high[rows],
+                                             self.trigger[rows], self.fault[rows])
+        for state, same in STATE_ALIASES.items():
+            self.arrays[state] = self.arrays[same]
+
+    @classmethod
+    def parse(cls, path='abortranges.dat'):
+        """Reads and validates the file; ValueError names the file and line of any problem"""
+        with open(path) as f:
+            lines = f.read().splitlines()
+        if not lines:
+            raise ValueError(path + ': empty abort range file')
+
+        header = tuple(col.strip() for col in lines[0].split('\t'))
+        if header[:len(HEADER)] != HEADER:
+            raise ValueError(path + ': expected columns ' + ', '.join(HEADER) + ', found ' + ', '.join(header))
+
+        names = []
+        rows = []
+        for n, line in enumerate(lines[1:], 2):
+            cols = line.split('\t')
+            name = cols[0].strip()
+            if not name:
+                continue
+            where = path + ':' + str(n) + ' ' + name
+            if name in names:
+                raise ValueError(where + ': sensor listed twice')
+            if len(cols) < len(HEADER):
+                raise ValueError(where + ': ' + str(len(cols)) + ' columns, expected ' + str(len(HEADER)))
+            try:
+                row = [float(x) for x in cols[1:len(HEADER)]]
+            except ValueError:
+                raise ValueError(where + ': non numeric value in ' + repr(cols[1:len(HEADER)]))
+            if any(x not in (0, 1) for x in row[2:]):
+                raise ValueError(where + ': state, Trigger and Fault columns must be 0 or 1')
+            if row[0] > row[1]:
+                raise ValueError(where + ': Low ' + str(row[0]) + ' is above High ' + str(row[1]))
+            names.append(name)
+            rows.append(row)
+
+        return cls(names, numpy.array(rows, dtype=float).reshape(-1, len(HEADER) - 1), path)
+
+    def ranges(self):
+        """
+        New {state: {sensor: {'Low', 'High', 'Trigger', 'Fault'}}} dicts for every
+        state.  They are the caller's to modify (SDA latches 'Fault' in them).
+        """
+        states = {}
+        for state in STATE_COLUMNS:
+            a = self.arrays[state]
+            rows = zip(a.names, a.low.tolist(), a.high.tolist(), a.trigger.tolist(), a.fault.tolist())
+            states[state] = {name: {'Low': low, 'High': high, 'Trigger': trigger, 'Fault': fault}
+                             for name, low, high, trigger, fault in rows}
+        for state, same in STATE_ALIASES.items():
+            states[state] = states[same]
+        return states
+
+
+def load(path='abortranges.dat'):
+    """Compiled AbortTable for path, parsed again only when the file has changed"""
+    key = os.path.abspath(path)
+    mtime = os.stat(key).st_mtime
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    table = AbortTable.parse(path)
+    _cache[key] = (mtime, table)
+    return table
+
+
+def load_abort_ranges(path='abortranges.dat'):
+    """{state: {sensor: {'Low', 'High', 'Trigger', 'Fault'}}} from path"""
+    return load(path).ranges()
@@ -0,0 +1,781 @@
+"""
+   HyperLynx: fake_i2c.py
+
+   Purpose:
+   In-process stand in for the pod's I2C bus, so the drivers and HyperlynxECS
+   run on any Linux box: benchmarks of the acquisition path, and repeatable
+   reproductions of bus faults such as the MLX90614 crashing the bus and the
+   MLX_RESET() recovery.
+
+       bus = FakeI2CBus.pod()                      # mux and every pod sensor
+       ecs = HyperlynxECS(i2c=bus, io=FakeGPIO(bus))
+
+   A FakeI2CBus plugs in where the real bus does:
+       bus.SMBus(1)                    smbus.SMBus API (HyperlynxECS, Lidar_Lite, MLX90614)
+       bus.get_i2c_device(address)     Adafruit_GPIO.I2C API, so the bus is passed as
+                                       i2c= to the BNO055, BMP280, BME280 and ADS1x15
+
+   Devices are register map models (TCA9548, BNO055, BMP280, BME280, MLX90614,
+   Lidar Lite v3, ADS1115, stripe counter Arduino) holding live values in
+   engineering units.  Change them with model.set(distance=250), or script them
+   with model.script('distance', values) to step through values on every read.
+
+   Faults and timing:
+       clock_hz, latency       simulated time of each transfer (bytes at the bus clock
+                               plus a fixed overhead), summed in bus.bus_time and
+                               waited out for real when realtime=True
+       model.nack(count)       the device NACKs its next count transfers (None = forever)
+       nack_rate               random NACK probability per message (seeded)
+       bus.crash(holder)       SDA held low, every transfer times out until the holder
+                               is reset through its reset pin or bus.release()
+       MLX90614Model(crash_after=N)  crashes the bus on its Nth read since reset, as
+                               the IR thermometer did in testing
+
+   Benchmark the pod acquisition loop:
+       python fake_i2c.py --cycles 1000 --clock 400000 [--state Launching --period 0.01] [--crash-after 50]
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+import errno
+import os
+import random
+import struct
+from ctypes import string_at
+from time import perf_counter
+
+import smbus
+
+
+def _int16(value):
+    return max(-32768, min(32767, int(round(value))))
+
+
+def _solve(f, target, bits=20):
+    """Raw reading in [0, 2**bits) whose compensated value f(raw) is closest to target (f monotonic)."""
+    lo, hi = 0, (1 << bits) - 1
+    rising = f(hi) > f(lo)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (f(mid) < target) == rising:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class RegisterModel():
+    """
+    Device with a byte register map.  A write sets the register pointer from
+    its first byte and stores the rest from there, a read returns bytes from
+    the pointer on; both auto increment.
+    """
+    address = None
+    reset_pin = None
+
+    def __init__(self, address=None):
+        if address is not None:
+            self.address = address
+        self.bus = None
+        self.nacks = 0              # NACK the next nacks transfers, None = forever
+        self.reads = 0
+        self.writes = 0
+        self.steps = 0
+        self._scripts = []
+        self.reset()
+
+    def reset(self):
+        """Power on register contents."""
+        self.regs = bytearray(256)
+        self.pointer = 0
+        self.update()
+
+    def update(self):
+        """Rebuild the registers from the live values."""
+        pass
+
+    def set(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.update()
+
+    def script(self, name, values):
+        """
+        Step live value name through values, one per read: an iterable (held
+        at its last value once exhausted) or a function of the step count.
+        """
+        self._scripts.append((name, values if callable(values) else iter(values)))
+
+    def step(self):
+        if not self._scripts:
+            return
+        for name, values in self._scripts:
+            if callable(values):
+                setattr(self, name, values(self.steps))
+            else:
+                for value in values:
+                    setattr(self, name, value)
+                    break
+        self.steps += 1
+        self.update()
+
+    def nack(self, count=1):
+        self.nacks = count
+
+    def ack(self):
+        if self.nacks is None:
+            return False
+        if self.nacks:
+            self.nacks -= 1
+            return False
+        return True
+
+    def register(self, reg):
+        return reg & 0xFF
+
+    def read_reg(self, reg):
+        return self.regs[reg]
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+
+    def write(self, data):
+        self.writes += 1
+        if not data:
+            return
+        self.pointer = self.register(data[0])
+        for value in data[1:]:
+            self.write_reg(self.pointer, value)
+            self.pointer = (self.pointer + 1) & 0xFF
+
+    def read(self, length):
+        self.reads += 1
+        self.step()
+        out = bytearray(length)
+        for i in range(length):
+            out[i] = self.read_reg(self.pointer)
+            self.pointer = (self.pointer + 1) & 0xFF
+        return bytes(out)
+
+
+class TCA9548Model(RegisterModel):
+    """I2C multiplexer: one control byte, bit n connects channel n."""
+    address = 0x70
+
+    def reset(self):
+        self.channels = 0
+
+    def write(self, data):
+        self.writes += 1
+        if data:
+            self.channels = data[-1]
+
+    def read(self, length):
+        self.reads += 1
+        return bytes([self.channels]) * length
+
+
+class BNO055Model(RegisterModel):
+    """BNO055 in a fusion mode, fully calibrated.  Vectors in the driver's units."""
+    address = 0x28
+
+    def __init__(self, address=None):
+        self.accelerometer = (0.0, 0.0, 9.81)       # [m/s^2]
+        self.magnetometer = (0.0, 0.0, 0.0)         # [uT]
+        self.gyroscope = (0.0, 0.0, 0.0)            # [deg/s]
+        self.euler = (0.0, 0.0, 0.0)                # heading, roll, pitch [deg]
+        self.quaternion = (0.0, 0.0, 0.0, 1.0)      # x, y, z, w as in BNO055Motion
+        self.linear_acceleration = (0.0, 0.0, 0.0)  # [m/s^2]
+        self.gravity = (0.0, 0.0, 9.81)             # [m/s^2]
+        self.calibration = 0xFF                     # sys, gyro, accel, mag all 3
+        super().__init__(address)
+
+    def reset(self):
+        self.regs = bytearray(256)
+        self.pointer = 0
+        self.regs[0x00:0x04] = bytes([0xA0, 0xFB, 0x32, 0x0F])    # chip, accel, mag, gyro IDs
+        self.regs[0x36] = 0x0F                                      # self test passed
+        self.regs[0x39] = 0x05                                      # fusion algorithm running
+        self.update()
+
+    def update(self):
+        x, y, z, w = self.quaternion
+        values = ([v * 100 for v in self.accelerometer] +
+                  [v * 16 for v in self.magnetometer] +
+                  [v * 900 for v in self.gyroscope] +
+                  [v * 16 for v in self.euler] +
+                  [v * (1 << 14) for v in (w, x, y, z)] +
+                  [v * 100 for v in self.linear_acceleration] +
+                  [v * 100 for v in self.gravity])
+        struct.pack_into('<22h', self.regs, 0x08, *[_int16(v) for v in values])
+        self.regs[0x35] = self.calibration
+
+    def write_reg(self, reg, value):
+        if reg == 0x3F and value & 0x20:        # SYS_TRIGGER reset
+            self.reset()
+        else:
+            self.regs[reg] = value
+
+
+class BMP280Model(RegisterModel):
+    """
+    BMP280 in normal mode with the datasheet example trimming.  temperature [C]
+    and pressure [Pa] are turned into the raw readings that compensate to them.
+    """
+    address = 0x77
+    chip_id = 0x58
+    calibration = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+
+    def __init__(self, address=None, temperature=25.0, pressure=101325.0):
+        self.temperature = temperature
+        self.pressure = pressure
+        super().__init__(address)
+
+    def reset(self):
+        self.regs = bytearray(256)
+        self.pointer = 0
+        self.regs[0xD0] = self.chip_id
+        struct.pack_into('<HhhHhhhhhhhh', self.regs, 0x88, *self.calibration)
+        self.update()
+
+    def _t_fine(self, adc_T):
+        T1, T2, T3 = self.calibration[:3]
+        var1 = (adc_T / 16384.0 - T1 / 1024.0) * T2
+        var2 = (adc_T / 131072.0 - T1 / 8192.0) ** 2 * T3
+        return var1 + var2
+
+    def _pressure(self, adc_P, t_fine):
+        P1, P2, P3, P4, P5, P6, P7, P8, P9 = self.calibration[3:]
+        var1 = t_fine / 2.0 - 64000.0
+        var2 = var1 * var1 * P6 / 32768.0
+        var2 = var2 + var1 * P5 * 2.0
+        var2 = var2 / 4.0 + P4 * 65536.0
+        var1 = (P3 * var1 * var1 / 524288.0 + P2 * var1) / 524288.0
+        var1 = (1.0 + var1 / 32768.0) * P1
+        p = 1048576.0 - adc_P
+        p = (p - var2 / 4096.0) * 6250.0 / var1
+        return p + (P9 * p * p / 2147483648.0 + p * P8 / 32768.0 + P7) / 16.0
+
+    def update(self):
+        adc_T = _solve(lambda adc: self._t_fine(adc) / 5120.0, self.temperature)
+        t_fine = self._t_fine(adc_T)
+        adc_P = _solve(lambda adc: self._pressure(adc, t_fine), self.pressure)
+        self.regs[0xF7:0xFD] = struct.pack('>I', adc_P << 4)[1:] + struct.pack('>I', adc_T << 4)[1:]
+
+
+class BME280Model(BMP280Model):
+    """BMP280Model plus the BME280 humidity registers (humidity is raw, adc_H)."""
+    chip_id = 0x60
+
+    def __init__(self, address=None, temperature=25.0, pressure=101325.0, adc_H=0x6000):
+        self.adc_H = adc_H
+        super().__init__(address, temperature, pressure)
+
+    def reset(self):
+        super().reset()
+        self.regs[0xA1] = 75                                        # H1
+        struct.pack_into('<hB', self.regs, 0xE1, 362, 0)            # H2, H3
+        self.regs[0xE4:0xE8] = bytes([0x14, 0x04, 0x00, 0x1E])      # H4 = 324, H5 = 0, H6 = 30
+
+    def update(self):
+        super().update()
+        struct.pack_into('>H', self.regs, 0xFD, self.adc_H)
+
+
+class MLX90614Model(RegisterModel):
+    """
+    MLX90614 IR thermometer, SMBus word registers with PEC.  crash_after makes
+    it hold the bus low on that read after a reset, until reset_pin is pulsed.
+    """
+    address = 0x5B
+
+    def __init__(self, address=None, object_temp=25.0, ambient_temp=25.0,
+                 reset_pin=None, crash_after=None):
+        self.object_temp = object_temp          # [C]
+        self.ambient_temp = ambient_temp        # [C]
+        self.reset_pin = reset_pin
+        self.crash_after = crash_after
+        super().__init__(address)
+
+    def reset(self):
+        self.pointer = 0
+        self.since_reset = 0
+
+    def write_reg(self, reg, value):
+        pass                                    # EEPROM writes not modelled
+
+    def _pec(self, data):
+        crc = 0
+        for byte in data:
+            crc ^= byte
+            for _ in range(8):
+                crc = (crc << 1) ^ 0x07 if crc & 0x80 else crc << 1
+                crc &= 0xFF
+        return crc
+
+    def read(self, length):
+        self.reads += 1
+        self.since_reset += 1
+        self.step()
+        if self.crash_after is not None and self.since_reset >= self.crash_after and self.bus:
+            self.bus.crash(self)
+        temps = {0x06: self.ambient_temp, 0x07: self.object_temp, 0x08: self.object_temp}
+        word = int(round((temps.get(self.pointer, -273.15) + 273.15) / 0.02)) & 0xFFFF
+        data = [word & 0xFF, word >> 8]
+        data.append(self._pec([self.address << 1, self.pointer, self.address << 1 | 1] + data))
+        return bytes(data[:length])
+
+
+class LidarLiteModel(RegisterModel):
+    """
+    Lidar Lite v3.  A measurement command copies distance [cm] to the result
+    registers and shows busy for busy_reads status reads; running free (loop
+    count 0xff) every change of distance is measured at once.
+    """
+    address = 0x62
+
+    def __init__(self, address=None, distance=500, busy_reads=1):
+        self.distance = distance
+        self.busy_reads = busy_reads
+        self._busy = 0
+        self._last = distance
+        super().__init__(address)
+
+    def register(self, reg):
+        return reg & 0x7F                       # bit 7 is the auto increment flag
+
+    def _measure(self):
+        velocity = max(-128, min(127, int(self.distance - self._last)))
+        self._last = self.distance
+        self.regs[0x09] = velocity & 0xFF
+        struct.pack_into('>H', self.regs, 0x0F, int(self.distance) & 0xFFFF)
+
+    def reset(self):
+        super().reset()
+        self._measure()
+
+    def update(self):
+        if self.regs[0x11] == 0xFF:
+            self._measure()
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+        if reg == 0x00 and value == 0x04:
+            self._busy = self.busy_reads
+            self._measure()
+
+    def read_reg(self, reg):
+        if reg == 0x01:
+            busy = 1 if self._busy else 0
+            self._busy = max(self._busy - 1, 0)
+            return (self.regs[0x01] & 0xFE) | busy
+        return self.regs[reg]
+
+
+class ADS1115Model(RegisterModel):
+    """
+    ADS1115 in single shot mode.  Inputs ain0..ain3 [V] are sampled when a
+    conversion starts, which then shows busy for busy_reads config reads.
+    Scripts step once per conversion.
+    """
+    address = 0x48
+    FSR = (6.144, 4.096, 2.048, 1.024, 0.512, 0.256, 0.256, 0.256)
+    DIFFERENTIAL = ((0, 1), (0, 3), (1, 3), (2, 3))
+
+    def __init__(self, address=None, ain=(0.0, 0.0, 0.0, 0.0), busy_reads=1):
+        self.ain0, self.ain1, self.ain2, self.ain3 = ain
+        self.busy_reads = busy_reads
+        super().__init__(address)
+
+    def reset(self):
+        self.words = [0x0000, 0x0583, 0x8000, 0x7FFF]     # conversion, config, lo, hi thresh
+        self.pointer = 0
+        self._busy = 0
+
+    def _convert(self):
+        self.step()
+        config = self.words[1]
+        mux = (config >> 12) & 0x07
+        ain = (self.ain0, self.ain1, self.ain2, self.ain3)
+        if mux >= 4:
+            volts = ain[mux - 4]
+        else:
+            pos, neg = self.DIFFERENTIAL[mux]
+            volts = ain[pos] - ain[neg]
+        fsr = self.FSR[(config >> 9) & 0x07]
+        self.words[0] = _int16(volts / fsr * 32768) & 0xFFFF
+        self._busy = self.busy_reads
+
+    def write(self, data):
+        self.writes += 1
+        if not data:
+            return
+        self.pointer = data[0] & 0x03
+        if len(data) >= 3:
+            value = data[1] << 8 | data[2]
+            if self.pointer == 1:
+                self.words[1] = value & 0x7FFF
+                if value & 0x8000:
+                    self._convert()
+            else:
+                self.words[self.pointer] = value
+
+    def read(self, length):
+        self.reads += 1
+        value = self.words[self.pointer]
+        if self.pointer == 1:
+            if self._busy:
+                self._busy -= 1
+            else:
+                value |= 0x8000                 # OS bit: no conversion in progress
+        return bytes([value >> 8, value & 0xFF] * ((length + 1) // 2))[:length]
+
+
+class ArduinoMicroModel(RegisterModel):
+    """Stripe counter: every read byte is count (8 bit)."""
+    address = 0x5F
+
+    def __init__(self, address=None, count=0):
+        self.count = count
+        super().__init__(address)
+
+    def write(self, data):
+        self.writes += 1
+
+    def read(self, length):
+        self.reads += 1
+        self.step()
+        return bytes([int(self.count) & 0xFF]) * length
+
+
+class FakeI2CBus():
+    def __init__(self, mux=True, clock_hz=100000, latency=0.0, realtime=False,
+                 nack_rate=0.0, seed=0):
+        self.mux = TCA9548Model() if mux else None
+        self.byte_time = 9.0 / clock_hz         # [s] per byte, with its ACK bit
+        self.latency = latency                  # [s] fixed cost of each transfer
+        self.realtime = realtime
+        self.nack_rate = nack_rate
+        self.random = random.Random(seed)
+        self.channels = {}                      # mux channel (None = main bus) -> {address: model}
+        self.models = {}                        # name -> model
+        self.crashed_by = None
+        self.reset_stats()
+
+    @classmethod
+    def pod(cls, **kwargs):
+        """The pod's bus: mux and sensors on the channels HyperlynxECS uses."""
+        bus = cls(**kwargs)
+        bus.add(LidarLiteModel(), 0, 'Lidar')                   # tcaNOSE
+        bus.add(BMP280Model(0x77), 0, 'BMP')
+        bus.add(ArduinoMicroModel(), 0, 'Micro')
+        bus.add(BME280Model(0x76), 1, 'BMEL')                   # tcaPVL
+        bus.add(MLX90614Model(reset_pin=19), 2, 'Therm')        # tcaPVR
+        bus.add(ADS1115Model(ain=(3.61, 0.59, 0.59, 0.0)), 2, 'ADC')
+        bus.add(BME280Model(0x77), 3, 'BMER')                   # tcaPVR2
+        bus.add(BNO055Model(0x28), 3, 'IMU1')
+        bus.add(BNO055Model(0x29), 3, 'IMU2')
+        return bus
+
+    def add(self, model, channel=None, name=None):
+        """Attach model behind mux channel (None = directly on the bus)."""
+        model.bus = self
+        self.channels.setdefault(channel, {})[model.address] = model
+        if name is not None:
+            self.models[name] = model
+        return model
+
+    def __getitem__(self, name):
+        return self.models[name]
+
+    def reset_stats(self):
+        self.transfers = 0
+        self.messages = 0
+        self.bytes = 0
+        self.nacks = 0
+        self.bus_time = 0.0                     # [s] simulated time on the wire
+
+    def find(self, address):
+        """Model answering address with the mux channels as they are now set."""
+        if self.mux is not None and address == self.mux.address:
+            return self.mux
+        model = self.channels.get(None, {}).get(address)
+        if model is not None or self.mux is None:
+            return model
+        for channel, models in self.channels.items():
+            if channel is not None and self.mux.channels & (1 << channel) and address in models:
+                return models[address]
+        return None
+
+    def crash(self, holder=None):
+        self.crashed_by = holder if holder is not None else self
+
+    def release(self):
+        self.crashed_by = None
+
+    def reset_pin(self, pin):
+        """A reset pin was pulsed: reset its devices, which frees the bus if one held it."""
+        for models in self.channels.values():
+            for model in models.values():
+                if model.reset_pin == pin:
+                    model.reset()
+                    if self.crashed_by is model:
+                        self.release()
+
+    def transfer(self, messages):
+        """
+        One combined transaction, like an I2C_RDWR ioctl.  messages is a list of
+        (address, read, data) with the length to read for reads.  Returns the
+        bytes of each read; raises IOError on the first NACK like the kernel.
+        """
+        nbytes = 0
+        for address, read, data in messages:
+            nbytes += 1 + (data if read else len(data))
+        duration = self.latency + nbytes * self.byte_time
+        self.transfers += 1
+        self.messages += len(messages)
+        self.bytes += nbytes
+        self.bus_time += duration
+        if self.realtime:
+            end = perf_counter() + duration
+            while perf_counter() < end:
+                pass
+        results = []
+        for address, read, data in messages:
+            self._check_crash()
+            model = self.find(address)
+            if model is None or not model.ack() or \
+                    (self.nack_rate and self.random.random() < self.nack_rate):
+                self.nacks += 1
+                raise IOError(errno.EREMOTEIO, os.strerror(errno.EREMOTEIO))
+            if read:
+                results.append(model.read(data))
+            else:
+                model.write(bytes(data))
+        self._check_crash()
+        return results
+
+    def _check_crash(self):
+        if self.crashed_by is not None:
+            raise IOError(errno.ETIMEDOUT, 'I2C bus held low')
+
+    def SMBus(self, bus=1):
+        return FakeSMBus(self, bus)
+
+    def get_i2c_device(self, address, busnum=None, i2c_interface=None, **kwargs):
+        return FakeI2CDevice(address, self.SMBus(busnum if busnum is not None else 1))
+
+
+class _FakeDeviceFile():
+    """What FakeSMBus has in place of the open /dev/i2c-N file."""
+    def __init__(self, owner):
+        self.owner = owner
+
+    def read(self, length):
+        return self.owner.i2c.transfer([(self.owner._addr, True, length)])[0]
+
+    def write(self, data):
+        self.owner.i2c.transfer([(self.owner._addr, False, bytes(data))])
+
+    def close(self):
+        pass
+
+
+class FakeSMBus(smbus.SMBus):
+    """smbus.SMBus on a FakeI2CBus; everything above the kernel calls is the real class."""
+    def __init__(self, i2c, bus=1):
+        self.i2c = i2c
+        super().__init__(bus)
+
+    def open(self, bus):
+        self._device = _FakeDeviceFile(self)
+        self._fd = -1
+        self._addr = None
+
+    def _select_device(self, addr):
+        self._addr = addr & 0x7F
+
+    def execute(self, transaction):
+        assert self._device is not None, 'Bus must be opened before operations are made against it!'
+        messages = []
+        for i in range(transaction.request.nmsgs):
+            msg = transaction._msgs[i]
+            if msg.flags & smbus.I2C_M_RD:
+                messages.append((msg.addr, True, msg.len))
+            else:
+                messages.append((msg.addr, False, string_at(msg.buf, msg.len) if msg.len else b''))
+        for view, data in zip(transaction.results, self.i2c.transfer(messages)):
+            view[:] = data
+        return transaction.result
+
+    def write_quick(self, addr):
+        assert self._device is not None, 'Bus must be opened before operations are made against it!'
+        self.i2c.transfer([(addr, False, b'')])
+
+    def process_call(self, addr, cmd, val):
+        assert self._device is not None, 'Bus must be opened before operations are made against it!'
+        data = self.i2c.transfer([(addr, False, struct.pack('=BH', cmd & 0xFF, val & 0xFFFF)),
+                                  (addr, True, 2)])[0]
+        return struct.unpack('=H', data)[0]
+
+
+class FakeI2CDevice():
+    """Adafruit_GPIO.I2C.Device API on a FakeSMBus, for the Adafruit style drivers."""
+    def __init__(self, address, bus):
+        self._address = address
+        self._bus = bus
+
+    def writeRaw8(self, value):
+        self._bus.write_byte(self._address, value & 0xFF)
+
+    def write8(self, register, value):
+        self._bus.write_byte_data(self._address, register, value & 0xFF)
+
+    def write16(self, register, value):
+        self._bus.write_word_data(self._address, register, value & 0xFFFF)
+
+    def writeList(self, register, data):
+        self._bus.write_i2c_block_data(self._address, register, data)
+
+    def readList(self, register, length):
+        return self._bus.read_i2c_block_data(self._address, register, length)
+
+    def readRaw8(self):
+        return self._bus.read_byte(self._address) & 0xFF
+
+    def readU8(self, register):
+        return self._bus.read_byte_data(self._address, register) & 0xFF
+
+    def readS8(self, register):
+        result = self.readU8(register)
+        return result - 256 if result > 127 else result
+
+    def readU16(self, register, little_endian=True):
+        result = self._bus.read_word_data(self._address, register) & 0xFFFF
+        if not little_endian:
+            result = ((result << 8) & 0xFF00) + (result >> 8)
+        return result
+
+    def readS16(self, register, little_endian=True):
+        result = self.readU16(register, little_endian)
+        return result - 65536 if result > 32767 else result
+
+    def readU16LE(self, register):
+        return self.readU16(register, little_endian=True)
+
+    def readU16BE(self, register):
+        return self.readU16(register, little_endian=False)
+
+    def readS16LE(self, register):
+        return self.readS16(register, little_endian=True)
+
+    def readS16BE(self, register):
+        return self.readS16(register, little_endian=False)
+
+
+class FakeGPIO():
+    """
+    RPi.GPIO stand in for HyperlynxECS(io=...).  Keeps every pin's level and a
+    history of outputs; a pin going LOW to HIGH releases the bus devices using
+    it as their reset pin.
+    """
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+
+    def __init__(self, bus=None):
+        self.bus = bus
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        self.history = []                       # (perf_counter(), pin, level)
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, initial=LOW, pull_up_down=PUD_OFF):
+        self.directions[pin] = direction
+        if direction == self.OUT:
+            self.levels[pin] = initial
+        else:
+            self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def output(self, pin, value):
+        value = self.HIGH if value else self.LOW
+        previous = self.levels.get(pin, self.LOW)
+        self.levels[pin] = value
+        self.history.append((perf_counter(), pin, value))
+        if self.bus is not None and previous == self.LOW and value == self.HIGH:
+            self.bus.reset_pin(pin)
+
+    def input(self, pin):
+        return self.levels.get(pin, self.LOW)
+
+    def cleanup(self):
+        self.directions.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+    import collections
+    from Hyperlynx_ECS import HyperlynxECS
+    from sensor_registry import SensorRegistry
+
+    parser = argparse.ArgumentParser(description='Pod sensor acquisition on a simulated I2C bus')
+    parser.add_argument('--cycles', type=int, default=1000)
+    parser.add_argument('--clock', type=int, default=100000, help='I2C clock [Hz]')
+    parser.add_argument('--latency', type=float, default=0.0, help='fixed cost per transfer [s]')
+    parser.add_argument('--realtime', action='store_true', help='wait out the simulated bus time')
+    parser.add_argument('--nack-rate', type=float, default=0.0, help='random NACK probability per message')
+    parser.add_argument('--crash-after', type=int, default=None,
+                        help='MLX90614 holds the bus low on this read after each reset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--state', default=None,
+                        help='poll at this pod state\'s rates (e.g. Launching), default every channel every cycle')
+    parser.add_argument('--period', type=float, default=0.0, help='loop period [s], 0 = free running')
+    args = parser.parse_args()
+
+    bus = FakeI2CBus.pod(clock_hz=args.clock, latency=args.latency, realtime=args.realtime,
+                         seed=args.seed)
+    system = HyperlynxECS(i2c=bus, io=FakeGPIO(bus))
+    system.initializeIO()
+    system.initializeSensors()
+    # Faults start with the loop, initializeSensors() is not built to survive them
+    bus.nack_rate = args.nack_rate
+    bus['Therm'].crash_after = args.crash_after
+    # RPi health is not on the bus
+    host = collections.defaultdict(float)
+    states = {args.state: args.state} if args.state else None
+    poller = SensorRegistry.from_yaml('sensors_config.yaml').bind(system, states=states,
+                                                                  getters={'getHostHealth': lambda: host})
+
+    sensor_data = {}
+    timings = []
+    crashed = 0
+    bus.reset_stats()
+    for _ in range(args.cycles):
+        start = perf_counter()
+        poller.poll(sensor_data, start if args.state else None, args.state)
+        system.statusCheck()
+        timings.append(perf_counter() - start)
+        crashed += bus.crashed_by is not None
+        while perf_counter() < start + args.period:
+            pass
+    timings.sort()
+    n = len(timings)
+    print('cycles: %d   loop [us] mean %.1f  p99 %.1f  max %.1f' %
+          (n, sum(timings) / n * 1e6, timings[int(0.99 * (n - 1))] * 1e6, timings[-1] * 1e6))
+    print('per cycle: %.1f transfers  %.1f messages  %.1f bytes  %.1f us on the bus at %d Hz' %
+          (bus.transfers / n, bus.messages / n, bus.bytes / n, bus.bus_time / n * 1e6, args.clock))
+    print('NACKs: %d   cycles ending with the bus crashed: %d   MLX resets: %d' %
+          (bus.nacks, crashed, system.MLXRST))
@@ -0,0 +1,230 @@
+"""
+   HyperLynx: filter_bank.py
+
+   Purpose:
+   Per channel sensor filters for SDA.filter_data().  Each channel declares its
+   filter (or a chain of filters) with the 'filter' key of its entry in
+   sensors_config.yaml (see sensor_registry.py):
+
+       IMU1_Z:           {..., filter: {type: hampel, window: 7, k: 3}}
+       Brake_Pressure:   {..., filter: [{type: median, window: 5}, {type: moving_average, window: 10}]}
+       PV_Left_Pressure: {..., filter: {type: exponential, tau: 0.5}}
+
+   Filter types:
+       moving_average  window          mean of the last window samples
+       median          window          median of the last window samples
+       exponential     alpha or tau    first order low pass (tau in seconds)
+       hampel          window, k       replaces samples more than k scaled MADs
+                                       from the window median with the median
+       rate_clamp      max_rate        limits the change per second
+
+   All windows are preallocated rings updated one sample at a time.  The median
+   and Hampel filters keep a sorted copy of the window, so each update is one
+   binary search removal and one insertion instead of a full sort.
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+from bisect import bisect_left, insort
+
+
+class MovingAverage():
+    def __init__(self, window=10):
+        self.window = int(window)
+        self.reset()
+
+    def reset(self):
+        self.ring = [0.0] * self.window
+        self.i = 0
+        self.n = 0
+        self.total = 0.0
+
+    def update(self, x, dt=0):
+        if self.n == self.window:
+            self.total -= self.ring[self.i]
+        else:
+            self.n += 1
+        self.ring[self.i] = x
+        self.total += x
+        self.i += 1
+        if self.i == self.window:
+            self.i = 0
+            if self.n == self.window:
+                self.total = sum(self.ring)     # drop accumulated rounding once per lap
+        return self.total / self.n
+
+
+class _SortedWindow():
+    """Ring of the last window samples plus the same samples kept in sorted order."""
+    def __init__(self, window=5):
+        self.window = int(window)
+        self.reset()
+
+    def reset(self):
+        self.ring = [0.0] * self.window
+        self.sorted = []
+        self.i = 0
+
+    def push(self, x):
+        if len(self.sorted) == self.window:
+            del self.sorted[bisect_left(self.sorted, self.ring[self.i])]
+        self.ring[self.i] = x
+        insort(self.sorted, x)
+        self.i += 1
+        if self.i == self.window:
+            self.i = 0
+
+    def median(self):
+        s = self.sorted
+        n = len(s)
+        mid = n // 2
+        if n % 2:
+            return s[mid]
+        return 0.5 * (s[mid - 1] + s[mid])
+
+
+class MedianFilter(_SortedWindow):
+    def update(self, x, dt=0):
+        self.push(x)
+        return self.median()
+
+
+class HampelFilter(_SortedWindow):
+    def __init__(self, window=7, k=3.0):
+        self.k = k * 1.4826         # scale MAD to a standard deviation for normal noise
+        super().__init__(window)
+
+    def mad(self, m):
+        """Median absolute deviation from m, walking outwards from m in the sorted window."""
+        s = self.sorted
+        n = len(s)
+        hi = bisect_left(s, m)
+        lo = hi - 1
+        d = 0.0
+        for _ in range(n // 2 + 1):
+            if lo >= 0 and (hi >= n or m - s[lo] <= s[hi] - m):
+                d = m - s[lo]
+                lo -= 1
+            else:
+                d = s[hi] - m
+                hi += 1
+        return d
+
+    def update(self, x, dt=0):
+        self.push(x)
+        m = self.median()
+        if abs(x - m) > self.k * self.mad(m):
+            return m
+        return x
+
+
+class ExponentialFilter():
+    def __init__(self, alpha=None, tau=None):
+        if alpha is None and tau is None:
+            raise ValueError('exponential filter needs alpha or tau')
+        self.alpha = alpha
+        self.tau = tau
+        self.reset()
+
+    def reset(self):
+        self.y = None
+
+    def update(self, x, dt=0):
+        if self.y is None:
+            self.y = x
+        else:
+            alpha = self.alpha if self.alpha is not None else dt / (self.tau + dt)
+            self.y += alpha * (x - self.y)
+        return self.y
+
+
+class RateClamp():
+    def __init__(self, max_rate):
+        self.max_rate = max_rate        # [units/s]
+        self.reset()
+
+    def reset(self):
+        self.y = None
+
+    def update(self, x, dt=0):
+        if self.y is None:
+            self.y = x
+        else:
+            step = self.max_rate * dt
+            if x > self.y + step:
+                self.y += step
+            elif x < self.y - step:
+                self.y -= step
+            else:
+                self.y = x
+        return self.y
+
+
+FILTER_TYPES = {
+    'moving_average': MovingAverage,
+    'median': MedianFilter,
+    'hampel': HampelFilter,
+    'exponential': ExponentialFilter,
+    'rate_clamp': RateClamp,
+}
+
+
+def make_filter(spec):
+    """Build one filter from its config dict, e.g. {'type': 'median', 'window': 5}"""
+    spec = dict(spec)
+    kind = spec.pop('type')
+    if kind not in FILTER_TYPES:
+        raise ValueError('unknown filter type: ' + str(kind))
+    return FILTER_TYPES[kind](**spec)
+
+
+class FilterBank():
+    """
+    Holds the filter chain for every configured channel.  Channels without a
+    filter are passed through untouched by SDA.
+    """
+    def __init__(self, config):
+        self.chains = {}
+        for key, spec in (config or {}).items():
+            specs = spec if isinstance(spec, list) else [spec]
+            self.chains[key] = [make_filter(s) for s in specs]
+        self.items = list(self.chains.items())
+
+    @classmethod
+    def from_yaml(cls, path='sensors_config.yaml'):
+        from sensor_registry import SensorRegistry
+        return cls(SensorRegistry.from_yaml(path).filter_config())
+
+    def __contains__(self, key):
+        return key in self.chains
+
+    def update(self, key, x, dt=0):
+        for stage in self.chains[key]:
+            x = stage.update(x, dt)
+        return x
+
+    def apply(self, sensor_data, sensor_filter, dt=0, skip=(), sample_dt=None):
+        """
+        Filter every configured channel of sensor_data into sensor_filter[key]['val'].
+        Channels in skip were not read this cycle and hold their filtered value;
+        sample_dt {key: dt} overrides dt for channels read at their own rate.
+        """
+        for key, chain in self.items:
+            if key in skip:
+                continue
+            x = sensor_data.get(key)
+            if x is None or x != x:         # missing or NaN: hold the last value
+                continue
+            if sample_dt is not None:
+                x_dt = sample_dt.get(key, dt)
+            else:
+                x_dt = dt
+            for stage in chain:
+                x = stage.update(x, x_dt)
+            sensor_filter[key]['val'] = x
+
+    def reset(self, *keys):
+        for key in keys or self.chains:
+            for stage in self.chains.get(key, ()):
+                stage.reset()
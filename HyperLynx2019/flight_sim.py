@@ -14,6 +14,10 @@ def sim(PodStatus):
 
     print("In Flight Simulation")
 
+    # Lidar sees the end of the tube
+    PodStatus.sensor_data['LIDAR'] = PodStatus.para_max_tube_length - PodStatus.true_data['D']['val']
+    if PodStatus.sensor_data['LIDAR'] > 150: PodStatus.sensor_data['LIDAR'] = 150
+
     # Evaluate HV status
     if (PodStatus.cmd_int['HV'] == 1):
         PodStatus.sensor_data['SD_HVBusData_BusVoltage'] = 500
@@ -5,6 +5,8 @@
 import numpy as np
 import pandas as pd
 import argparse
+from sensor_registry import SensorRegistry
+import abort_table
 
 col_to_state = {'1 - S2A': "SafeToApproach",
                 '2 - FC2l': "",
@@ -21,12 +23,7 @@ BrakingHigh = 5
 Crawling = 6
 BrakingLow = 7
 
-sensors = ['LVBatt_Temp', 'LVBatt_Current', 'LVBatt_Voltage', 'PV_Left_Temp',
-           'PV_Left_Pressure', 'PV_Right_Temp', 'PV_Right_Pressure',
-           'Ambient_Pressure', 'IMU1_X', 'IMU1_Y', 'IMU1_Z', 'IMU2_X', 'IMU2_Y',
-           'IMU2_Z', 'LIDAR', 'RPi_Disk_Space_Free', 'RPi_Disk_Space_Used',
-           'RPi_Proc_Load', 'RPi_Mem_Load', 'RPi_Mem_Free', 'RPi_Mem_Used',
-           'Brake_Pressure', 'SD_MotorData_MotorRPM']
+sensors = SensorRegistry.from_yaml('sensors_config.yaml').sensor_names()
 
 sensor_filters = []
 
@@ -35,17 +32,7 @@ sensor_true = []
 command_lst = []
 
 def load_abort_ranges(file):
-    df = pd.read_csv(file, sep='\t').set_index('Sensor')
-    df.columns = [col.strip() for col in df.columns]
-    df.rename(columns={'Fault (INIT TO ZERO)':'Fault'}, inplace=True)
-    values = ['Low', 'High', 'Trigger', 'Fault']
-    states = {
-        SafeToApproach: df.loc[df['1 - S2A'] == 1, values].to_dict('index'),
-        Launching: df.loc[df['3 - Launch'] == 1, values].to_dict('index'),
-        BrakingHigh:df.loc[df['5 - Brake1'] == 1, values].to_dict('index'),
-        Crawling: df.loc[df['6 - Crawling'] == 1, values].to_dict('index'),
-        BrakingLow:df.loc[df['7 - Brake2'] == 1, values].to_dict('index')}
-    return states
+    return abort_table.load_abort_ranges(file)
 
 
 def load_data_log(file):
@@ -87,14 +74,7 @@ class DataSimulator():
     BrakingLow = 7
 
     def __init__(self):
-        self.sensors = [
-            'LVBatt_Temp', 'LVBatt_Current', 'LVBatt_Voltage', 'PV_Left_Temp',
-            'PV_Left_Pressure', 'PV_Right_Temp', 'PV_Right_Pressure',
-            'Ambient_Pressure', 'IMU1_X', 'IMU1_Y', 'IMU1_Z', 'IMU2_X', 'IMU2_Y',
-            'IMU2_Z', 'LIDAR', 'RPi_Disk_Space_Free', 'RPi_Disk_Space_Used',
-            'RPi_Proc_Load', 'RPi_Mem_Load', 'RPi_Mem_Free', 'RPi_Mem_Used',
-            'Brake_Pressure', 'SD_MotorData_MotorRPM'
-        ]
+        self.sensors = sensors
 
         self.sensor_filters = []
 
@@ -111,16 +91,7 @@ class DataSimulator():
         self.poll_interval = 0
 
     def load_abort_ranges(self, file):
-       df = pd.read_csv(file, sep='\t').set_index('Sensor')
-       df.columns = [col.strip() for col in df.columns]
-       df.rename(columns={'Fault (INIT TO ZERO)':'Fault'}, inplace=True)
-       values = ['Low', 'High', 'Trigger', 'Fault']
-       self.abort_ranges = {
-           SafeToApproach: df.loc[df['1 - S2A'] == 1, values].to_dict('index'),
-           Launching: df.loc[df['3 - Launch'] == 1, values].to_dict('index'),
-           BrakingHigh:df.loc[df['5 - Brake1'] == 1, values].to_dict('index'),
-           Crawling: df.loc[df['6 - Crawling'] == 1, values].to_dict('index'),
-           BrakingLow:df.loc[df['7 - Brake2'] == 1, values].to_dict('index')}
+       self.abort_ranges = abort_table.load_abort_ranges(file)
 
     def load_data_log(self, file):
        df = pd.read_csv(file, sep='\t')
@@ -0,0 +1,146 @@
+"""
+   HyperLynx: host_health.py
+
+   Purpose:
+   Raspberry Pi health for the RPi_* channels, sampled by a background thread so
+   none of the /proc, statvfs or sysfs reads happen on the control path.  About
+   once a second HostMonitor samples
+
+       disk used/free, CPU and memory load     psutil
+       SoC temperature                         /sys/class/thermal
+       CPU time of each thread                 psutil (/proc/<pid>/task)
+       garbage collector pauses                gc.callbacks
+       control loop overruns                   loop(), called once per loop
+
+   and swaps in a new snapshot dict.  The channels read it with getHostHealth
+   (see sensors_config.yaml), which is snapshot(): no I/O, just the latest dict.
+
+   Window values (CPU %, GC time, overruns, maxima) cover the time since the
+   previous sample.
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+import gc
+import os
+import threading
+from time import perf_counter
+
+import psutil
+
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+
+
+class HostMonitor(threading.Thread):
+    def __init__(self, period=1.0, loop_budget=0.01, thermal_zone=THERMAL_ZONE):
+        super().__init__(name='host_health', daemon=True)
+        self.period = period                # [s] between samples
+        self.loop_budget = loop_budget      # [s] control loop intervals longer than this are overruns
+        self.thermal_zone = thermal_zone
+        self.process = psutil.Process()
+        self.main_tid = os.getpid()         # on Linux the main thread's id is the pid
+        self.stop_event = threading.Event()
+
+        # Cumulative counters, written by loop() and the gc callback in the threads
+        # they run in.  Each has one writer; the sampler only reads them.
+        self.loops = 0
+        self.overruns = 0
+        self.gc_count = 0
+        self.gc_time = 0.0                  # [s]
+        # Window maxima, swapped back to 0 by the sampler.  A loop or collection
+        # finishing during the swap can be missed; it is only a health readout.
+        self.loop_max = 0.0                 # [s]
+        self.gc_max = 0.0                   # [s]
+        self._gc_start = 0.0
+
+        self.cpu_times = {}                 # {thread id: user + system time [s]} at the last sample
+        self.thread_cpu = {}                # {thread id: % of one core} over the last window
+        self.sample_time = None
+        self._last = (0, 0, 0, 0.0)         # loops, overruns, gc_count, gc_time at the last sample
+        self.latest = {}
+        self.sample()
+
+    def snapshot(self):
+        """Latest health sample, the getHostHealth getter"""
+        return self.latest
+
+    def loop(self, interval):
+        """Called once per control loop with its interval [s]"""
+        self.loops += 1
+        if interval > self.loop_budget:
+            self.overruns += 1
+        if interval > self.loop_max:
+            self.loop_max = interval
+
+    def _gc(self, phase, info):
+        if phase == 'start':
+            self._gc_start = perf_counter()
+        else:
+            pause = perf_counter() - self._gc_start
+            self.gc_count += 1
+            self.gc_time += pause
+            if pause > self.gc_max:
+                self.gc_max = pause
+
+    def soc_temp(self):
+        """SoC temperature [C], 0 without a thermal zone (not a Pi)"""
+        try:
+            with open(self.thermal_zone) as f:
+                return int(f.read()) / 1000.0
+        except (OSError, ValueError):
+            return 0
+
+    def sample(self):
+        now = perf_counter()
+        elapsed = now - self.sample_time if self.sample_time is not None else 0
+        self.sample_time = now
+
+        disk = psutil.disk_usage('/')
+        mem = psutil.virtual_memory()
+
+        cpu_times = {t.id: t.user_time + t.system_time for t in self.process.threads()}
+        if elapsed > 0:
+            self.thread_cpu = {tid: 100 * (t - self.cpu_times.get(tid, t)) / elapsed
+                               for tid, t in cpu_times.items()}
+        self.cpu_times = cpu_times
+        main_cpu = self.thread_cpu.get(self.main_tid, 0)
+        other_cpu = sum(self.thread_cpu.values()) - main_cpu
+
+        counts = (self.loops, self.overruns, self.gc_count, self.gc_time)
+        loops, overruns, gc_count, gc_time = [x - last for x, last in zip(counts, self._last)]
+        self._last = counts
+        loop_max, self.loop_max = self.loop_max, 0.0
+        gc_max, self.gc_max = self.gc_max, 0.0
+
+        self.latest = {'disk_free': disk.free / 2 ** 20,
+                       'disk_used': disk.used / 2 ** 20,
+                       'proc_load': round(psutil.cpu_percent(), 1),
+                       'mem_load': mem.percent,
+                       'mem_free': mem.free / 2 ** 20,
+                       'mem_used': mem.used / 2 ** 20,
+                       'soc_temp': self.soc_temp(),
+                       'main_cpu': round(main_cpu, 1),
+                       'other_cpu': round(other_cpu, 1),
+                       'gc_count': gc_count,
+                       'gc_time': gc_time * 1000,
+                       'gc_max': gc_max * 1000,
+                       'loops': loops,
+                       'loop_overruns': overruns,
+                       'loop_max': loop_max * 1000}
+
+    def run(self):
+        gc.callbacks.append(self._gc)
+        try:
+            while not self.stop_event.wait(max(self.period - (perf_counter() - self.sample_time), 0)):
+                try:
+                    self.sample()
+                except (OSError, psutil.Error) as e:
+                    print('Host health sample failed: ' + str(e))
+        finally:
+            gc.callbacks.remove(self._gc)
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
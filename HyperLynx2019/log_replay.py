@@ -0,0 +1,67 @@
+"""
+   HyperLynx: log_replay.py
+
+   Purpose:
+   Read back the pod log files in logs/ one control loop at a time, for offline
+   benchmarking and tuning of the state estimation code.
+
+   Handles both log formats in the repo:
+       Label  Value  Fault  Time      (log_* files written by SDA)
+       Label  Value  Time             (flight_sim_data.dat)
+
+   Each log "frame" is one pass of the logger over sensor_data and the pod
+   state variables.  A frame ends when a label that was already seen in the
+   current frame shows up again.
+"""
+
+import sys
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        if value == 'True':
+            return 1.0
+        if value == 'False':
+            return 0.0
+        return None
+
+
+def iter_log_frames(path):
+    """
+    Yields (time, frame) for each logged loop, where frame is a {label: value}
+    dict of floats.  Rows that do not parse are skipped.
+    """
+    frame = {}
+    frame_time = None
+    with open(path) as file:
+        for line in file:
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) < 3 or cols[0].startswith('"'):
+                continue
+            label = cols[0]
+            value = _to_float(cols[1])
+            stamp = _to_float(cols[-1])
+            if value is None or stamp is None:
+                continue
+            if label in frame:
+                yield frame_time, frame
+                frame = {}
+            if not frame:
+                frame_time = stamp
+            frame[label] = value
+    if frame:
+        yield frame_time, frame
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        count = 0
+        first = last = None
+        for t, frame in iter_log_frames(name):
+            if first is None:
+                first = t
+            last = t
+            count += 1
+        print(name + ': ' + str(count) + ' frames, ' + str(first) + ' to ' + str(last) + ' s')
@@ -26,10 +26,10 @@ class MLX90614():
     comm_sleep_amount = 0.1
     
 
-    def __init__(self, address=0x5B, bus_num=1):
+    def __init__(self, address=0x5B, bus_num=1, bus=None):
         self.bus_num = bus_num
         self.address = address
-        self.bus = smbus.SMBus(bus=bus_num)
+        self.bus = bus if bus is not None else smbus.SMBus(bus=bus_num)
     
     def check_connect(self):
         data = self.read_reg(self.MLX90614_TOBJ1)
@@ -10,11 +10,15 @@ written permission.
 
 from argparse import ArgumentParser
 from time import sleep
+import heapq
+import importlib.util
 import math
+import os
 import socket
 import struct
+import threading
 from enum import IntEnum
-from time import time
+from time import monotonic, perf_counter
 
 class Status(IntEnum):
     Fault = 0
@@ -34,39 +38,46 @@ def get_velocity(seconds, run_length, tube_length):
 def get_acceleration(seconds, run_length, tube_length):
     return (get_velocity(seconds, run_length, tube_length) - get_velocity(seconds-0.1, run_length, tube_length)) * 10
 
-if __name__ == "__main__":
-    parser = ArgumentParser(description="Mock the run of a pod to test the Hyperloop system")
-    parser.add_argument("--team_id", type=int, default=0, help="The team id to send")
-    parser.add_argument("--frequency", type=int, default=25, help="The frequency to send packets at")
-    parser.add_argument("--server_ip", default="192.168.0.1", help="The ip to send the packets to")
-    parser.add_argument("--server_port", type=int, default=1028, help="The UDP port to send packets to")
-    parser.add_argument("--tube_length", type=int, default=125000, help="The length of the tube in centimeters")
+class MockPod:
+    """One pod running the test scenario, one packet per step"""
 
-    args = parser.parse_args()
+    # Packet layout
+    # team_id             uint8  Identifier for the team, assigned by the
+    #                            organization. Required.
+    # status              uint8  Pod status, indicating the current state the pod
+    #                            is in. Required.
+    # acceleration        int32  Acceleration in centimeters per second squared.
+    #                            Required.
+    # position            int32  Position in centimeters. Required.
+    # velocity            int32  Velocity in centimeters per second. Required.
+    # battery_voltage     int32  Battery voltage in millivolts. Optional
+    # battery_current     int32  Battery current in milliamps. Optional
+    # battery_temperature int32  Battery temperature in tenths of a degree
+    #                            Celsius. Optional
+    # pod_temperature     int32  Pod temperature in tenths of a degree Celsius.
+    #                            Optional
+    # stripe_count        uint32 Count of optical navigation stripes detected in
+    #                            the tube. Optional
+    format = ">BB7iI"
 
-    if args.frequency < 10:
-        print("Send frequency should be higher than 10Hz")
-    if args.frequency > 50:
-        print("Send frequency should be lower than 50Hz")
+    def __init__(self, team_id, tube_length, run_length=30):
+        self.team_id = team_id
+        self.tube_length = tube_length
+        self.run_length = run_length
 
-    team_id = args.team_id
-    tube_length = args.tube_length
-    run_length = 30
-    wait_time = (1/args.frequency)
-    server = (args.server_ip, args.server_port)
-
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.position = 0
+        self.velocity = 0
+        self.acceleration = 0
+        self.status = Status.SafeToApproach
+        self.should_launch = True
+        self.seconds = 0
+        self.sent = 0
 
-    position = 0
-    velocity = 0
-    acceleration = 0
-    status = Status.SafeToApproach
-
-    should_launch = True
-
-    seconds = 0
-    while True:
-        start_time = time()
+    def step(self, wait_time):
+        """Advance the scenario by wait_time seconds and return the next packet"""
+        seconds = self.seconds
+        tube_length = self.tube_length
+        run_length = self.run_length
 
         # Run a simple test scenario where the pod first is in Safe to Approach
         # for 10 seconds, in Ready to Launch for 5 seconds after which the pod
@@ -75,55 +86,218 @@ if __name__ == "__main__":
         # when the pod stops the status goes back to Safe to Approach. The position
         # is based on a quarter of the cosine curve, the velocity and acceleration
         # are calculated from the position function.
-        if status == Status.SafeToApproach and should_launch:
+        if self.status == Status.SafeToApproach and self.should_launch:
             if seconds > 10:
-                status = Status.ReadyToLaunch
+                self.status = Status.ReadyToLaunch
                 seconds = 0
-                should_launch = False
-        elif status == Status.ReadyToLaunch:
+                self.should_launch = False
+        elif self.status == Status.ReadyToLaunch:
             if seconds > 5:
-                status = Status.Launching
+                self.status = Status.Launching
                 seconds = 0
-        elif status == Status.Launching:
-            position = get_position(seconds, run_length, tube_length)
-            velocity = get_velocity(seconds, run_length, tube_length)
-            acceleration = get_acceleration(seconds, run_length, tube_length)
-
-            if acceleration < 0:
-                status = Status.Braking
-        elif status == Status.Braking:
-            position = get_position(seconds, run_length, tube_length)
-            velocity = get_velocity(seconds, run_length, tube_length)
-            acceleration = get_acceleration(seconds, run_length, tube_length)
+        elif self.status == Status.Launching:
+            self.position = get_position(seconds, run_length, tube_length)
+            self.velocity = get_velocity(seconds, run_length, tube_length)
+            self.acceleration = get_acceleration(seconds, run_length, tube_length)
+
+            if self.acceleration < 0:
+                self.status = Status.Braking
+        elif self.status == Status.Braking:
+            self.position = get_position(seconds, run_length, tube_length)
+            self.velocity = get_velocity(seconds, run_length, tube_length)
+            self.acceleration = get_acceleration(seconds, run_length, tube_length)
 
             if seconds >= run_length:
-                status = Status.SafeToApproach
-        elif status == Status.SafeToApproach:
-            position = tube_length
-            velocity = 0
-            acceleration = 0
-
-        # Packet layout
-        # team_id             uint8  Identifier for the team, assigned by the
-        #                            organization. Required.
-        # status              uint8  Pod status, indicating the current state the pod
-        #                            is in. Required.
-        # acceleration        int32  Acceleration in centimeters per second squared.
-        #                            Required.
-        # position            int32  Position in centimeters. Required.
-        # velocity            int32  Velocity in centimeters per second. Required.
-        # battery_voltage     int32  Battery voltage in millivolts. Optional
-        # battery_current     int32  Battery current in milliamps. Optional
-        # battery_temperature int32  Battery temperature in tenths of a degree
-        #                            Celsius. Optional
-        # pod_temperature     int32  Pod temperature in tenths of a degree Celsius.
-        #                            Optional
-        # stripe_count        uint32 Count of optical navigation stripes detected in
-        #                            the tube. Optional
-        packet = struct.pack(">BB7iI", team_id, status, int(acceleration), int(position), int(velocity), 0, 0, 0, 0, int(position) // 3048)
-        sock.sendto(packet, server)
-
-        end_time = time()
-        # Sleep the required time
-        sleep(wait_time - (end_time-start_time))
-        seconds += wait_time
+                self.status = Status.SafeToApproach
+        elif self.status == Status.SafeToApproach:
+            self.position = tube_length
+            self.velocity = 0
+            self.acceleration = 0
+
+        self.seconds = seconds + wait_time
+        self.sent += 1
+        position = int(self.position)
+        return struct.pack(self.format, self.team_id, self.status, int(self.acceleration), position,
+                           int(self.velocity), 0, 0, 0, 0, position // 3048)
+
+def run_pod(pod, sock, server, frequency):
+    """Send one pod's packets at frequency forever
+
+    The send times are on an absolute schedule, start + n / frequency, so the
+    rate doesn't drift with the time spent sending.  When a cycle overruns the
+    packet is sent at once and the schedule resumes; if the pod falls behind by
+    a whole period the missed sends are skipped instead of being sent in a burst.
+    """
+    wait_time = 1/frequency
+    next_time = monotonic()
+    while True:
+        sock.sendto(pod.step(wait_time), server)
+
+        next_time += wait_time
+        delay = next_time - monotonic()
+        if delay > 0:
+            sleep(delay)
+        elif delay < -wait_time:
+            next_time = monotonic()
+
+class Verifier(threading.Thread):
+    """Receives the generated packets with mock-receiver's MockServer
+
+    Every packet is passed to MockServer.handle_packet (timed) and the decoded
+    values are checked against the packet layout: a team id that was sent, a
+    known status and a stripe count matching the position.  Counts are kept per
+    team, so lost packets show up as sent - received.
+    """
+
+    def __init__(self, host, port, tube_length, team_ids):
+        threading.Thread.__init__(self, name="verifier", daemon=True)
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock-receiver.py")
+        spec = importlib.util.spec_from_file_location("mock_receiver", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.server = module.MockServer(host, port, tube_length)
+        self.server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.server.socket.settimeout(0.5)
+
+        self.team_ids = set(team_ids)
+        self.received = dict.fromkeys(team_ids, 0)
+        self.errors = 0
+        self.last_error = ""
+        self.handle_time = 0.0
+        self.handle_max = 0.0
+        self.running = True
+
+    def check(self):
+        server = self.server
+        if server.packet_error != "":
+            return server.packet_error
+        if server.team_id not in self.team_ids:
+            return "Unexpected team id {}".format(server.team_id)
+        if server.status not in tuple(Status):
+            return "Team {} sent unknown status {}".format(server.team_id, server.status)
+        if server.stripe_count != server.position // 3048:
+            return "Team {} stripe count {} doesn't match position {}".format(server.team_id, server.stripe_count, server.position)
+        return ""
+
+    def run(self):
+        server = self.server
+        while self.running:
+            try:
+                data = server.socket.recv(1024)
+            except socket.timeout:
+                continue
+            start = perf_counter()
+            server.handle_packet(data)
+            elapsed = perf_counter() - start
+            self.handle_time += elapsed
+            self.handle_max = max(self.handle_max, elapsed)
+
+            error = self.check()
+            if error:
+                self.errors += 1
+                self.last_error = error
+            else:
+                self.received[server.team_id] += 1
+
+    def stop(self):
+        self.running = False
+        self.join(1)
+
+def run_load(pods, sock, server, frequency, duration, verifier=None, report=1.0):
+    """Send the packets of many pods from one loop
+
+    Every pod has an absolute schedule, start + (n + k / len(pods)) / frequency
+    for pod k, so the pods are spread evenly over each period and the aggregate
+    rate is len(pods) * frequency.  The loop sends every packet that is due and
+    sleeps until the next one; packets that are late are sent at once (and
+    counted) rather than dropped, so the receiver sees the full load.
+    """
+    wait_time = 1/frequency
+    start = monotonic()
+    schedule = [(start + k * wait_time / len(pods), k) for k in range(len(pods))]
+    heapq.heapify(schedule)
+
+    sent = late = 0
+    worst = 0.0
+    next_report = start + report
+    report_sent = 0
+    while True:
+        now = monotonic()
+        if duration and now - start >= duration:
+            break
+        # Send everything that is due in one batch
+        while schedule[0][0] <= now:
+            due, k = schedule[0]
+            sock.sendto(pods[k].step(wait_time), server)
+            sent += 1
+            if now - due > wait_time:
+                late += 1
+            worst = max(worst, now - due)
+            heapq.heapreplace(schedule, (due + wait_time, k))
+
+        if now >= next_report:
+            line = "sent {:>9} ({:>7.0f}/s)  late {:>6}  worst {:6.2f} ms".format(
+                sent, (sent - report_sent) / (now - next_report + report), late, 1000*worst)
+            if verifier is not None:
+                received = sum(verifier.received.values())
+                line += "  received {:>9}  errors {}  handle_packet {:.1f} us (max {:.0f})".format(
+                    received, verifier.errors, 1e6 * verifier.handle_time / max(received + verifier.errors, 1),
+                    1e6 * verifier.handle_max)
+            print(line)
+            report_sent = sent
+            next_report += report
+
+        delay = schedule[0][0] - monotonic()
+        if delay > 0:
+            sleep(delay)
+    return sent, late, worst
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Mock the run of a pod to test the Hyperloop system")
+    parser.add_argument("--team_id", type=int, default=0, help="The team id to send")
+    parser.add_argument("--frequency", type=float, default=25, help="The frequency to send packets at (per pod)")
+    parser.add_argument("--server_ip", default="192.168.0.1", help="The ip to send the packets to")
+    parser.add_argument("--server_port", type=int, default=1028, help="The UDP port to send packets to")
+    parser.add_argument("--tube_length", type=int, default=125000, help="The length of the tube in centimeters")
+    parser.add_argument("--pods", type=int, default=1, help="Load generation: the number of pods to simulate, with team ids from --team_id up")
+    parser.add_argument("--duration", type=float, default=0, help="Load generation: seconds to run, 0 runs until interrupted")
+    parser.add_argument("--verify", action="store_true", help="Load generation: receive the packets in this process with mock-receiver's MockServer (bound to --server_ip:--server_port) and check them")
+
+    args = parser.parse_args()
+
+    server = (args.server_ip, args.server_port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    if args.pods == 1 and not args.verify and not args.duration:
+        if args.frequency < 10:
+            print("Send frequency should be higher than 10Hz")
+        if args.frequency > 50:
+            print("Send frequency should be lower than 50Hz")
+        run_pod(MockPod(args.team_id, args.tube_length), sock, server, args.frequency)
+
+    team_ids = range(args.team_id, args.team_id + args.pods)
+    if team_ids[-1] > 255:
+        parser.error("team ids are one byte, --team_id + --pods must be at most 256")
+    pods = [MockPod(team_id, args.tube_length) for team_id in team_ids]
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+
+    verifier = None
+    if args.verify:
+        verifier = Verifier(args.server_ip, args.server_port, args.tube_length, team_ids)
+        verifier.start()
+
+    print("{} pods at {:g}Hz, {:g} packets/s to {}:{}".format(args.pods, args.frequency, args.pods * args.frequency, *server))
+    try:
+        sent, late, worst = run_load(pods, sock, server, args.frequency, args.duration, verifier)
+    except KeyboardInterrupt:
+        sent = sum(pod.sent for pod in pods)
+    if verifier is not None:
+        sleep(0.2)
+        verifier.stop()
+        received = sum(verifier.received.values())
+        print("sent {}  received {}  lost {}  errors {}".format(sent, received, sent - received - verifier.errors, verifier.errors))
+        if verifier.last_error:
+            print("last error: " + verifier.last_error)
+        short = [(pod.team_id, pod.sent - verifier.received[pod.team_id]) for pod in pods if verifier.received[pod.team_id] != pod.sent]
+        if short:
+            print("lost per team: " + ", ".join("{}: {}".format(*item) for item in short))
@@ -10,13 +10,81 @@ written permission.
 
 from argparse import ArgumentParser
 from enum import IntEnum
-import os
+import math
 import struct
 import socket
 import select
+import sys
 from time import time
-from collections import deque
-from statistics import mean
+
+class RateStats:
+    """Rolling message rate, jitter and loss, O(1) per message
+
+    The gaps between the last `window` messages are kept in a ring with their
+    running sum and sum of squares, so the rate and the jitter (standard
+    deviation of the gap) need no pass over the history.  The SpaceX packet has
+    no sequence number, so lost packets are estimated from the gaps: a gap of
+    about k periods counts k - 1 lost packets.  The period is 1/expected_rate
+    if given, else the rolling mean gap.
+    """
+
+    def __init__(self, window=50, expected_rate=None):
+        self.window = window
+        self.expected_rate = expected_rate
+        self.gaps = [0.0] * window
+        self.i = 0
+        self.n = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+        self.count = 0
+        self.lost = 0
+        self.last = None
+        self.min_gap = math.inf
+        self.max_gap = 0.0
+
+    def add(self, t):
+        self.count += 1
+        if self.last is not None:
+            gap = t - self.last
+            if self.n == self.window:
+                old = self.gaps[self.i]
+                self.sum -= old
+                self.sum_sq -= old * old
+            else:
+                self.n += 1
+            self.gaps[self.i] = gap
+            self.sum += gap
+            self.sum_sq += gap * gap
+            self.i += 1
+            if self.i == self.window:
+                self.i = 0
+                # drop accumulated rounding once per lap
+                self.sum = math.fsum(self.gaps)
+                self.sum_sq = math.fsum(g * g for g in self.gaps)
+
+            self.min_gap = min(self.min_gap, gap)
+            self.max_gap = max(self.max_gap, gap)
+            period = 1 / self.expected_rate if self.expected_rate else self.sum / self.n
+            if self.n >= 5 and gap > 1.5 * period:
+                self.lost += int(round(gap / period)) - 1
+        self.last = t
+
+    def rate(self):
+        """Messages per second over the window"""
+        return self.n / self.sum if self.sum > 0 else 0.0
+
+    def jitter(self):
+        """Standard deviation of the gap over the window [s]"""
+        if self.n < 2:
+            return 0.0
+        mean = self.sum / self.n
+        return math.sqrt(max(self.sum_sq / self.n - mean * mean, 0.0))
+
+    def loss(self):
+        """Estimated fraction of packets lost"""
+        total = self.count + self.lost
+        return self.lost / total if total else 0.0
 
 class MockServer:
     """An example server to receive, print and store values send by an Hyperloop pod"""
@@ -43,8 +111,6 @@ class MockServer:
             # team_id: team_name
         }
 
-    message_times = deque()
-
     team_id = -1
     status = -1
 
@@ -61,13 +127,14 @@ class MockServer:
 
     packet_error = ""
 
-    def __init__(self, host, port, tube_length):
+    def __init__(self, host, port, tube_length, expected_rate=None):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind((host,port))
 
         self.file = None
 
         self.tube_length = tube_length
+        self.stats = RateStats(expected_rate=expected_rate)
 
     def start_recording(self, output_filename, print_header):
         """Start recording received samples to a file"""
@@ -94,44 +161,60 @@ class MockServer:
             self.file.write(self.column_separator.join(map(lambda column_title: "\""+column_title+"\"", columns)))
             self.file.write("\n")
 
-    def print_screen(self):
-        """Print received information to the screen
-
-        This function takes the received information in this class and prints
-        it to the terminal.
-        """
-
-        # Clear the screen
-        os.system('cls' if os.name=='nt' else 'clear')
-
+    def screen_lines(self):
+        """The lines of the status screen"""
+        lines = []
         # Print the team name, if it's not in the team_map print the id
-        print("Team {}".format(self.team_map.get(self.team_id, str(self.team_id))))
-        print("Pod status: {}".format(self.status_map.get(self.status, "Unknow status {}".format(self.status))))
-        print()
-        print("Pod position:     {:>7.2f} meter from start of tube ({:3.0f}%)".format(self.position/100, self.position / self.tube_length * 100))
-        print("Pod velocity:     {:>7.2f} meter/second (highest velocity {:.2f} meter/second)".format(self.velocity/100, self.highest_velocity/100))
-        print("Pod acceleration: {:>7.2f} meter/second/second".format(self.acceleration/100))
-
-        print()
-        if len(self.message_times) < 2:
-            print("No message received yet")
-        elif self.message_times[-1] < time() - 1:
-            print("No message received in {:.1f} seconds".format(time()-self.message_times[-1]))
+        lines.append("Team {}".format(self.team_map.get(self.team_id, str(self.team_id))))
+        lines.append("Pod status: {}".format(self.status_map.get(self.status, "Unknow status {}".format(self.status))))
+        lines.append("")
+        lines.append("Pod position:     {:>7.2f} meter from start of tube ({:3.0f}%)".format(self.position/100, self.position / self.tube_length * 100))
+        lines.append("Pod velocity:     {:>7.2f} meter/second (highest velocity {:.2f} meter/second)".format(self.velocity/100, self.highest_velocity/100))
+        lines.append("Pod acceleration: {:>7.2f} meter/second/second".format(self.acceleration/100))
+        lines.append("Battery:          {:>7.2f} V  {:.2f} A  {:.1f} C   pod {:.1f} C".format(
+            self.battery_voltage/1000, self.battery_current/1000, self.battery_temperature/10, self.pod_temperature/10))
+        lines.append("Stripe count:     {:>7d}".format(self.stripe_count))
+
+        lines.append("")
+        stats = self.stats
+        if stats.count < 1:
+            lines.append("No message received yet")
+        elif stats.last < time() - 1:
+            lines.append("No message received in {:.1f} seconds".format(time()-stats.last))
         else:
-            # Calculate the average period between all saved 
-            send_periods = []
-            for i in range(len(self.message_times)-1):
-                send_periods.append(self.message_times[i+1] - self.message_times[i])
-            message_frequency = 1/mean(send_periods)
-            print("Message frequency: {:.2f}hz".format(message_frequency))
+            message_frequency = stats.rate()
+            lines.append("Message frequency: {:.2f}hz   jitter {:.1f} ms".format(message_frequency, 1000*stats.jitter()))
             if message_frequency < 10:
-                print("\tFrequency should be higher than 10hz!")
+                lines.append("\tFrequency should be higher than 10hz!")
             if message_frequency > 50:
-                print("\tFrequency should be lower than 50hz!")
+                lines.append("\tFrequency should be lower than 50hz!")
+        if stats.n >= 1:
+            lines.append("Gap min/max:       {:.1f} / {:.1f} ms".format(1000*stats.min_gap, 1000*stats.max_gap))
+            lines.append("Packets:           {} received, ~{} lost ({:.1f}%)".format(stats.count, stats.lost, 100*stats.loss()))
 
         if self.packet_error != "":
-            print()
-            print(self.packet_error)
+            lines.append("")
+            lines.append(self.packet_error)
+        return lines
+
+    def print_screen(self):
+        """Print received information to the screen
+
+        This function takes the received information in this class and prints
+        it to the terminal, redrawing it from the top left corner with ANSI
+        escapes instead of clearing the screen with a shell command.
+        """
+        sys.stdout.write("\033[H\033[J" + "\n".join(self.screen_lines()) + "\n")
+        sys.stdout.flush()
+
+    def draw_screen(self, window):
+        """Update the curses window in place, only the changed cells are sent"""
+        height, width = window.getmaxyx()
+        for row, line in enumerate(self.screen_lines()[:height-1]):
+            window.addnstr(row, 0, line.replace("\t", "    "), width-1)
+            window.clrtoeol()
+        window.clrtobot()
+        window.refresh()
 
     def handle_packet(self, data):
         """Handle the data in a received packet
@@ -163,7 +246,7 @@ class MockServer:
             # Write the line to the file
             self.file.write("{}\n".format(line))
 
-    def run(self):
+    def run(self, window=None):
         """Run the server
 
         This function doesn't return, if a message is received the internal values are
@@ -171,9 +254,12 @@ class MockServer:
         been called.
 
         The screen is updated at at least 10 fps when no messages are being received and
-        the screen is updated for each message upto a 24 fps update rate.
+        the screen is updated for each message upto a 24 fps update rate.  With a curses
+        window the dashboard is drawn in place and 'q' quits.
         """
 
+        if window is not None:
+            window.nodelay(True)
         previous_draw_time = time() - 1
         while True:
             # Sleep until the socket is ready or the timeout expires
@@ -184,14 +270,16 @@ class MockServer:
             if len(ready_sockets) > 0:
                 received_data = ready_sockets[0].recv(struct.calcsize(self.format)+1)
                 self.handle_packet(received_data)
-
-                self.message_times.append(new_time)
-                while len(self.message_times) > 10:
-                    self.message_times.popleft()
+                self.stats.add(new_time)
 
             # Don't redraw the screen more often than at 24fps to prevent the text from flashing
             if previous_draw_time < new_time - 1/24:
-                self.print_screen()
+                if window is None:
+                    self.print_screen()
+                else:
+                    self.draw_screen(window)
+                    if window.getch() in (ord('q'), ord('Q')):
+                        return
                 previous_draw_time = new_time
 
 if __name__ == "__main__":
@@ -202,11 +290,17 @@ if __name__ == "__main__":
     parser.add_argument("--tube_length", type=int, default=125000, help="The length of the tube in centimeters")
     parser.add_argument("--output_filename", help="The filename to store received data in")
     parser.add_argument("--print_header", action="store_true", help="If at the start of the file a header should be added explaining the columns")
+    parser.add_argument("--expected_rate", type=float, help="The send frequency the pod should hit (SDA sends at 40hz), for the packet loss estimate")
+    parser.add_argument("--plain", action="store_true", help="Print the screen instead of the curses dashboard")
 
     args = parser.parse_args()
 
-    mock_server = MockServer(args.host, args.port, args.tube_length)
+    mock_server = MockServer(args.host, args.port, args.tube_length, args.expected_rate)
     if args.output_filename != None:
         mock_server.start_recording(args.output_filename, args.print_header)
 
-    mock_server.run()
+    if args.plain or not sys.stdout.isatty():
+        mock_server.run()
+    else:
+        import curses
+        curses.wrapper(mock_server.run)
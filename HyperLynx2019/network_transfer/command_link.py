@@ -0,0 +1,391 @@
+'''
+Command uplink from the GUI to the pod.  One persistent TCP session, opened by
+the GUI (CommandClient) to the pod (CommandServer), carrying fixed size binary
+frames:
+
+    type (B) | seq (I) | stamp (d) | key (B) | value (d)        22 bytes, big endian
+
+    COMMAND     set KEYS[key] to value; seq numbers the GUI's commands
+    HEARTBEAT   sent by both ends every heartbeat seconds
+    ACK         answers a COMMAND at once, echoing its seq, key and stamp, so
+                the sender measures the round trip on its own clock
+    HEARTBEAT_ACK   the same for a HEARTBEAT, with the receiver's clock as value
+                (the ClockFilter ping of latency_trace.py)
+    TRACE       pod to GUI: command seq reached hop HOPS[key] at pod time stamp
+
+Both ends ack from their link thread as soon as a frame arrives, independent of
+the pod control loop.  Commands the pod has not acked within retry seconds
+(or when the session is reopened) are sent again with the same seq; the pod
+applies each seq once per session.  Values are settings (HV on, vent closed,
+a flight parameter), so a command applied again in a new session is harmless.
+
+The pod side never blocks the control loop: received commands wait in a deque
+for poll(), which SDA.rec_data() calls once per loop, so an Abort is applied
+in the loop after it arrives.  Both ends record every command's hops in a
+latency_trace.TraceRing (link.trace); the pod's trace_hop() records a hop and
+queues it for the GUI, and the GUI shifts the pod times onto its own clock with
+link.clock.offset.
+
+    link = CommandServer('', 5055)          # pod
+    link.start()
+    for command in link.poll():
+        ...
+        link.trace_hop(command.seq, 'apply')
+    link.rtt, link.since_heartbeat()
+
+    link = CommandClient('192.168.0.10', 5055)     # GUI
+    link.start()
+    link.send('Abort', 1)
+    link.trace.format(seq)
+'''
+
+import selectors
+import socket
+import struct
+import threading
+from collections import deque, namedtuple
+from time import monotonic
+
+from network_transfer.latency_trace import ClockFilter, TraceRing, HOPS
+
+FRAME = struct.Struct('>BIdBd')
+COMMAND = 1
+HEARTBEAT = 2
+ACK = 3
+HEARTBEAT_ACK = 4
+TRACE = 5
+
+# Command keys by number: SDA's cmd_ext keys, then the flight parameters
+KEYS = ('Abort', 'HV', 'Launch', 'Vent_Sol', 'Res1_Sol', 'Res2_Sol', 'MC_Pump',
+        'para_BBP', 'para_max_speed', 'para_max_accel', 'para_max_time',
+        'para_max_crawl_speed', 'para_max_tube_length')
+KEY_NUMBERS = {key: n for n, key in enumerate(KEYS)}
+
+# A command for the pod, received (monotonic time) by the link thread
+Command = namedtuple('Command', 'seq key value received')
+
+
+class _Link(threading.Thread):
+    '''
+    One end of the link: frames in and out of self.sock, acks, heartbeats and
+    round trip times.  Subclasses open the session (connect()) and handle
+    commands and acks (on_command(), on_ack()).
+
+    Inputs:
+        heartbeat (float):  [s] between heartbeats
+        rtt_weight (float): weight of a new sample in the smoothed rtt
+    '''
+    def __init__(self, name, heartbeat=0.1, rtt_weight=0.125):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self.heartbeat = heartbeat
+        self.rtt_weight = rtt_weight
+        self.sock = None
+        self.selector = selectors.DefaultSelector()
+        self.running = True
+        self._send_lock = threading.Lock()
+        self._recv_buffer = b''
+
+        self.started = monotonic()
+        self.last_heard = None      # monotonic time of the last frame from the peer
+        self.rtt = 0.0              # [s] last round trip
+        self.srtt = 0.0             # [s] smoothed round trip
+        self.heartbeats_sent = 0
+        self.sessions = 0
+        self.clock = ClockFilter()  # peer clock offset from the heartbeat exchange
+        self.trace = TraceRing()
+        self._outbox = deque()      # frames queued by other threads, sent by the link thread
+
+    def since_heartbeat(self):
+        '''[s] since the last frame from the peer (since start before the first one)'''
+        return monotonic() - (self.last_heard if self.last_heard is not None else self.started)
+
+    def connected(self):
+        return self.sock is not None
+
+    def _send(self, kind, seq, stamp, key=0, value=0.0):
+        '''Writes one frame; False if there is no session or it just failed'''
+        with self._send_lock:
+            sock = self.sock
+            if sock is None:
+                return False
+            try:
+                sock.sendall(FRAME.pack(kind, seq, stamp, key, value))
+                return True
+            except OSError as e:
+                print('Command link send failed: ' + repr(e))
+                return False
+
+    def _open(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        self._recv_buffer = b''
+        with self._send_lock:
+            self.sock = sock
+        self.selector.register(sock, selectors.EVENT_READ, 'session')
+        self.sessions += 1
+
+    def _close(self):
+        with self._send_lock:
+            sock, self.sock = self.sock, None
+        if sock is not None:
+            self.selector.unregister(sock)
+            sock.close()
+
+    def _read(self):
+        try:
+            data = self.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close()
+            return
+        buffer = self._recv_buffer + data
+        n = len(buffer) - len(buffer) % FRAME.size
+        for kind, seq, stamp, key, value in FRAME.iter_unpack(buffer[:n]):
+            self.last_heard = monotonic()
+            if kind == ACK or kind == HEARTBEAT_ACK:
+                rtt = self.last_heard - stamp
+                self.rtt = rtt
+                self.srtt = rtt if self.srtt == 0 else self.srtt + self.rtt_weight * (rtt - self.srtt)
+                if kind == ACK:
+                    self.on_ack(seq, key)
+                else:
+                    self.clock.add(stamp, value, self.last_heard)
+            elif kind == HEARTBEAT:
+                self._send(HEARTBEAT_ACK, seq, stamp, 0, monotonic())
+            elif kind == COMMAND:
+                self._send(ACK, seq, stamp, key, value)
+                self.on_command(seq, key, value)
+            elif kind == TRACE and key < len(HOPS):
+                # peer clock to ours
+                self.trace.mark(seq, key, stamp - self.clock.offset)
+        self._recv_buffer = buffer[n:]
+
+    def run(self):
+        next_heartbeat = monotonic()
+        while self.running:
+            if self.sock is None:
+                self.connect()
+                next_heartbeat = monotonic()
+                continue
+            now = monotonic()
+            if now >= next_heartbeat:
+                self.heartbeats_sent += 1
+                self._send(HEARTBEAT, self.heartbeats_sent, now)
+                self.on_heartbeat(now)
+                next_heartbeat += self.heartbeat
+                if next_heartbeat < now:
+                    next_heartbeat = now + self.heartbeat
+            for key, events in self.selector.select(max(next_heartbeat - monotonic(), 0)):
+                if key.data == 'accept':
+                    self.on_accept(key.fileobj)
+                elif key.fileobj is self.sock:
+                    self._read()
+            while self._outbox:
+                self._send(*self._outbox.popleft())
+        self._close()
+        self.selector.close()
+
+    def stop(self):
+        self.running = False
+        self.join(2)
+
+    def connect(self):
+        pass
+
+    def on_accept(self, listener):
+        pass
+
+    def on_command(self, seq, key, value):
+        pass
+
+    def on_ack(self, seq, key):
+        pass
+
+    def on_heartbeat(self, now):
+        pass
+
+
+class CommandServer(_Link):
+    '''
+    Pod end.  Listens on host:port for the GUI; a new connection replaces the
+    current session.
+
+    Inputs:
+        host (str):         interface to listen on, '' for all
+        port (int):         port for the socket, should be above 1024
+        heartbeat (float):  [s] between heartbeats to the GUI
+    '''
+    def __init__(self, host='', port=5055, heartbeat=0.1):
+        _Link.__init__(self, 'command_link', heartbeat)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen(1)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ, 'accept')
+
+        self.commands = deque()         # (key, value) waiting for poll()
+        self.last_seq = 0               # last command seq applied this session
+        self.received = 0
+
+    def connect(self):
+        # Only wait for the GUI to connect
+        for key, events in self.selector.select(self.heartbeat):
+            self.on_accept(key.fileobj)
+
+    def on_accept(self, listener):
+        try:
+            sock, addr = listener.accept()
+        except OSError:
+            return
+        if self.sock is not None:
+            print('Command link: {} replaces the current session'.format(addr))
+            self._close()
+        print('Command link: GUI connected from {}'.format(addr))
+        self.last_seq = 0
+        self.trace = TraceRing(self.trace.size)     # the GUI's seqs start again
+        self._open(sock)
+
+    def on_command(self, seq, key, value):
+        if seq <= self.last_seq or key >= len(KEYS):
+            return      # resent command already applied, or unknown key
+        self.last_seq = seq
+        self.received += 1
+        self.commands.append(Command(seq, KEYS[key], value, self.last_heard))
+        self.trace_hop(seq, 'receive', self.last_heard, KEYS[key])
+
+    def trace_hop(self, seq, hop, t=None, key=None):
+        '''Records hop of command seq (now by default) and queues it for the GUI'''
+        t = monotonic() if t is None else t
+        self.trace.mark(seq, hop, t, key)
+        self._outbox.append((TRACE, seq, t, HOPS.index(hop)))
+
+    def poll(self):
+        '''Commands received since the last call, oldest first, as Command tuples; called by the control loop'''
+        commands = []
+        while self.commands:
+            commands.append(self.commands.popleft())
+        return commands
+
+    def stop(self):
+        _Link.stop(self)
+        self.listener.close()
+
+
+class CommandClient(_Link):
+    '''
+    GUI end.  Connects to the pod's CommandServer, again every retry seconds
+    while it is unreachable.  send() can be called from any thread (the Qt
+    button handlers) and writes the frame at once.
+
+    Inputs:
+        host (str), port (int): pod command port
+        heartbeat (float):      [s] between heartbeats to the pod
+        retry (float):          [s] before an unacked command is sent again
+    '''
+    def __init__(self, host, port=5055, heartbeat=0.1, retry=0.5):
+        _Link.__init__(self, 'command_link', heartbeat)
+        self.addr = (host, port)
+        self.retry = retry
+        self.seq = 0
+        self.pending = {}       # {seq: [key number, value, last send time]} not acked yet
+        self._lock = threading.Lock()
+        self.acked = 0
+        self.resent = 0
+
+    def connect(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(self.retry)
+        try:
+            sock.connect(self.addr)
+        except OSError:
+            sock.close()
+            self.selector.select(self.retry)    # wait, without busy looping
+            return
+        self._open(sock)
+        # Everything not acked goes again on the new session
+        with self._lock:
+            pending = sorted(self.pending.items())
+        for seq, entry in pending:
+            self._resend(seq, entry, monotonic())
+
+    def send(self, key, value):
+        '''Sends KEYS entry key = value; returns its seq, the command's trace id'''
+        number = KEY_NUMBERS[key]
+        now = monotonic()
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+            self.pending[seq] = [number, float(value), now]
+        self.trace.mark(seq, 'emit', now, key)
+        self._send(COMMAND, seq, now, number, float(value))
+        self.trace.mark(seq, 'send')
+        return seq
+
+    def _resend(self, seq, entry, now):
+        entry[2] = now
+        self.resent += 1
+        self._send(COMMAND, seq, now, entry[0], entry[1])
+
+    def on_ack(self, seq, key):
+        with self._lock:
+            if self.pending.pop(seq, None) is not None:
+                self.acked += 1
+
+    def on_heartbeat(self, now):
+        with self._lock:
+            late = [(seq, entry) for seq, entry in self.pending.items() if now - entry[2] >= self.retry]
+        for seq, entry in late:
+            self._resend(seq, entry, now)
+
+    def status(self):
+        '''Link summary for the GUI'''
+        return {'connected': self.connected(),
+                'rtt': self.srtt,
+                'clock_offset': self.clock.offset,
+                'clock_error': self.clock.error,
+                'since_heartbeat': self.since_heartbeat(),
+                'pending': len(self.pending),
+                'acked': self.acked,
+                'resent': self.resent}
+
+
+if __name__ == '__main__':
+    import argparse
+    from time import sleep
+
+    parser = argparse.ArgumentParser(description='Command link test: a pod end, or a GUI end sending commands')
+    parser.add_argument('--pod', action='store_true', help='run the pod end and print received commands')
+    parser.add_argument('--server', default='localhost:5055', help='<host>:<port> of the pod end')
+    parser.add_argument('commands', nargs='*', help='<key>=<value> commands to send from the GUI end')
+    args = parser.parse_args()
+
+    host, port = args.server.split(':')
+    if args.pod:
+        link = CommandServer('', int(port))
+        link.start()
+        while True:
+            sleep(0.01)
+            for command in link.poll():
+                # stand in for the control loop applying and actuating it
+                link.trace_hop(command.seq, 'apply')
+                link.trace_hop(command.seq, 'actuate')
+                print('{} = {}'.format(command.key, command.value))
+            if link.connected() and link.heartbeats_sent % 10 == 0:
+                print('rtt {:.2f} ms  last heartbeat {:.2f} s ago'.format(1000 * link.srtt, link.since_heartbeat()))
+    else:
+        link = CommandClient(host, int(port))
+        link.start()
+        sleep(0.5)      # connect and sync the clocks
+        seqs = []
+        for command in args.commands:
+            key, value = command.split('=')
+            seqs.append(link.send(key, float(value)))
+        sleep(1)
+        print(link.status())
+        for seq in seqs:
+            print(link.trace.format(seq))
+        link.stop()
@@ -0,0 +1,123 @@
+'''
+Latency tracing for uplink commands.  Each command is identified by its
+command_link seq and timestamped at every hop on its way to the hardware:
+
+    emit        GUI button handler sends it                 ground clock
+    send        written to the command link socket          ground clock
+    receive     read by the pod's link thread               pod clock
+    apply       picked up by SDA.do_commands()              pod clock
+    actuate     switch call (GPIO write) or abort() done    pod clock
+
+The pod reports its hops back over the link, and the ground end moves them onto
+its own clock with the offset from a ClockFilter, so the whole breakdown is on
+one clock.  Hop times are kept in a TraceRing: a fixed array with one row per
+command, reused after size commands, so recording is O(1) and never allocates.
+'''
+
+import math
+from time import monotonic
+
+import numpy
+
+HOPS = ('emit', 'send', 'receive', 'apply', 'actuate')
+HOP_NUMBERS = {hop: n for n, hop in enumerate(HOPS)}
+
+
+class ClockFilter:
+    '''
+    NTP style estimate of the peer clock's offset from ping exchanges: a ping
+    sent at t1, answered with the peer's time t2, received back at t4 gives
+
+        offset = t2 - (t1 + t4) / 2         error at most (t4 - t1) / 2
+
+    The sample with the shortest round trip of the last window is used, as its
+    error bound is the tightest.
+
+    Inputs:
+        window (int):   samples kept
+    '''
+    def __init__(self, window=16):
+        self.window = window
+        self.samples = []       # (rtt, offset)
+        self.offset = 0.0       # [s] peer clock - own clock
+        self.error = math.inf   # [s] bound on the offset error
+
+    def add(self, t1, t2, t4):
+        self.samples.append((t4 - t1, t2 - (t1 + t4) / 2))
+        if len(self.samples) > self.window:
+            del self.samples[0]
+        rtt, self.offset = min(self.samples)
+        self.error = rtt / 2
+
+    def synced(self):
+        return bool(self.samples)
+
+
+class TraceRing:
+    '''
+    Hop times of the last size commands.  Rows are reused by seq % size; a row
+    still holding an older seq is cleared when a new seq is marked into it.
+
+    Inputs:
+        size (int):     commands kept
+    '''
+    def __init__(self, size=256):
+        self.size = size
+        self.seqs = numpy.zeros(size, dtype=numpy.int64)
+        self.times = numpy.full((size, len(HOPS)), numpy.nan)
+        self.keys = [''] * size
+        self._reported = numpy.zeros(size, dtype=bool)
+
+    def mark(self, seq, hop, t=None, key=None):
+        '''Records hop (name or number) of command seq at t [s] (now by default)'''
+        row = seq % self.size
+        if self.seqs[row] != seq:
+            self.seqs[row] = seq
+            self.times[row] = numpy.nan
+            self.keys[row] = ''
+            self._reported[row] = False
+        if key is not None:
+            self.keys[row] = key
+        hop = HOP_NUMBERS.get(hop, hop)
+        self.times[row, hop] = monotonic() if t is None else t
+
+    def get(self, seq):
+        '''{hop: time} of command seq, None once its row was reused'''
+        row = seq % self.size
+        if self.seqs[row] != seq:
+            return None
+        return {hop: float(t) for hop, t in zip(HOPS, self.times[row]) if not math.isnan(t)}
+
+    def breakdown(self, seq):
+        '''(key, [(from hop, to hop, ms)], total ms) over the hops recorded for seq'''
+        times = self.get(seq)
+        if not times:
+            return None
+        hops = [hop for hop in HOPS if hop in times]
+        steps = [(a, b, 1000 * (times[b] - times[a])) for a, b in zip(hops, hops[1:])]
+        return self.keys[seq % self.size], steps, 1000 * (times[hops[-1]] - times[hops[0]])
+
+    def format(self, seq):
+        result = self.breakdown(seq)
+        if result is None:
+            return '#{} no trace'.format(seq)
+        key, steps, total = result
+        return '#{} {}: {:.2f} ms  ('.format(seq, key, total) + \
+            ', '.join('{}>{} {:.2f}'.format(a, b, ms) for a, b, ms in steps) + ')'
+
+    def completed(self, last_hop='actuate'):
+        '''Seqs that reached last_hop since the previous call'''
+        column = self.times[:, HOP_NUMBERS[last_hop]]
+        rows = numpy.flatnonzero(~numpy.isnan(column) & ~self._reported)
+        self._reported[rows] = True
+        return sorted(int(self.seqs[row]) for row in rows)
+
+    def summary(self):
+        '''{'from>to': (mean ms, max ms)} over every command in the ring with both hops'''
+        result = {}
+        for a, b in zip(HOPS, HOPS[1:]):
+            d = 1000 * (self.times[:, HOP_NUMBERS[b]] - self.times[:, HOP_NUMBERS[a]])
+            d = d[~numpy.isnan(d)]
+            if len(d):
+                result[a + '>' + b] = (float(d.mean()), float(d.max()))
+        return result
@@ -0,0 +1,394 @@
+'''
+asyncio transport for network_transfer.  Same framing as libserver/libclient:
+
+    2 byte big endian header length | JSON header | content
+
+with the JSON header carrying byteorder, content-type, content-encoding and
+content-length.  Unlike the selectors versions a connection is a long lived
+session: the client keeps it open and sends any number of requests, and the
+server answers each one in order.  Writers wait on drain(), so a slow peer
+pushes back on the sender instead of growing its buffers without bound.
+
+The old and new ends work together: libclient's one shot connections are
+sessions of one request for AsyncServer, and libserver.Message keeps its
+connections open for AsyncClient (which also reconnects whenever a server
+closes the session).
+
+Threads:
+    AsyncBridge          event loop on a daemon thread; submit() runs a
+                         coroutine on it from synchronous code
+    ThreadedAsyncServer  AsyncServer on a bridge putting every received value
+                         into q (a Queue or telemetry_hub.TelemetryHub), a drop
+                         in for libserver.ThreadedServer.  The Qt GUI drains its
+                         hub subscription from its QTimer, which is the only
+                         hand over into the Qt event loop.
+    ClientBridge         AsyncClient for synchronous senders (the SDA telemetry
+                         process): post() returns at once, and when the link
+                         falls behind only the newest value is sent
+
+Throughput and latency against the selectors implementation over loopback:
+
+    python3 -m network_transfer.libasync --count 2000
+'''
+
+import asyncio
+import json
+import struct
+import sys
+import threading
+from collections import deque
+
+HEADER_FIELDS = ('byteorder', 'content-length', 'content-type', 'content-encoding')
+
+
+def encode_message(content, content_type='text/json', content_encoding='utf-8'):
+    '''One framed message; content is JSON encoded for text/json, else bytes'''
+    if content_type == 'text/json':
+        content = json.dumps(content, ensure_ascii=False).encode(content_encoding)
+    header = json.dumps({
+        'byteorder': sys.byteorder,
+        'content-type': content_type,
+        'content-encoding': content_encoding,
+        'content-length': len(content),
+    }, ensure_ascii=False).encode('utf-8')
+    return struct.pack('>H', len(header)) + header + content
+
+
+async def read_message(reader):
+    '''
+    Next (header, content) from a StreamReader, content decoded for text/json.
+    Returns None when the peer closed between messages.
+    '''
+    try:
+        hdrlen, = struct.unpack('>H', await reader.readexactly(2))
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    header = json.loads((await reader.readexactly(hdrlen)).decode('utf-8'))
+    for field in HEADER_FIELDS:
+        if field not in header:
+            raise ValueError('Missing required header "{}".'.format(field))
+    content = await reader.readexactly(header['content-length'])
+    if header['content-type'] == 'text/json':
+        content = json.loads(content.decode(header['content-encoding']))
+    return header, content
+
+
+class AsyncServer:
+    '''
+    Answers requests like libserver.Message, on long lived sessions.
+
+    Inputs:
+        host (str):         hostname or IP address
+        port (int):         port for the socket, should be above 1024
+        on_value (callable): called on the loop thread with each send_data value
+    '''
+    def __init__(self, host, port, on_value=None, verbose=False):
+        self.host = host
+        self.port = port
+        self.on_value = on_value
+        self.verbose = verbose
+        self.server = None
+        self.sessions = 0
+        self.requests = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._session, self.host, self.port)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _session(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        self.sessions += 1
+        if self.verbose:
+            print("accepted connection from", addr)
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                writer.write(self.respond(*message))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            print("session error for {}: {}".format(addr, repr(e)))
+        finally:
+            writer.close()
+            if self.verbose:
+                print("closing connection to", addr)
+
+    def respond(self, header, request):
+        '''Response message for one request'''
+        self.requests += 1
+        if header['content-type'] != 'text/json':
+            return encode_message(b"First 10 bytes of request: " + request[:10],
+                                  'binary/custom-server-binary-type', 'binary')
+        action = request.get('action')
+        if action == 'send_data':
+            if self.on_value is not None:
+                self.on_value(request.get('value'))
+            content = {'result': 'Data Received'}
+        else:
+            content = {'result': 'Error: invalid action "{}".'.format(action)}
+        return encode_message(content)
+
+
+class AsyncClient:
+    '''
+    One long lived session to host:port.  send() can be called again before the
+    responses arrive (they are matched in order); request() waits for its own.
+    The session is opened on first use and again after the server closes it.
+    '''
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self._pending = deque()     # response futures, oldest first
+        self._reader_task = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self._reader_task = asyncio.ensure_future(self._read_responses(self.reader, self.writer))
+
+    async def _read_responses(self, reader, writer):
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    raise ConnectionError('Peer closed.')
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_result(message[1])
+        except (OSError, EOFError, ValueError, IndexError) as e:
+            self._disconnect(writer, e)
+
+    def _disconnect(self, writer, exc):
+        writer.close()
+        if self.writer is writer:
+            self.reader = self.writer = None
+            while self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError('Session closed: ' + repr(exc)))
+
+    async def send(self, action, value):
+        '''Writes one request, waiting while the link is backed up; returns the response future'''
+        if self.writer is None:
+            await self.connect()
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append(future)
+        self.writer.write(encode_message({'action': action, 'value': value}))
+        await self.writer.drain()
+        return future
+
+    async def request(self, action, value):
+        return await (await self.send(action, value))
+
+    async def close(self):
+        if self.writer is not None:
+            self._disconnect(self.writer, ConnectionError('closed by client'))
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+
+
+class AsyncBridge(threading.Thread):
+    '''Runs an asyncio event loop on a daemon thread for synchronous callers'''
+    def __init__(self):
+        threading.Thread.__init__(self, name='asyncio', daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def start(self):
+        threading.Thread.start(self)
+        self._ready.wait()
+        return self
+
+    def submit(self, coro):
+        '''Schedules coro on the loop; returns a concurrent.futures.Future'''
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, fn, *args):
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self):
+        if self.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.join(2)
+
+
+class ThreadedAsyncServer:
+    '''
+    AsyncServer on its own AsyncBridge.  Each received request['value'] is passed
+    to q.put(), like libserver.ThreadedServer.
+    '''
+    def __init__(self, q, host, port, print_data=False, verbose=False):
+        self.q = q
+        self.print_data = print_data
+        self.server = AsyncServer(host, port, self._deliver, verbose)
+        self.bridge = AsyncBridge()
+
+    def _deliver(self, value):
+        if self.print_data:
+            print(value)
+        self.q.put(value)
+
+    def start(self):
+        self.bridge.start()
+        self.bridge.submit(self.server.start()).result()
+        print("listening on", (self.server.host, self.server.port))
+
+    def stop(self):
+        self.bridge.submit(self.server.close()).result(2)
+        self.bridge.stop()
+
+
+class ClientBridge:
+    '''
+    Sends values from synchronous code over one AsyncClient session.  post()
+    never blocks; a value still waiting when the next is posted is replaced.
+
+    Inputs:
+        host (str), port (int): telemetry server
+        action (str):           request action for every value
+        retry (float):          [s] pause after a failed send
+    '''
+    def __init__(self, host, port, action='send_data', retry=1.0, bridge=None):
+        self.action = action
+        self.retry = retry
+        self.bridge = bridge if bridge is not None else AsyncBridge().start()
+        self.client = AsyncClient(host, port)
+        self.sent = 0
+        self.replaced = 0
+        self.failed = 0
+        self._latest = None
+        self._wake = self.bridge.submit(self._make_event()).result()
+        self._task = self.bridge.submit(self._sender())
+
+    async def _make_event(self):
+        return asyncio.Event()
+
+    def post(self, value):
+        self.bridge.call(self._post, value)
+
+    def _post(self, value):
+        if self._latest is not None:
+            self.replaced += 1
+        self._latest = value
+        self._wake.set()
+
+    async def _sender(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            value, self._latest = self._latest, None
+            try:
+                await self.client.request(self.action, value)
+                self.sent += 1
+            except (OSError, EOFError) as e:
+                self.failed += 1
+                print("Telemetry send failed: " + repr(e))
+                await asyncio.sleep(self.retry)
+
+    def close(self):
+        self._task.cancel()
+        self.bridge.submit(self.client.close()).result(2)
+        self.bridge.stop()
+
+
+def _benchmark(host, port, count, size):
+    '''Loopback comparison of the selectors and asyncio transports'''
+    import contextlib
+    import io
+    from queue import Queue
+    from time import perf_counter, sleep
+    from network_transfer.libclient import BaseClient
+    from network_transfer.libserver import ThreadedServer
+
+    value = {'CH{}'.format(i): float(i) for i in range(size)}
+
+    def report(name, latencies, elapsed):
+        latencies = sorted(latencies)
+        line = '{:<28} {:>9.0f} msg/s'.format(name, count / elapsed)
+        if latencies:
+            line += '   mean {:7.1f} us   p99 {:7.1f} us'.format(
+                1e6 * sum(latencies) / len(latencies), 1e6 * latencies[int(0.99 * (len(latencies) - 1))])
+        print(line)
+
+    # selectors: a new connection and selector for every message
+    q = Queue()
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = ThreadedServer(q, host=host, port=port)
+        server.daemon = True
+        server.start()
+        sleep(0.2)
+        client = BaseClient()
+        latencies = []
+        start = perf_counter()
+        for i in range(count):
+            t = perf_counter()
+            client.send_message(host, port, 'send_data', value)
+            latencies.append(perf_counter() - t)
+        elapsed = perf_counter() - start
+    report('selectors request/response', latencies, elapsed)
+    sleep(0.1)
+    received = q.qsize()
+
+    # asyncio: one session
+    q = Queue()
+    server = ThreadedAsyncServer(q, host, port + 1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        server.start()
+
+    async def run():
+        client = AsyncClient(host, port + 1)
+        await client.connect()
+        latencies = []
+        start = perf_counter()
+        for i in range(count):
+            t = perf_counter()
+            await client.request('send_data', value)
+            latencies.append(perf_counter() - t)
+        report('asyncio request/response', latencies, perf_counter() - start)
+
+        start = perf_counter()
+        futures = [await client.send('send_data', value) for i in range(count)]
+        await asyncio.gather(*futures)
+        report('asyncio pipelined', [], perf_counter() - start)
+        await client.close()
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(run())
+    loop.close()
+    server.stop()
+    print('received: selectors {}  asyncio {} of {}'.format(received, q.qsize(), 2 * count))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='network_transfer transport benchmark')
+    parser.add_argument('--server', default='127.0.0.1:5060', help='<host>:<port>, port + 1 is also used')
+    parser.add_argument('--count', type=int, default=2000, help='messages per run')
+    parser.add_argument('--size', type=int, default=60, help='channels per message')
+    args = parser.parse_args()
+
+    host, port = args.server.split(':')
+    _benchmark(host, int(port), args.count, args.size)
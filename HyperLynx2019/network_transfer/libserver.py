@@ -3,9 +3,9 @@ import socket
 import selectors
 import traceback
 import json
-import io
 import struct
 import threading
+import time
 from queue import Queue
 
 
@@ -20,13 +20,18 @@ class BaseServer:
     Inputs:
         host (str):     hostname or IP address
         port (int):     port for the socket, should be above 1024
-        log (str):      filepath to log incoming data, NOT IMPLEMENTED
+        log (str):      telemetry_store file to record incoming data to
         print_data (bool): whether or not to print data that has been received
     '''
     def __init__(self, host, port, **kwargs):
         self.sel = None
         self.print_data = kwargs.get('print_data', False)
         self.verbose = kwargs.get('verbose', False)
+        self.store = None
+        self.frames = 0         # requests received, the seq of each recorded frame
+        if kwargs.get('log'):
+            from network_transfer.telemetry_store import Writer
+            self.store = Writer(kwargs['log'])
 
         self.host = host
         self.port = port
@@ -45,7 +50,9 @@ class BaseServer:
 
         try:
             while True:
-                events = self.sel.select(timeout=None)
+                events = self.sel.select(timeout=None if self.store is None else 0.1)
+                if self.store is not None:
+                    self.store.poll()
                 for key, mask in events:
                     if key.data is None:
                         self._accept_wrapper(key.fileobj)
@@ -53,10 +60,10 @@ class BaseServer:
                         message = key.data
                         try:
                             message.process_events(mask)
-                            if self.print_data:
-                                self._print_data(message.request.get('value'))
-                            ### add code to send data to local stack ###
-                            ## write data to file
+                            for request in message.requests:
+                                if self.print_data:
+                                    self._print_data(request.get('value'))
+                                self._write_file(request.get('value'))
                         except Exception:
                             print(
                                 "main: error: exception for",
@@ -68,6 +75,8 @@ class BaseServer:
             print("caught keyboard interrupt, exiting")
         finally:
             self.sel.close()
+            if self.store is not None:
+                self.store.close()
 
     def _accept_wrapper(self, sock):
         conn, addr = sock.accept()  # Should be ready to read
@@ -77,27 +86,47 @@ class BaseServer:
         message = Message(self.sel, conn, addr)
         self.sel.register(conn, selectors.EVENT_READ, data=message)
 
-    def _write_file(self):
-        pass
+    def _write_file(self, data):
+        self.frames += 1
+        if self.store is not None and isinstance(data, dict):
+            self.store.append(time.time(), data, self.frames)
 
     def _print_data(self, data):
         print(data)
 
 
+# Receive buffer of each connection; it grows for frames that do not fit
+RECV_BUFFER_SIZE = 65536
+RECV_CHUNK = 4096
+
+
 class Message:
     '''
-
+    One client connection.  Each frame is a 2 byte header length, a JSON header
+    and the content; every complete request is answered with one response, and
+    the connection stays open until the client closes it.
+
+    Received bytes go straight into a preallocated bytearray (recv_into) and are
+    parsed in place through a memoryview with a read cursor, so header and JSON
+    content are decoded without copying the buffer.  Every complete frame in the
+    buffer is parsed in one read(); they are listed in self.requests.  Only the
+    bytes of a partial frame are moved, to the front of the buffer, when it fills.
     '''
     def __init__(self, selector, sock, addr, verbose=False):
         self.selector = selector
         self.sock = sock
         self.addr = addr
-        self._recv_buffer = b""
-        self._send_buffer = b""
+        self._recv_buffer = bytearray(RECV_BUFFER_SIZE)
+        self._recv_view = memoryview(self._recv_buffer)
+        self._recv_start = 0        # read cursor, first byte not parsed yet
+        self._recv_end = 0          # end of the received bytes
+        self._send_buffer = bytearray()
         self._jsonheader_len = None
         self.jsonheader = None
-        self.request = None
-        self.response_created = False
+        self.request = None         # last complete request
+        self.requests = []          # requests completed by the last process_events()
+        self.frames = 0
+        self.peer_closed = False
 
         self.verbose = verbose
 
@@ -113,18 +142,35 @@ class Message:
             raise ValueError("Invalid events mask mode {}.".format(repr(mode)))
         self.selector.modify(self.sock, events, data=self)
 
+    def _available(self):
+        return self._recv_end - self._recv_start
+
+    def _reserve(self, n):
+        """Make room for n more bytes after the received ones."""
+        if len(self._recv_buffer) - self._recv_end >= n:
+            return
+        pending = bytes(self._recv_view[self._recv_start:self._recv_end])
+        if len(pending) + n > len(self._recv_buffer):
+            self._recv_view.release()
+            self._recv_buffer = bytearray(max(2 * len(self._recv_buffer), len(pending) + n))
+            self._recv_view = memoryview(self._recv_buffer)
+        self._recv_buffer[:len(pending)] = pending
+        self._recv_start = 0
+        self._recv_end = len(pending)
+
     def _read(self):
+        self._reserve(RECV_CHUNK)
         try:
             # Should be ready to read
-            data = self.sock.recv(4096)
+            n = self.sock.recv_into(self._recv_view[self._recv_end:])
         except BlockingIOError:
             # Resource temporarily unavailable (errno EWOULDBLOCK)
             pass
         else:
-            if data:
-                self._recv_buffer += data
+            if n:
+                self._recv_end += n
             else:
-                raise RuntimeError("Peer closed.")
+                self.peer_closed = True
 
     def _write(self):
         if self._send_buffer:
@@ -137,21 +183,17 @@ class Message:
                 # Resource temporarily unavailable (errno EWOULDBLOCK)
                 pass
             else:
-                self._send_buffer = self._send_buffer[sent:]
-                # Close when the buffer is drained. The response has been sent.
-                if sent and not self._send_buffer:
-                    self.close()
+                del self._send_buffer[:sent]
+        if not self._send_buffer:
+            # All responses sent, wait for the next request
+            self._set_selector_events_mask("r")
 
     def _json_encode(self, obj, encoding):
         return json.dumps(obj, ensure_ascii=False).encode(encoding)
 
     def _json_decode(self, json_bytes, encoding):
-        tiow = io.TextIOWrapper(
-            io.BytesIO(json_bytes), encoding=encoding, newline=""
-        )
-        obj = json.load(tiow)
-        tiow.close()
-        return obj
+        # str() decodes any buffer, memoryview slices included, without a bytes copy
+        return json.loads(str(json_bytes, encoding))
 
     def _create_message(
         self, *, content_bytes, content_type, content_encoding
@@ -195,30 +237,39 @@ class Message:
         return response
 
     def process_events(self, mask):
+        self.requests = []
         if mask & selectors.EVENT_READ:
             self.read()
-        if mask & selectors.EVENT_WRITE:
+        if mask & selectors.EVENT_WRITE and self.sock is not None:
             self.write()
 
     def read(self):
         self._read()
 
-        if self._jsonheader_len is None:
-            self.process_protoheader()
-
-        if self._jsonheader_len is not None:
+        # Parse every complete frame received so far
+        while True:
+            if self._jsonheader_len is None:
+                self.process_protoheader()
+                if self._jsonheader_len is None:
+                    break
             if self.jsonheader is None:
                 self.process_jsonheader()
-
-        if self.jsonheader:
-            if self.request is None:
-                self.process_request()
+                if self.jsonheader is None:
+                    break
+            if not self.process_request():
+                break
+        if self._recv_start == self._recv_end:
+            self._recv_start = self._recv_end = 0
+
+        if self.peer_closed:
+            # The frames completed above are still in self.requests for the server loop
+            if self._available() or self._jsonheader_len is not None:
+                print("Peer {} closed in the middle of a message, dropping it.".format(self.addr))
+            self.close()
+        elif self.requests:
+            self._set_selector_events_mask("rw")
 
     def write(self):
-        if self.request:
-            if not self.response_created:
-                self.create_response()
-
         self._write()
 
     def close(self):
@@ -245,19 +296,20 @@ class Message:
 
     def process_protoheader(self):
         hdrlen = 2
-        if len(self._recv_buffer) >= hdrlen:
-            self._jsonheader_len = struct.unpack(
-                ">H", self._recv_buffer[:hdrlen]
+        if self._available() >= hdrlen:
+            self._jsonheader_len = struct.unpack_from(
+                ">H", self._recv_buffer, self._recv_start
             )[0]
-            self._recv_buffer = self._recv_buffer[hdrlen:]
+            self._recv_start += hdrlen
 
     def process_jsonheader(self):
         hdrlen = self._jsonheader_len
-        if len(self._recv_buffer) >= hdrlen:
+        if self._available() >= hdrlen:
+            start = self._recv_start
             self.jsonheader = self._json_decode(
-                self._recv_buffer[:hdrlen], "utf-8"
+                self._recv_view[start:start + hdrlen], "utf-8"
             )
-            self._recv_buffer = self._recv_buffer[hdrlen:]
+            self._recv_start += hdrlen
             for reqhdr in (
                 "byteorder",
                 "content-length",
@@ -266,13 +318,18 @@ class Message:
             ):
                 if reqhdr not in self.jsonheader:
                     raise ValueError('Missing required header "{}".'.format(reqhdr))
+        else:
+            self._reserve(hdrlen - self._available())
 
     def process_request(self):
+        """Parse the content of the current frame; False until all of it has arrived."""
         content_len = self.jsonheader["content-length"]
-        if not len(self._recv_buffer) >= content_len:
-            return
-        data = self._recv_buffer[:content_len]
-        self._recv_buffer = self._recv_buffer[content_len:]
+        if self._available() < content_len:
+            self._reserve(content_len - self._available())
+            return False
+        start = self._recv_start
+        data = self._recv_view[start:start + content_len]
+        self._recv_start += content_len
         if self.jsonheader["content-type"] == "text/json":
             encoding = self.jsonheader["content-encoding"]
             self.request = self._json_decode(data, encoding)
@@ -281,15 +338,20 @@ class Message:
                 print("received request, action:", self.request.get('action'),
                     "from", self.addr)
         else:
-            # Binary or unknown content-type
-            self.request = data
+            # Binary or unknown content-type, copied out of the receive buffer
+            self.request = bytes(data)
             if self.verbose:
                 print(
                 'received {} request from'.format(self.jsonheader["content-type"]),
                 self.addr,
                 )
-        # Set selector to listen for write events, we're done reading.
-        self._set_selector_events_mask("w")
+        data.release()
+        self.requests.append(self.request)
+        self.frames += 1
+        self.create_response()
+        self._jsonheader_len = None
+        self.jsonheader = None
+        return True
 
     def create_response(self):
         if self.jsonheader["content-type"] == "text/json":
@@ -298,10 +360,15 @@ class Message:
             # Binary or unknown content-type
             response = self._create_response_binary_content()
         message = self._create_message(**response)
-        self.response_created = True
         self._send_buffer += message
 
 class ThreadedServer(threading.Thread, BaseServer):
+    '''
+    BaseServer on its own thread.  Each received request['value'] is passed to
+    q.put(), once: q can be a Queue or a telemetry_hub.TelemetryHub.  Clients
+    can send one request per connection (libclient) or keep the connection
+    open and stream them (libasync.AsyncClient).
+    '''
     def __init__(self, q, **kwargs):
         threading.Thread.__init__(self)
         BaseServer.__init__(self, **kwargs)
@@ -323,7 +390,9 @@ class ThreadedServer(threading.Thread, BaseServer):
 
         try:
             while True:
-                events = self.sel.select(timeout=None)
+                events = self.sel.select(timeout=None if self.store is None else 0.1)
+                if self.store is not None:
+                    self.store.poll()
                 for key, mask in events:
                     if key.data is None:
                         self._accept_wrapper(key.fileobj)
@@ -331,10 +400,11 @@ class ThreadedServer(threading.Thread, BaseServer):
                         message = key.data
                         try:
                             message.process_events(mask)
-                            if self.print_data:
-                                self._print_data(message.request.get('value'))
-                            self.q.put(message.request.get('value'))
-                            ## write data to file (not implemented)
+                            for request in message.requests:
+                                if self.print_data:
+                                    self._print_data(request.get('value'))
+                                self.q.put(request.get('value'))
+                                self._write_file(request.get('value'))
                         except Exception:
                             print(
                                 "main: error: exception for",
@@ -346,11 +416,12 @@ class ThreadedServer(threading.Thread, BaseServer):
             print("caught keyboard interrupt, exiting")
         finally:
             self.sel.close()
+            if self.store is not None:
+                self.store.close()
 
 
 if __name__ == "__main__":
     import argparse
-    import time
 
     parser = argparse.ArgumentParser(description='Pod Data Simulator')
     parser.add_argument(
@@ -360,6 +431,7 @@ if __name__ == "__main__":
     parser.add_argument(
         '-t', help='use Threaded server', action='store_true', default=False
     )
+    parser.add_argument('--log', help='telemetry_store file to record to')
     args = parser.parse_args()
 
     if args.server:
@@ -371,7 +443,7 @@ if __name__ == "__main__":
     
     if args.t:
         q = Queue()
-        serv = ThreadedServer(q, host=host, port=port, print_data=args.p)
+        serv = ThreadedServer(q, host=host, port=port, print_data=args.p, log=args.log)
         serv.setDaemon(True)
         serv.start()
         for i in range(200):
@@ -379,5 +451,5 @@ if __name__ == "__main__":
                 print(q.get())
             time.sleep(2)
     else:
-        serv = BaseServer(host=host, port=port, print_data=args.p)
+        serv = BaseServer(host=host, port=port, print_data=args.p, log=args.log)
         serv.start_server()
@@ -0,0 +1,315 @@
+'''
+Ground side telemetry hub.  The pod's telemetry stream (pod_ipc.run_telemetry)
+is received once by a ThreadedServer and fanned out to any number of
+subscribers: GUIs, the Recorder (columnar telemetry_store file), a Relay to a GUI on another machine and
+the SpaceXForwarder feeding the mock SpaceX receiver.
+
+Every subscriber has its own bounded ring.  When a ring is full the oldest
+sample is dropped and counted, so a slow subscriber loses its own history but
+never holds up the server thread or the other subscribers.  stats() reports
+per subscriber how many samples were received, delivered and dropped, how many
+are waiting and how old the oldest waiting one is (its lag).
+
+    hub = TelemetryHub()
+    gui = hub.subscribe('gui')
+    hub.serve('localhost', 5050)
+    ...
+    for seq, stamp, data in gui.drain():
+        data_dict.update(data)
+
+Run as a script to receive, record, relay and print the statistics:
+
+    python3 -m network_transfer.telemetry_hub --server localhost:5050 \\
+        --record logs/telemetry.hlt --relay 192.168.0.20:5050 --spacex localhost:1028
+'''
+
+import socket
+import struct
+import threading
+from collections import deque
+from time import sleep, time
+
+from network_transfer.libserver import ThreadedServer
+from network_transfer.libclient import BaseClient
+from network_transfer.telemetry_store import Writer
+
+
+class Subscription:
+    '''
+    One subscriber's ring of (seq, stamp, value) samples, newest last.
+
+    Inputs:
+        name (str):     name shown in the hub statistics
+        size (int):     ring length; the oldest sample is dropped when full
+    '''
+    def __init__(self, name, size=256):
+        self.name = name
+        self.size = size
+        self.closed = False
+        self._ring = deque(maxlen=size)
+        self._cond = threading.Condition()
+
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.last_seq = 0       # seq of the last sample delivered
+
+    def offer(self, sample):
+        '''Called by the hub for every published sample, never blocks on the reader'''
+        with self._cond:
+            if len(self._ring) == self.size:
+                self.dropped += 1
+            self._ring.append(sample)
+            self.received += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        '''Oldest waiting sample, waiting up to timeout [s]; None on timeout or close'''
+        with self._cond:
+            if not self._ring and not self.closed:
+                self._cond.wait(timeout)
+            if not self._ring:
+                return None
+            sample = self._ring.popleft()
+            self.delivered += 1
+            self.last_seq = sample[0]
+            return sample
+
+    def drain(self):
+        '''All waiting samples, oldest first, without waiting'''
+        with self._cond:
+            samples = list(self._ring)
+            self._ring.clear()
+            if samples:
+                self.delivered += len(samples)
+                self.last_seq = samples[-1][0]
+        return samples
+
+    def pending(self):
+        return len(self._ring)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stats(self, now=None):
+        now = time() if now is None else now
+        with self._cond:
+            pending = len(self._ring)
+            lag = now - self._ring[0][1] if pending else 0.0
+        return {'received': self.received,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'pending': pending,
+                'lag': lag,
+                'last_seq': self.last_seq}
+
+
+class TelemetryHub:
+    '''
+    Fans each published value out to every subscription.  put() makes the hub a
+    drop in for the Queue of a ThreadedServer.
+    '''
+    def __init__(self):
+        self.seq = 0
+        self.subscriptions = ()     # replaced, never modified, so publish() needs no lock
+        self._lock = threading.Lock()
+        self.server = None
+
+    def subscribe(self, name, size=256):
+        sub = Subscription(name, size)
+        with self._lock:
+            self.subscriptions = self.subscriptions + (sub,)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not sub)
+        sub.close()
+
+    def publish(self, value):
+        self.seq += 1
+        sample = (self.seq, time(), value)
+        for sub in self.subscriptions:
+            sub.offer(sample)
+
+    put = publish
+
+    def serve(self, host, port, transport='selectors', **kwargs):
+        '''
+        Receive the pod stream on host:port into the hub, with a daemon
+        libserver.ThreadedServer or, for transport='asyncio', a
+        libasync.ThreadedAsyncServer.
+        '''
+        if transport == 'asyncio':
+            from network_transfer.libasync import ThreadedAsyncServer
+            self.server = ThreadedAsyncServer(self, host, port, **kwargs)
+        else:
+            self.server = ThreadedServer(q=self, host=host, port=port, **kwargs)
+            self.server.setDaemon(True)
+        self.server.start()
+        return self.server
+
+    def stats(self):
+        now = time()
+        return {'published': self.seq,
+                'subscribers': {sub.name: sub.stats(now) for sub in self.subscriptions}}
+
+    def print_stats(self):
+        stats = self.stats()
+        print('published {}'.format(stats['published']))
+        for name, s in stats['subscribers'].items():
+            print('  {:<12} delivered {:>8}  dropped {:>6}  pending {:>4}  lag {:6.3f} s'.format(
+                name, s['delivered'], s['dropped'], s['pending'], s['lag']))
+
+
+class _Consumer(threading.Thread):
+    '''
+    Daemon thread handling each sample of its own subscription with handle().
+    After stop() the samples still waiting are handled before finish().
+    '''
+    def __init__(self, hub, name, size=256):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self.hub = hub
+        self.sub = hub.subscribe(name, size)
+
+    def run(self):
+        while True:
+            sample = self.sub.get(timeout=self.idle_timeout)
+            if sample is not None:
+                self.handle(*sample)
+            elif self.sub.closed:
+                break           # closed and the ring is drained
+            self.idle()
+        self.finish()
+
+    idle_timeout = 0.1
+
+    def handle(self, seq, stamp, value):
+        pass
+
+    def idle(self):
+        pass
+
+    def finish(self):
+        pass
+
+    def stop(self):
+        self.hub.unsubscribe(self.sub)
+        self.join(2)
+
+
+class Recorder(_Consumer):
+    '''
+    Records every received sample into a columnar telemetry_store file, stamped
+    with its receive time.  Chunks are written every flush_frames frames or
+    flush_ms, whichever comes first.
+    '''
+    def __init__(self, hub, path, flush_frames=1000, flush_ms=500, size=8192):
+        _Consumer.__init__(self, hub, 'recorder', size)
+        self.writer = Writer(path, flush_frames, flush_ms)
+
+    def handle(self, seq, stamp, value):
+        self.writer.append(stamp, value, seq)
+
+    def idle(self):
+        self.writer.poll()
+
+    def finish(self):
+        self.writer.close()
+
+
+class Relay(_Consumer):
+    '''
+    Forwards the stream to another telemetry server (a GUI or hub on another
+    machine).  Only the newest waiting sample is sent, the ones it replaces
+    count as delivered.
+    '''
+    def __init__(self, hub, host, port, size=16):
+        _Consumer.__init__(self, hub, 'relay {}:{}'.format(host, port), size)
+        self.addr = (host, port)
+        self.client = BaseClient()
+
+    def handle(self, seq, stamp, value):
+        waiting = self.sub.drain()
+        if waiting:
+            value = waiting[-1][2]
+        try:
+            self.client.send_message(self.addr[0], self.addr[1], 'send_data', value)
+        except OSError as e:
+            print('Relay to {} failed: {}'.format(self.addr, repr(e)))
+
+
+class SpaceXForwarder(_Consumer):
+    '''
+    Packs the GUI data dict into the SpaceX telemetry packet (same units as
+    SDA.spacex_data()) and sends it over UDP, e.g. to mock-receiver.py.
+    '''
+    format = '>BB7iI'
+
+    def __init__(self, hub, host, port, team_id=69, size=16):
+        _Consumer.__init__(self, hub, 'spacex {}:{}'.format(host, port), size)
+        self.addr = (host, port)
+        self.team_id = team_id
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def pack(self, data):
+        return struct.pack(self.format, self.team_id, int(data.get('state', 0)),
+                           int(data.get('accl', 0) * 3217.4),            # g to cm/s2
+                           int(data.get('pos', 0) * 30.48),              # ft to cm
+                           int(data.get('spd', 0) * 30.48),              # ft/s to cm/s
+                           int(data.get('LVBatt_Voltage', 0) * 1000),    # V to mV
+                           int(data.get('LVBatt_Current', 0) * 1000),    # A to mA
+                           int(data.get('LVBatt_Temp', 0) * 10),         # C to dC
+                           int(data.get('PV_Left_Temp', 0) * 10),
+                           int(data.get('stp_cnt', 0)))
+
+    def handle(self, seq, stamp, value):
+        try:
+            self.sock.sendto(self.pack(value), self.addr)
+        except OSError as e:
+            print('SpaceX packet to {} failed: {}'.format(self.addr, repr(e)))
+
+    def finish(self):
+        self.sock.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    def host_port(text):
+        host, port = text.split(':')
+        return host, int(port)
+
+    parser = argparse.ArgumentParser(description='Pod telemetry hub')
+    parser.add_argument('--server', type=host_port, default=('localhost', 5050), help='<host>:<port> to receive on')
+    parser.add_argument('--record', help='telemetry_store file to record the received samples to')
+    parser.add_argument('--relay', type=host_port, action='append', default=[], help='<host>:<port> of another GUI')
+    parser.add_argument('--spacex', type=host_port, help='<host>:<port> of the (mock) SpaceX receiver')
+    parser.add_argument('--transport', choices=['selectors', 'asyncio'], default='selectors',
+                        help='receiving server implementation')
+    parser.add_argument('--stats', type=float, default=5, help='seconds between statistics prints')
+    args = parser.parse_args()
+
+    hub = TelemetryHub()
+    consumers = []
+    if args.record:
+        consumers.append(Recorder(hub, args.record))
+    for host, port in args.relay:
+        consumers.append(Relay(hub, host, port))
+    if args.spacex:
+        consumers.append(SpaceXForwarder(hub, args.spacex[0], args.spacex[1]))
+    for consumer in consumers:
+        consumer.start()
+    hub.serve(args.server[0], args.server[1], args.transport)
+
+    try:
+        while True:
+            sleep(args.stats)
+            hub.print_stats()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for consumer in consumers:
+            consumer.stop()
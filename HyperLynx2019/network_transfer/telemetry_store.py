@@ -0,0 +1,309 @@
+'''
+Columnar telemetry store for the ground station.  Received telemetry dicts are
+batched into chunks of NumPy columns and appended to one file; a small index
+file next to it holds the time span and offset of every chunk, so a session of
+any length can be opened and seeked to a timestamp with one binary search over
+the index and one chunk read.
+
+File layout (little endian):
+
+    path            b'HLTS' version
+                    chunk*: b'CHNK' rows cols names_len t0 t1
+                            names (JSON list, padded to 8 bytes)
+                            time[rows]  seq[rows]      float64
+                            data[cols][rows]           float64, one column after another
+    path + '.idx'   one (t0, t1, offset, rows) record per chunk
+
+A chunk is written when it has flush_frames frames or its oldest frame is
+flush_ms old.  Its index record is only written after the chunk, so the index
+never points past the data; a file without (or with a short) index is indexed
+again by walking the chunk headers.  Every chunk carries its own channel list,
+so channels can appear mid session; values that are missing or not numbers
+are stored as NaN.
+
+    writer = Writer('logs/run1.hlt')
+    writer.append(time(), {'IMU1_Z': 0.98, ...})
+    writer.close()
+
+    reader = Reader('logs/run1.hlt')
+    t, cols = reader.read(t0, t1, ['IMU1_Z', 'LIDAR'])
+    frame = reader.at(t)
+'''
+
+import json
+import os
+import struct
+from time import time
+
+import numpy
+
+MAGIC = b'HLTS'
+VERSION = 1
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sIIIdd')
+INDEX_DTYPE = numpy.dtype([('t0', '<f8'), ('t1', '<f8'), ('offset', '<i8'), ('rows', '<u4')])
+
+
+class Writer:
+    '''
+    Appends telemetry frames to path in columnar chunks.
+
+    Inputs:
+        path (str):             store file, the index is path + '.idx'
+        flush_frames (int):     frames per chunk
+        flush_ms (float):       longest time a frame waits in memory [ms]
+    '''
+    def __init__(self, path, flush_frames=1000, flush_ms=500):
+        self.path = path
+        self.flush_frames = flush_frames
+        self.flush_age = flush_ms / 1000.0
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(MAGIC + struct.pack('<I', VERSION))
+            self.file.flush()
+        else:
+            # Index any chunks missing from the index, drop a torn last chunk
+            end = Reader(path).end
+            self.file.truncate(end)
+            self.file.seek(end)
+        self.index = open(path + '.idx', 'ab')
+
+        self.names = []
+        self.columns = {}       # {name: column number}
+        self.times = numpy.empty(flush_frames)
+        self.seqs = numpy.empty(flush_frames)
+        self.data = numpy.empty((0, flush_frames))
+        self.rows = 0
+        self.frames = 0
+        self.chunks = 0
+        self.first = 0.0        # wall time the oldest buffered frame arrived
+
+    def _add_columns(self, names):
+        data = numpy.full((len(self.names) + len(names), self.flush_frames), numpy.nan)
+        data[:len(self.names), :self.rows] = self.data[:, :self.rows]
+        for name in names:
+            self.columns[name] = len(self.names)
+            self.names.append(name)
+        self.data = data
+
+    def append(self, stamp, value, seq=0):
+        '''One frame: stamp [s], value {channel: number}, seq the sender's frame number'''
+        columns = self.columns
+        new = [name for name in value if name not in columns]
+        if new:
+            self._add_columns(new)
+        if self.rows == 0:
+            self.first = time()
+        i = self.rows
+        data = self.data
+        data[:, i] = numpy.nan
+        for name, x in value.items():
+            try:
+                data[columns[name], i] = x
+            except (TypeError, ValueError):
+                pass
+        self.times[i] = stamp
+        self.seqs[i] = seq
+        self.rows = i + 1
+        self.frames += 1
+        if self.rows == self.flush_frames:
+            self.flush()
+
+    def poll(self, now=None):
+        '''Write the chunk if its oldest frame has waited flush_ms; call when idle'''
+        if self.rows and (time() if now is None else now) - self.first >= self.flush_age:
+            self.flush()
+
+    def flush(self):
+        n = self.rows
+        if not n:
+            return
+        names = json.dumps(self.names).encode('utf-8')
+        names += b' ' * (-len(names) % 8)
+        offset = self.file.tell()
+        t0 = self.times[0]
+        t1 = self.times[n - 1]
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, n, len(self.names), len(names), t0, t1))
+        self.file.write(names)
+        self.file.write(self.times[:n].tobytes())
+        self.file.write(self.seqs[:n].tobytes())
+        self.file.write(numpy.ascontiguousarray(self.data[:, :n]).tobytes())
+        self.file.flush()
+        record = numpy.array([(t0, t1, offset, n)], dtype=INDEX_DTYPE)
+        self.index.write(record.tobytes())
+        self.index.flush()
+        self.rows = 0
+        self.chunks += 1
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index.close()
+
+
+class Reader:
+    '''
+    Random access to a store written by Writer.  Frames are assumed to arrive
+    in time order (they are stamped on receipt).
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.end = 8
+        with open(path, 'rb') as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(path + ': not a telemetry store')
+        self.index = self._load_index()
+        self._chunk_no = None
+        self._chunk = None
+
+    def _load_index(self):
+        index_path = self.path + '.idx'
+        index = numpy.zeros(0, dtype=INDEX_DTYPE)
+        if os.path.exists(index_path):
+            raw = open(index_path, 'rb').read()
+            index = numpy.frombuffer(raw[:len(raw) - len(raw) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+        # Chunks written after the last index record (or without an index)
+        offset = 8
+        if len(index):
+            offset = int(index['offset'][-1]) + self._chunk_size(int(index['offset'][-1]))
+        tail = []
+        with open(self.path, 'rb') as f:
+            while offset + CHUNK_HEADER.size <= self.size:
+                f.seek(offset)
+                magic, rows, cols, names_len, t0, t1 = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+                size = CHUNK_HEADER.size + names_len + 8 * rows * (cols + 2)
+                if magic != CHUNK_MAGIC or offset + size > self.size:
+                    break       # torn last chunk
+                tail.append((t0, t1, offset, rows))
+                offset += size
+        self.end = offset       # end of the last complete chunk
+        if tail:
+            index = numpy.concatenate([index, numpy.array(tail, dtype=INDEX_DTYPE)])
+            with open(index_path, 'wb') as f:
+                f.write(index.tobytes())
+        return index
+
+    def _chunk_size(self, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            magic, rows, cols, names_len, t0, t1 = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+        return CHUNK_HEADER.size + names_len + 8 * rows * (cols + 2)
+
+    def __len__(self):
+        return int(self.index['rows'].sum())
+
+    def time_range(self):
+        if not len(self.index):
+            return None
+        return float(self.index['t0'][0]), float(self.index['t1'][-1])
+
+    def chunk(self, n):
+        '''(time, seq, {name: column}) of chunk n'''
+        if n == self._chunk_no:
+            return self._chunk
+        with open(self.path, 'rb') as f:
+            f.seek(int(self.index['offset'][n]))
+            magic, rows, cols, names_len, t0, t1 = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+            names = json.loads(f.read(names_len).decode('utf-8'))
+            arrays = numpy.fromfile(f, dtype='<f8', count=rows * (cols + 2)).reshape(cols + 2, rows)
+        self._chunk_no = n
+        self._chunk = (arrays[0], arrays[1], dict(zip(names, arrays[2:])))
+        return self._chunk
+
+    def seek(self, t):
+        '''(chunk, row) of the last frame at or before t, or of the first frame'''
+        n = int(numpy.searchsorted(self.index['t1'], t, side='left'))
+        if n == len(self.index):
+            n -= 1
+        times = self.chunk(n)[0]
+        row = int(numpy.searchsorted(times, t, side='right')) - 1
+        if row < 0 and n > 0:
+            n -= 1
+            row = int(self.index['rows'][n]) - 1
+        return n, max(row, 0)
+
+    def at(self, t):
+        '''The frame at or just before t as {'time', 'seq', channel: value}'''
+        n, row = self.seek(t)
+        times, seqs, cols = self.chunk(n)
+        frame = {name: float(col[row]) for name, col in cols.items()}
+        frame['time'] = float(times[row])
+        frame['seq'] = float(seqs[row])
+        return frame
+
+    def read(self, t0, t1, channels=None):
+        '''(time, {channel: values}) of all frames with t0 <= time <= t1'''
+        first = int(numpy.searchsorted(self.index['t1'], t0, side='left'))
+        last = int(numpy.searchsorted(self.index['t0'], t1, side='right'))
+        times = []
+        columns = {}
+        total = 0
+        for n in range(first, last):
+            t, seq, cols = self.chunk(n)
+            lo = int(numpy.searchsorted(t, t0, side='left'))
+            hi = int(numpy.searchsorted(t, t1, side='right'))
+            names = cols if channels is None else channels
+            for name in names:
+                if name not in columns:
+                    columns[name] = [numpy.full(total, numpy.nan)]
+            for name, parts in columns.items():
+                col = cols.get(name)
+                parts.append(col[lo:hi] if col is not None else numpy.full(hi - lo, numpy.nan))
+            times.append(t[lo:hi])
+            total += hi - lo
+        times = numpy.concatenate(times) if times else numpy.zeros(0)
+        return times, {name: numpy.concatenate(parts) for name, parts in columns.items()}
+
+
+def _benchmark(path, frames, channels):
+    from time import perf_counter
+    for name in (path, path + '.idx'):
+        if os.path.exists(name):
+            os.remove(name)
+    names = ['CH{}'.format(i) for i in range(channels)]
+    value = {name: float(i) for i, name in enumerate(names)}
+
+    writer = Writer(path)
+    start = perf_counter()
+    for i in range(frames):
+        writer.append(1000.0 + i / 1000.0, value, i)        # 1 kHz timestamps
+    writer.close()
+    elapsed = perf_counter() - start
+    print('write  {} frames x {} channels: {:.0f} frames/s, {:.1f} MB'.format(
+        frames, channels, frames / elapsed, os.path.getsize(path) / 2 ** 20))
+
+    start = perf_counter()
+    reader = Reader(path)
+    print('open   {} chunks: {:.2f} ms'.format(len(reader.index), 1000 * (perf_counter() - start)))
+
+    seeks = numpy.random.RandomState(0).uniform(1000.0, 1000.0 + frames / 1000.0, 200)
+    start = perf_counter()
+    for t in seeks:
+        reader.at(t)
+    print('seek   {:.3f} ms per random timestamp'.format(1000 * (perf_counter() - start) / len(seeks)))
+
+    start = perf_counter()
+    t, cols = reader.read(1000.0, 1010.0, ['CH0'])
+    print('read   10 s of one channel ({} frames): {:.2f} ms'.format(len(t), 1000 * (perf_counter() - start)))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Telemetry store')
+    parser.add_argument('path', help='store file')
+    parser.add_argument('--bench', type=int, metavar='FRAMES', help='write FRAMES synthetic frames and time seeks')
+    parser.add_argument('--channels', type=int, default=60)
+    parser.add_argument('--at', type=float, help='print the frame at this time [s]')
+    args = parser.parse_args()
+
+    if args.bench:
+        _benchmark(args.path, args.bench, args.channels)
+    else:
+        reader = Reader(args.path)
+        print('{} frames in {} chunks, time {}'.format(len(reader), len(reader.index), reader.time_range()))
+        if args.at is not None:
+            for key, value in sorted(reader.at(args.at).items()):
+                print('{:<28} {}'.format(key, value))
@@ -0,0 +1,259 @@
+"""
+   HyperLynx: pod_fsm.py
+
+   Purpose:
+   Table driven state machine for the pod states of SDA.py.  Every state is
+   declared once, with its actions, guarded transitions, events and timeout:
+
+       fsm = StateMachine()
+       fsm.state(3, 'Launching', run=run_launching, enter=start_launch,
+                 timeout=60, on_timeout=timeout_fault)
+       fsm.transition(3, 5, guard=past_bbp, label='crossed BBP')
+       fsm.event('abort', (2, 3, 5, 6), 7)
+       fsm.compile(invalid=7, on_invalid=invalid_fault)
+
+       fsm.step(pod, now)                  # once per control loop
+       fsm.fire('abort', pod, now)         # from do_commands()
+
+   Actions and guards are called with the pod object, which holds the current
+   state number in pod.state.  compile() turns the declarations into a list
+   indexed by state number; each row holds the state's run action, its
+   transitions as a tuple of (guard, target, action, label) in declared order,
+   its timeout and its event rows.  step() is one index, the run action, the
+   guards of that state only and one subtraction for the timeout, whatever the
+   number of states.  A transition runs the exit action of the old state, the
+   transition's action and then the entry action of the new state.
+
+   The machine keeps the time the current state was entered, and the time in
+   state is now - entered, so there are no per state timers to reset.  A state
+   number missing from the table goes to the invalid state given to compile().
+
+   Per step cost, for a machine of any size:
+
+       python3 pod_fsm.py --states 20 --guards 4
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+
+class _State():
+    __slots__ = ('number', 'name', 'run', 'enter', 'exit', 'timeout', 'on_timeout', 'transitions', 'events')
+
+    def __init__(self, number, name, run, enter, exit, timeout, on_timeout):
+        self.number = number
+        self.name = name
+        self.run = run
+        self.enter = enter
+        self.exit = exit
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.transitions = ()   # ((guard, target, action, label), ...), set by compile()
+        self.events = {}        # {event: ((guard, target, action, label), ...)}, set by compile()
+
+
+class StateMachine():
+    def __init__(self, log=print):
+        self.log = log              # called with a line for every transition, None for silence
+        self._states = {}
+        self._transitions = []      # (source, guard, target, action, label)
+        self._events = []           # (event, source, guard, target, action, label)
+        self.table = []
+        self.invalid = None
+        self.on_invalid = None
+
+        self.entered = 0.0          # time the current state was entered
+        self.count = 0              # transitions made
+        self.last = None            # (source, target, label) of the last transition
+
+    def state(self, number, name, run=None, enter=None, exit=None, timeout=None, on_timeout=None):
+        """
+        Declares state number.  run is called on every step in the state, enter and exit on
+        the transitions into and out of it, and on_timeout on every step once the state has
+        lasted more than timeout [s].
+        """
+        if number in self._states:
+            raise ValueError('State {} declared twice'.format(number))
+        if timeout is not None and on_timeout is None:
+            raise ValueError('State {} has a timeout but no on_timeout action'.format(number))
+        self._states[number] = _State(number, name, run, enter, exit, timeout, on_timeout)
+
+    def transition(self, source, target, guard=None, action=None, label=''):
+        """
+        Transition checked on every step in source (a state or a tuple of states), after the
+        run action.  The first transition whose guard is true (or that has no guard) is taken.
+        """
+        for s in self._sources(source):
+            self._transitions.append((s, guard, target, action, label))
+
+    def event(self, name, source, target=None, guard=None, action=None, label=''):
+        """
+        Response to event name in source (a state, a tuple of states or None for all of
+        them), made by fire().  The first row whose guard is true is used; a row without a
+        target only runs its action.
+        """
+        for s in self._sources(source):
+            self._events.append((name, s, guard, target, action, label))
+
+    def _sources(self, source):
+        if source is None:
+            return sorted(self._states)
+        if isinstance(source, int):
+            return (source,)
+        return source
+
+    def compile(self, invalid, on_invalid=None):
+        """
+        Builds the dispatch table.  A pod found in an unknown state has on_invalid called
+        and goes to state invalid.
+        """
+        for s, guard, target, action, label in self._transitions:
+            self._check(s, target)
+        for name, s, guard, target, action, label in self._events:
+            self._check(s, target)
+        self._check(invalid, invalid)
+
+        table = [None] * (max(self._states) + 1)
+        for number, state in self._states.items():
+            state.transitions = tuple((guard, target, action, label)
+                                      for s, guard, target, action, label in self._transitions if s == number)
+            events = {}
+            for name, s, guard, target, action, label in self._events:
+                if s == number:
+                    events.setdefault(name, []).append((guard, target, action, label))
+            state.events = {name: tuple(rows) for name, rows in events.items()}
+            table[number] = state
+        self.table = table
+        self.invalid = invalid
+        self.on_invalid = on_invalid
+        return self
+
+    def _check(self, source, target):
+        for number in (source, target):
+            if number is not None and number not in self._states:
+                raise ValueError('Undeclared state {}'.format(number))
+
+    def start(self, pod, now):
+        """Enters pod.state at now, running its entry action"""
+        self.entered = now
+        state = self._row(pod, now)
+        if state.enter is not None:
+            state.enter(pod)
+
+    def _row(self, pod, now):
+        number = pod.state
+        if 0 <= number < len(self.table):
+            state = self.table[number]
+            if state is not None:
+                return state
+        if self.on_invalid is not None:
+            self.on_invalid(pod)
+        self.go(pod, self.invalid, now, label='invalid state {}'.format(number))
+        return self.table[self.invalid]
+
+    def step(self, pod, now):
+        """One control loop in the current state; returns True if a transition was taken"""
+        state = self._row(pod, now)
+        if state.run is not None:
+            state.run(pod)
+        for guard, target, action, label in state.transitions:
+            if guard is None or guard(pod):
+                self.go(pod, target, now, action, label)
+                return True
+        if state.timeout is not None and now - self.entered > state.timeout:
+            state.on_timeout(pod)
+        return False
+
+    def fire(self, name, pod, now):
+        """Handles event name in the current state; returns False if no row applied"""
+        state = self._row(pod, now)
+        for guard, target, action, label in state.events.get(name, ()):
+            if guard is None or guard(pod):
+                if target is None:
+                    if action is not None:
+                        action(pod)
+                else:
+                    self.go(pod, target, now, action, label or name)
+                return True
+        return False
+
+    def go(self, pod, target, now, action=None, label=''):
+        """Transition from pod.state to target at now"""
+        source = pod.state
+        old = self.table[source] if 0 <= source < len(self.table) else None
+        if old is not None and old.exit is not None:
+            old.exit(pod)
+        if action is not None:
+            action(pod)
+        new = self.table[target]
+        pod.state = target
+        self.entered = now
+        self.count += 1
+        self.last = (source, target, label)
+        if self.log is not None:
+            self.log('TRANS: {}({}) to {}({}){}'.format(old.name if old is not None else 'INVALID', source,
+                                                       new.name, target, ': ' + label if label else ''))
+        if new.enter is not None:
+            new.enter(pod)
+
+    def time_in_state(self, now):
+        return now - self.entered
+
+    def name(self, number):
+        state = self.table[number] if 0 <= number < len(self.table) else None
+        return state.name if state is not None else 'INVALID'
+
+
+def _benchmark(states, guards, cycles):
+    """Time per step() in the first and last state, none of the guards passing"""
+    from time import perf_counter
+
+    class Pod():
+        state = 0
+        x = 0.0
+
+    def run(pod):
+        pod.x += 1.0
+
+    def never(pod):
+        return pod.x < 0
+
+    def fault(pod):
+        pass
+
+    fsm = StateMachine(log=None)
+    for number in range(states):
+        fsm.state(number, 'S{}'.format(number), run=run, timeout=1e9, on_timeout=fault)
+        for g in range(guards):
+            fsm.transition(number, (number + 1) % states, guard=never)
+        fsm.event('abort', number, 0)
+    fsm.compile(invalid=0)
+
+    pod = Pod()
+    for number in (0, states - 1):
+        pod.state = number
+        fsm.start(pod, 0.0)
+        start = perf_counter()
+        for i in range(cycles):
+            fsm.step(pod, 1.0)
+        elapsed = perf_counter() - start
+        print('state {:>3} of {}, {} guards: {:.2f} us per step'.format(
+            number, states, guards, 1e6 * elapsed / cycles))
+
+    start = perf_counter()
+    for i in range(cycles):
+        pod.state = states - 1
+        fsm.fire('abort', pod, 1.0)
+    print('abort event:                 {:.2f} us per fire'.format(1e6 * (perf_counter() - start) / cycles))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pod state machine step cost')
+    parser.add_argument('--states', type=int, default=8)
+    parser.add_argument('--guards', type=int, default=4, help='failing guards per state')
+    parser.add_argument('--cycles', type=int, default=100000)
+    args = parser.parse_args()
+
+    _benchmark(args.states, args.guards, args.cycles)
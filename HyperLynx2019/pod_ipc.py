@@ -0,0 +1,267 @@
+"""
+   HyperLynx: pod_ipc.py
+
+   Purpose:
+   Move disk logging and GUI telemetry off the control process.
+
+   The control loop (SDA.py) publishes one record per loop into a shared
+   memory ring buffer.  Each slot is guarded by a seqlock: the writer makes the
+   slot sequence odd, copies the record in, then makes it even again.  Readers
+   copy a slot and re-check its sequence; a torn or overwritten read is simply
+   retried or skipped.  The writer never waits on a reader, so a slow SD card
+   write or a TCP retransmit in a consumer process can never stall run_state().
+
+   Layout of the shared block:
+       [0:8]                       head - total number of records published
+       [8:8+8*slots]               per-slot sequence numbers
+       [8+8*slots:]                slots x width float64 records
+
+   Consumers:
+       run_logger()    - writes the tab separated log file (same format as
+                         the old SDA.write_file())
+       run_telemetry() - sends the GUI data dict to the ground server
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+import datetime
+import os
+from time import sleep, time
+import multiprocessing
+import numpy
+
+try:
+    from multiprocessing import shared_memory   # Python 3.8+
+except ImportError:
+    shared_memory = None
+
+
+# Default ring size; at a ~100 Hz control loop this holds ~10 s of history
+RING_SLOTS = 1024
+
+_HEADER = 8
+
+
+class StateRing():
+    """
+    Single producer / many consumer ring buffer of float64 records in shared memory.
+
+    Create it in the control process with create=True, then hand ring.name and
+    ring.slots (or, with the mmap fallback, the object itself through fork) to
+    the consumer processes.
+    """
+    def __init__(self, width, slots=RING_SLOTS, name=None, create=False):
+        self.width = int(width)
+        self.slots = int(slots)
+        size = _HEADER + 8 * self.slots + 8 * self.slots * self.width
+
+        if shared_memory is not None:
+            self._shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+            buf = self._shm.buf
+            self.name = self._shm.name
+        else:
+            # Pre 3.8 fallback: anonymous shared mapping, inherited by forked children
+            import mmap
+            self._shm = mmap.mmap(-1, size)
+            buf = self._shm
+            self.name = None
+
+        self._owner = create
+        self._head = numpy.ndarray((1,), dtype=numpy.uint64, buffer=buf, offset=0)
+        self._seq = numpy.ndarray((self.slots,), dtype=numpy.uint64, buffer=buf, offset=_HEADER)
+        self._data = numpy.ndarray((self.slots, self.width), dtype=numpy.float64, buffer=buf,
+                                   offset=_HEADER + 8 * self.slots)
+        if create:
+            self._head[0] = 0
+            self._seq[:] = 0
+
+    def publish(self, values):
+        """Write one record.  Never blocks; the oldest slot is overwritten."""
+        n = int(self._head[0])
+        i = n % self.slots
+        self._seq[i] = 2 * n + 1            # odd: slot is being written
+        self._data[i, :] = values
+        self._seq[i] = 2 * n + 2            # even: slot is stable for record n
+        self._head[0] = n + 1
+
+    def head(self):
+        """Total number of records published so far."""
+        return int(self._head[0])
+
+    def read(self, n, out):
+        """
+        Copy record number n into out.  Returns True on a clean read, False if the
+        slot was being written or has already been overwritten by a newer record.
+        """
+        i = n % self.slots
+        s1 = self._seq[i]
+        out[:] = self._data[i, :]
+        s2 = self._seq[i]
+        return s1 == s2 == 2 * n + 2
+
+    def close(self):
+        # Drop the numpy views before releasing the buffer they point into
+        self._head = self._seq = self._data = None
+        if shared_memory is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+        else:
+            self._shm.close()
+
+
+class RingReader():
+    """
+    Consumer side cursor over a StateRing.  Tracks records dropped because the
+    reader fell more than a ring length behind the writer.
+    """
+    def __init__(self, ring):
+        self.ring = ring
+        self.cursor = ring.head()
+        self.dropped = 0
+        self.record = numpy.zeros(ring.width)
+
+    def next(self):
+        """Return the next record (a reused array) or None if caught up."""
+        while True:
+            head = self.ring.head()
+            if self.cursor >= head:
+                return None
+            oldest = head - self.ring.slots + 1     # keep one slot of slack for the writer
+            if self.cursor < oldest:
+                self.dropped += oldest - self.cursor
+                self.cursor = oldest
+            if self.ring.read(self.cursor, self.record):
+                self.cursor += 1
+                return self.record
+            # Torn read; the writer lapped us, resync on the next pass
+
+    def latest(self):
+        """Skip straight to the newest record.  Returns None if nothing new."""
+        head = self.ring.head()
+        if head == 0 or head <= self.cursor:
+            return None
+        for n in range(head - 1, max(head - self.ring.slots, 0) - 1, -1):
+            if self.ring.read(n, self.record):
+                self.dropped += n - self.cursor
+                self.cursor = n + 1
+                return self.record
+        return None
+
+
+class StatePublisher():
+    """
+    Control process side.  channels is the ordered list of record fields; the
+    position of each name is fixed for the life of the ring so consumers can
+    index records without any per-record lookups.
+    """
+    def __init__(self, channels, slots=RING_SLOTS):
+        self.channels = list(channels)
+        self.index = {name: i for i, name in enumerate(self.channels)}
+        self.ring = StateRing(len(self.channels), slots=slots, create=True)
+        self.record = numpy.zeros(len(self.channels))
+        self.processes = []
+
+    def publish(self):
+        self.ring.publish(self.record)
+
+    def start(self, target, *args):
+        """Start a consumer process running target(ring_ref, channels, *args)."""
+        ring_ref = (self.ring.name, self.ring.slots) if self.ring.name is not None else self.ring
+        proc = multiprocessing.Process(target=target, args=(ring_ref, self.channels) + args)
+        proc.daemon = True
+        proc.start()
+        self.processes.append(proc)
+        return proc
+
+    def close(self):
+        for proc in self.processes:
+            proc.terminate()
+        self.ring.close()
+
+
+def _attach(ring_ref, channels):
+    if isinstance(ring_ref, StateRing):
+        return ring_ref
+    name, slots = ring_ref
+    return StateRing(len(channels), slots=slots, name=name)
+
+
+def _new_log(log_dir):
+    """Create a new log file with the same naming and header as SDA.create_log()"""
+    date = datetime.datetime.today()
+    new_number = str(date.year) + str(date.month) + str(date.day) \
+                 + str(date.hour) + str(date.minute) + str(date.second)
+    file_name = os.path.join(log_dir, 'log_' + new_number)
+    file = open(file_name, 'a')
+    columns = ['Label', 'Value', 'Fault', 'Time']
+    file.write('\t'.join(map(lambda column_title: "\"" + column_title + "\"", columns)))
+    file.write("\n")
+    print("Log file created: " + str(file_name))
+    return file
+
+
+def run_logger(ring_ref, channels, rows, log_dir='logs/', log_rate=10, idle_sleep=0.01):
+    """
+    Logger process.  Writes the newest record at log_rate [Hz] in the
+    Label/Value/Fault/Time format read by log_viewer.m and gui_data_simulator.
+
+    rows is a list of (label, value channel, fault) where fault is either the
+    name of a 'fault:<key>' channel or a literal string for the Fault column.
+    A change of the 'log_seq' channel starts a new log file (SDA.create_log()).
+    """
+    ring = _attach(ring_ref, channels)
+    reader = RingReader(ring)
+    index = {name: i for i, name in enumerate(channels)}
+    rows = [(label, index[value], index.get(fault), fault) for label, value, fault in rows]
+    seq_idx = index['log_seq']
+    clock_idx = index['clock']
+
+    file = None
+    log_seq = None
+    last_write = 0
+    while True:
+        record = reader.latest()
+        if record is None or (time() - last_write) < (1 / log_rate):
+            sleep(idle_sleep)
+            continue
+        last_write = time()
+
+        if record[seq_idx] != log_seq:
+            log_seq = record[seq_idx]
+            if file is not None:
+                file.close()
+            file = _new_log(log_dir)
+
+        stamp = '\t' + str(round(record[clock_idx], 2)) + '\n'
+        lines = []
+        for label, i, f, fault in rows:
+            if f is not None:
+                fault = str(int(record[f]))
+            lines.append(label + '\t' + str(record[i]) + '\t' + fault + stamp)
+        file.write(''.join(lines))
+        file.flush()
+
+
+def run_telemetry(ring_ref, channels, fields, host, port, rate=10, idle_sleep=0.01):
+    """
+    Telemetry process.  fields is a list of (key, channel); sends {key: value}
+    to the ground server at rate [Hz] over one long lived network_transfer
+    session (libasync.ClientBridge).  Sends never block this loop: if the link
+    falls behind, only the newest record is sent.
+    """
+    from network_transfer.libasync import ClientBridge
+    ring = _attach(ring_ref, channels)
+    reader = RingReader(ring)
+    link = ClientBridge(host, port)
+    fields = [(key, channels.index(channel)) for key, channel in fields]
+
+    last_send = 0
+    while True:
+        record = reader.latest()
+        if record is None or (time() - last_send) < (1 / rate):
+            sleep(idle_sleep)
+            continue
+        last_send = time()
+        link.post({key: float(record[i]) for key, i in fields})
@@ -0,0 +1,262 @@
+"""
+   HyperLynx: sensor_registry.py
+
+   Purpose:
+   One declaration of every pod data channel, read from the 'channels' section of
+   sensors_config.yaml.  From it the pod builds:
+
+       acquisition plan    which HyperlynxECS getters poll_sensors() calls, grouped
+                           so a getter returning several channels (getAcceleration)
+                           is called once, and ordered by mux channel so the TCA9548
+                           is switched as few times as possible
+       poll schedule       how often each getter is called in each pod state
+       filters             the FilterBank config (filter_bank.py)
+       log/telemetry       which channels the logger and GUI processes get
+       GUI tables          {table: {channel: label}} for Server.py
+
+   Channels are numbered in file order when the registry is loaded; index[name]
+   is that channel's integer index.
+
+   Poll rates:  a channel's 'rate' is a number [Hz] for every state, a mapping
+   {state name: Hz, default: Hz}, or the name of such a mapping in the 'rates'
+   section.  States are named as in SDA.Status (SafeToApproach, Launching, ...).
+   A getter is called at the highest rate of its channels; between calls its
+   channels keep their last value, and SensorPoller keeps when each was read.
+
+   Channel sources:
+       driver   read from an I2C device through HyperlynxECS (has a 'read' key)
+       can      BMS and motor controller, filled from the CAN bus
+       fusion   computed by SDA.sensor_fusion()
+       host     Raspberry Pi health
+       pod      other values SDA puts in sensor_data
+       gui      GUI summary values from SDA.data_dump(), not in sensor_data
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+SOURCES = ('driver', 'can', 'fusion', 'host', 'pod', 'gui')
+
+_DEFAULTS = {
+    'args': (),
+    'field': None,
+    'mux': None,
+    'rate': 0,
+    'scale': 1,
+    'offset': 0,
+    'units': '',
+    'sim': 'read',
+    'filter': None,
+    'log': True,
+    'telemetry': True,
+    'gui': None,
+}
+
+
+class Channel():
+    def __init__(self, name, spec, profiles=None):
+        spec = dict(spec or {})
+        unknown = set(spec) - set(_DEFAULTS) - {'read', 'source'}
+        if unknown:
+            raise ValueError(name + ': unknown keys ' + str(sorted(unknown)))
+        self.name = name
+        self.read = spec.get('read')
+        self.source = spec.get('source', 'driver' if self.read else 'pod')
+        if self.source not in SOURCES:
+            raise ValueError(name + ': unknown source ' + str(self.source))
+        if self.source == 'driver' and not self.read:
+            raise ValueError(name + ": driver channel without a 'read' getter")
+        for key, default in _DEFAULTS.items():
+            setattr(self, key, spec.get(key, default))
+        self.args = tuple(self.args)
+        if self.gui is not None and len(self.gui) != 2:
+            raise ValueError(name + ': gui must be [table, label]')
+        if isinstance(self.rate, str):
+            if self.rate not in (profiles or {}):
+                raise ValueError(name + ': unknown rate profile ' + self.rate)
+            self.rate = profiles[self.rate]
+
+    def rate_in(self, state=None):
+        """Poll rate [Hz] in the named state."""
+        if isinstance(self.rate, dict):
+            return float(self.rate.get(state, self.rate.get('default', 0)))
+        return float(self.rate)
+
+    def polled(self, flight_sim=False):
+        """True if poll_sensors() reads this channel from its driver."""
+        if self.read is None or not self.rate:
+            return False
+        return not flight_sim or self.sim == 'read'
+
+    def sim_value(self):
+        """Constant substituted for the reading in flight sim mode, or None."""
+        if self.sim in ('read', 'skip'):
+            return None
+        return float(self.sim)
+
+
+class SensorRegistry():
+    def __init__(self, config, rates=None):
+        self.rates = dict(rates or {})
+        self.channels = [Channel(name, spec, self.rates) for name, spec in (config or {}).items()]
+        self.names = [ch.name for ch in self.channels]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.by_name = dict(zip(self.names, self.channels))
+
+    @classmethod
+    def from_yaml(cls, path='sensors_config.yaml', section='channels'):
+        import yaml
+        with open(path) as f:
+            config = yaml.safe_load(f)
+        return cls(config.get(section), config.get('rates'))
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __getitem__(self, name):
+        return self.by_name[name]
+
+    def sensor_channels(self):
+        """Channels that live in SDA's sensor_data (everything but the GUI summary values)."""
+        return [ch.name for ch in self.channels if ch.source != 'gui']
+
+    def sensor_names(self):
+        """Channels measured by the pod's hardware: I2C drivers, CAN and the Pi itself."""
+        return [ch.name for ch in self.channels if ch.source in ('driver', 'can', 'host')]
+
+    def log_channels(self):
+        return [ch.name for ch in self.channels if ch.log and ch.source != 'gui']
+
+    def telemetry_channels(self):
+        return [ch.name for ch in self.channels if ch.telemetry]
+
+    def filter_config(self):
+        """{channel: filter spec} for filter_bank.FilterBank."""
+        return {ch.name: ch.filter for ch in self.channels if ch.filter}
+
+    def gui_tables(self):
+        """{table: {channel: label}} in file order, the layout Server.py displays."""
+        tables = {}
+        for ch in self.channels:
+            if ch.gui:
+                table, label = ch.gui
+                tables.setdefault(table, {})[ch.name] = label
+        return tables
+
+    def acquisition_plan(self, flight_sim=False):
+        """
+        Returns (reads, constants).  reads is a list of
+        (getter, args, [(channel, field, scale, offset), ...]) with one entry per
+        distinct getter call, grouped by mux channel in file order.  constants is
+        a list of (channel, value) for channels replaced by a fixed value in flight
+        sim mode.
+        """
+        groups = {}
+        mux_order = []
+        constants = []
+        for ch in self.channels:
+            if flight_sim and ch.read and ch.rate and ch.sim_value() is not None:
+                constants.append((ch.name, ch.sim_value()))
+                continue
+            if not ch.polled(flight_sim):
+                continue
+            if ch.mux not in mux_order:
+                mux_order.append(ch.mux)
+            key = (ch.read, ch.args)
+            if key not in groups:
+                groups[key] = (ch.mux, [])
+            groups[key][1].append((ch.name, ch.field, ch.scale, ch.offset))
+
+        reads = [(read, args, targets) for (read, args), (mux, targets) in groups.items()]
+        reads.sort(key=lambda r: mux_order.index(groups[(r[0], r[1])][0]))
+        return reads, constants
+
+    def bind(self, driver, flight_sim=False, states=None, getters=None):
+        """
+        Acquisition plan with the getters resolved on driver (a HyperlynxECS), or
+        in getters {name: function} for reads the driver doesn't have.  states is
+        {state name: state key}; the poller's schedule follows the key passed to
+        poll().
+        """
+        reads, constants = self.acquisition_plan(flight_sim)
+        getters = getters or {}
+        bound = []
+        intervals = {None: []}
+        for state in (states or {}):
+            intervals[states[state]] = []
+        names = {None: None}
+        names.update((key, state) for state, key in (states or {}).items())
+        for read, args, targets in reads:
+            getter = getters[read] if read in getters else getattr(driver, read)
+            bound.append((getter, args, targets))
+            for key, interval in intervals.items():
+                rate = max(self.by_name[t[0]].rate_in(names[key]) for t in targets)
+                interval.append(1.0 / rate if rate > 0 else None)
+        return SensorPoller(bound, constants, intervals)
+
+    def check(self, names):
+        """
+        Compares the registry with another list of channel names (e.g. the
+        abortranges.dat sensors).  Returns the names missing from the registry.
+        """
+        return [name for name in names if name not in self.by_name]
+
+
+class SensorPoller():
+    """
+    Bound acquisition plan.  poll() calls the getters that are due in the
+    current state into sensor_data; the others keep their last value.  Without
+    a time every getter is called.
+
+        read_time[name]   when the channel was last read (its age is now - read_time)
+        sample_dt[name]   time between its last two reads
+        stale             channels skipped by the last poll()
+
+    A read is due up to EARLY of its interval early, so a loop running at a
+    channel's rate polls it every cycle despite jitter.
+    """
+    EARLY = 0.1
+
+    def __init__(self, reads, constants, intervals=None):
+        self.reads = reads
+        self.constants = constants
+        self.intervals = intervals or {None: [0.0] * len(reads)}
+        self.due = [0.0] * len(reads)
+        self.read_time = {}
+        self.sample_dt = {}
+        self.stale = set()
+        self._state = None
+        self._interval = self.intervals[None]
+
+    def age(self, name, now):
+        """Seconds since channel name was read, None if it never was."""
+        if name not in self.read_time:
+            return None
+        return now - self.read_time[name]
+
+    def poll(self, sensor_data, now=None, state=None):
+        if state != self._state:
+            # New state: its rates apply from now, channels it reads faster are due at once
+            self._state = state
+            self._interval = self.intervals.get(state, self.intervals[None])
+            self.due = [0.0] * len(self.reads)
+        for name, value in self.constants:
+            sensor_data[name] = value
+        stale = self.stale
+        stale.clear()
+        for i, (getter, args, targets) in enumerate(self.reads):
+            if now is not None:
+                interval = self._interval[i]
+                if interval is None or now < self.due[i]:
+                    stale.update(t[0] for t in targets)
+                    continue
+                self.due[i] = now + interval * (1 - self.EARLY)
+            result = getter(*args)
+            for name, field, scale, offset in targets:
+                value = result if field is None else result[field]
+                if scale != 1 or offset:
+                    value = value * scale + offset
+                sensor_data[name] = value
+                if now is not None:
+                    self.sample_dt[name] = now - self.read_time.get(name, now)
+                    self.read_time[name] = now
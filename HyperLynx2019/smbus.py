@@ -21,7 +21,7 @@
 """I2C interface that mimics the Python SMBus API."""
 
 from ctypes import c_uint8, c_uint16, c_uint32, cast, pointer, POINTER
-from ctypes import create_string_buffer, Structure
+from ctypes import create_string_buffer, memmove, Structure
 from fcntl import ioctl
 import struct
 
@@ -44,6 +44,7 @@ I2C_FUNCS             = 0x0705  # Get the adapter functionality mask
 I2C_RDWR              = 0x0707  # Combined R/W transfer (one STOP only)
 I2C_PEC               = 0x0708  # != 0 to use PEC with SMBus
 I2C_SMBUS             = 0x0720  # SMBus transfer
+I2C_RDWR_MAX_MSGS     = 42      # I2C_RDWR_IOCTL_MAX_MSGS, messages per I2C_RDWR
 # pylint: enable=bad-whitespace
 
 
@@ -88,6 +89,47 @@ def make_i2c_rdwr_data(messages):
     data.nmsgs = len(messages)
     return data
 
+class I2CTransaction(object):
+    """A prepared I2C_RDWR transaction.  The i2c_msg array, the ioctl struct
+    and every data buffer are allocated once here; SMBus.execute() then only
+    makes the ioctl call.  messages is a list of (address, flags, data) where
+    data is the number of bytes to read for I2C_M_RD messages and the bytes to
+    send otherwise.
+
+    results holds a memoryview of each read buffer, in message order.  They
+    are overwritten by the next execute() of the same transaction, so copy
+    anything that has to outlive it.
+    """
+
+    def __init__(self, messages):
+        self._buffers = []
+        self._msgs = (i2c_msg*len(messages))()
+        self.results = []
+        for i, (addr, flags, data) in enumerate(messages):
+            if flags & I2C_M_RD:
+                length = data
+                buf = create_string_buffer(length)
+                self.results.append(memoryview(buf).cast('B'))
+            else:
+                length = len(data)
+                buf = create_string_buffer(bytes(data), length)
+            self._buffers.append(buf)
+            self._msgs[i].addr = addr & 0x7F
+            self._msgs[i].flags = flags
+            self._msgs[i].len = length
+            self._msgs[i].buf = cast(buf, POINTER(c_uint8)) if length else None
+        self.request = i2c_rdwr_ioctl_data()
+        self.request.msgs = self._msgs
+        self.request.nmsgs = len(messages)
+        # Single read transactions hand back their one buffer directly.
+        self.result = self.results[0] if len(self.results) == 1 else tuple(self.results)
+
+    def set_data(self, index, data):
+        """Replace the bytes sent by write message index (same length)."""
+        assert len(data) == self._msgs[index].len, 'Prepared write length cannot change!'
+        memmove(self._buffers[index], bytes(data), len(data))
+
+
 # Create an interface that mimics the Python SMBus API.
 class SMBus(object): # pylint: disable=useless-object-inheritance
     """I2C interface that mimics the Python SMBus API but is implemented with
@@ -101,6 +143,9 @@ class SMBus(object): # pylint: disable=useless-object-inheritance
         called to open the bus.
         """
         self._device = None
+        self._fd = None
+        self._addr = None       # slave address last selected with I2C_SLAVE
+        self._prepared = {}     # (addr, cmd, length) -> I2CTransaction for the read_* calls
         if bus is not None:
             self.open(bus)
 
@@ -128,6 +173,8 @@ class SMBus(object): # pylint: disable=useless-object-inheritance
         # Try to open the file for the specified bus.  Must turn off buffering
         # or else Python 3 fails (see: https://bugs.python.org/issue20074)
         self._device = open('/dev/i2c-{0}'.format(bus), 'r+b', buffering=0)
+        self._fd = self._device.fileno()
+        self._addr = None
         # TODO: Catch IOError and throw a better error message that describes
         # what's wrong (i.e. I2C may not be enabled or the bus doesn't exist).
 
@@ -137,10 +184,65 @@ class SMBus(object): # pylint: disable=useless-object-inheritance
         if self._device is not None:
             self._device.close()
             self._device = None
+            self._fd = None
+            self._addr = None
 
     def _select_device(self, addr):
-        """Set the address of the device to communicate with on the I2C bus."""
-        ioctl(self._device.fileno(), I2C_SLAVE, addr & 0x7F)
+        """Set the address of the device to communicate with on the I2C bus.
+        Skipped when it is already the selected address."""
+        addr &= 0x7F
+        if addr != self._addr:
+            ioctl(self._fd, I2C_SLAVE, addr)
+            self._addr = addr
+
+    def prepare_read(self, addr, cmd, length):
+        """Prepared transaction reading length bytes from register cmd of the
+        device.  Pass it to execute(), which returns the data as a memoryview.
+        """
+        return I2CTransaction([(addr, 0, [cmd & 0xFF]),
+                               (addr, I2C_M_RD, length)])
+
+    def prepare_write(self, addr, cmd, data=()):
+        """Prepared transaction writing data (a sequence of bytes) to register
+        cmd of the device.  The data can be changed later with set_data(0, data).
+        """
+        return I2CTransaction([(addr, 0, bytearray([cmd & 0xFF]) + bytearray(data))])
+
+    def prepare_batch(self, reads):
+        """Prepared transaction reading several devices in one I2C_RDWR call,
+        e.g. every sensor behind one mux channel.  reads is a list of
+        (address, cmd, length); each becomes a register write followed by a
+        repeated start read, or a plain read when cmd is None.  execute()
+        returns a tuple with one memoryview per read, in order.
+
+        The kernel accepts at most I2C_RDWR_MAX_MSGS messages per call, and a
+        NACK from any one device fails the whole call with an IOError.
+        """
+        messages = []
+        for addr, cmd, length in reads:
+            if cmd is not None:
+                messages.append((addr, 0, [cmd & 0xFF]))
+            messages.append((addr, I2C_M_RD, length))
+        assert len(messages) <= I2C_RDWR_MAX_MSGS, 'Too many messages for one I2C_RDWR call!'
+        transaction = I2CTransaction(messages)
+        transaction.result = tuple(transaction.results)
+        return transaction
+
+    def execute(self, transaction):
+        """Run a prepared I2CTransaction.  Returns its result: a memoryview for
+        a single read, a tuple of memoryviews for several, () for writes only.
+        """
+        assert self._device is not None, 'Bus must be opened before operations are made against it!'
+        ioctl(self._fd, I2C_RDWR, transaction.request)
+        return transaction.result
+
+    def _read(self, addr, cmd, length):
+        # Register read through a transaction prepared on first use.
+        key = (addr, cmd, length)
+        transaction = self._prepared.get(key)
+        if transaction is None:
+            transaction = self._prepared[key] = self.prepare_read(addr, cmd, length)
+        return self.execute(transaction)
 
     def read_byte(self, addr):
         """Read a single byte from the specified device."""
@@ -156,36 +258,14 @@ class SMBus(object): # pylint: disable=useless-object-inheritance
 
     def read_byte_data(self, addr, cmd):
         """Read a single byte from the specified cmd register of the device."""
-        assert self._device is not None, 'Bus must be opened before operations are made against it!'
-        # Build ctypes values to marshall between ioctl and Python.
-        reg = c_uint8(cmd)
-        result = c_uint8()
-        # Build ioctl request.
-        request = make_i2c_rdwr_data([
-            (addr, 0, 1, pointer(reg)),             # Write cmd register.
-            (addr, I2C_M_RD, 1, pointer(result))    # Read 1 byte as result.
-        ])
-        # Make ioctl call and return result data.
-        ioctl(self._device.fileno(), I2C_RDWR, request)
-        return result.value
+        return self._read(addr, cmd, 1)[0]
 
     def read_word_data(self, addr, cmd):
         """Read a word (2 bytes) from the specified cmd register of the device.
         Note that this will interpret data using the endianness of the processor
         running Python (typically little endian)!
         """
-        assert self._device is not None, 'Bus must be opened before operations are made against it!'
-        # Build ctypes values to marshall between ioctl and Python.
-        reg = c_uint8(cmd)
-        result = c_uint16()
-        # Build ioctl request.
-        request = make_i2c_rdwr_data([
-            (addr, 0, 1, pointer(reg)),             # Write cmd register.
-            (addr, I2C_M_RD, 2, cast(pointer(result), POINTER(c_uint8)))   # Read word (2 bytes).
-        ])
-        # Make ioctl call and return result data.
-        ioctl(self._device.fileno(), I2C_RDWR, request)
-        return result.value
+        return struct.unpack('=H', self._read(addr, cmd, 2))[0]
 
     def read_block_data(self, addr, cmd):
         """Perform a block read from the specified cmd register of the device.
@@ -202,18 +282,7 @@ class SMBus(object): # pylint: disable=useless-object-inheritance
         """Perform a read from the specified cmd register of device.  Length number
         of bytes (default of 32) will be read and returned as a bytearray.
         """
-        assert self._device is not None, 'Bus must be opened before operations are made against it!'
-        # Build ctypes values to marshall between ioctl and Python.
-        reg = c_uint8(cmd)
-        result = create_string_buffer(length)
-        # Build ioctl request.
-        request = make_i2c_rdwr_data([
-            (addr, 0, 1, pointer(reg)),             # Write cmd register.
-            (addr, I2C_M_RD, length, cast(result, POINTER(c_uint8)))   # Read data.
-        ])
-        # Make ioctl call and return result data.
-        ioctl(self._device.fileno(), I2C_RDWR, request)
-        return bytearray(result.raw)  # Use .raw instead of .value which will stop at a null byte!
+        return bytearray(self._read(addr, cmd, length))
 
     def write_quick(self, addr):
         """Write a single byte to the specified device."""
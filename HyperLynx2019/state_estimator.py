@@ -0,0 +1,293 @@
+"""
+   HyperLynx: state_estimator.py
+
+   Purpose:
+   Fuse the pod's motion sensors into one estimate of distance, velocity and
+   acceleration (D/V/A in SDA.true_data) with a linear Kalman filter.
+
+   State vector:   x = [D (ft), V (ft/s), A (g)]
+   Model:          constant acceleration, white noise jerk
+   Measurements:   IMU1_Z, IMU2_Z       -> A
+                   SD_MotorData_MotorRPM -> V  (RPM * wheel circumference / 60)
+                   LIDAR                -> D  (tube length - LIDAR, near the tube end only)
+                   stripe positions     -> D  (see update_position())
+
+   Each measurement is a scalar update applied one after the other, so no matrix
+   inverse is ever needed.  Every update is gated on its normalized innovation;
+   rejected readings are counted and the time since the last reading of each
+   sensor that passed the gate drives IMU_bad_time_elapsed and V_bad_time_elapsed.
+   Readings forced past the gate (a pair of agreeing IMUs, or a sensor re-trusted
+   after max_rejects rejections) are applied but do not reset that time.
+
+   step() takes the drivers' health flags (HyperlynxECS.BNO1_status, ...) by
+   sensor name.  Readings of a sensor flagged bad are not applied at all, and
+   only a sensor flagged good is ever forced past the gate; sensors without a
+   flag (RPM, LIDAR) are gated but never forced.
+
+   The transition matrix and process noise are precomputed for the nominal loop
+   time and only rebuilt when the measured interval is off by more than dt_tol.
+
+   Benchmark against recorded logs, and the sensor failure regression check:
+       python state_estimator.py logs/log_201952181810 [more logs...]
+       python state_estimator.py --check
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+import numpy
+
+G = 32.174      # [ft/s^2] per g
+
+# State indices
+D = 0
+V = 1
+A = 2
+
+
+class PodKalman():
+    def __init__(self, dt=0.01, wheel_circum=numpy.pi * 14.2 / 12, dt_tol=0.1,
+                 q_jerk=25.0, imu_var=0.02 ** 2, rpm_var=2.0 ** 2, lidar_var=0.5 ** 2,
+                 lidar_max=130, gate=4.0, imu_pair_tol=0.2, max_rejects=10):
+        self.dt = dt                        # [s] nominal loop interval
+        self.dt_tol = dt_tol                # fractional dt error before F/Q are rebuilt
+        self.wheel_circum = wheel_circum    # [ft]
+        self.q_jerk = q_jerk                # [(g/s)^2 / Hz] process noise
+        self.imu_var = imu_var              # [g^2]
+        self.rpm_var = rpm_var              # [(ft/s)^2]
+        self.lidar_var = lidar_var          # [ft^2]
+        self.lidar_max = lidar_max          # [ft] usable LIDAR range
+        self.gate2 = gate ** 2              # innovation gate, in sigma^2
+        self.imu_pair_tol = imu_pair_tol    # [g] healthy IMUs agreeing this closely override the gate
+        self.max_rejects = max_rejects      # consecutive rejections before a healthy sensor is re-trusted
+        self.status = {}                    # {sensor name: health flag}, set by step()
+
+        self.F, self.Q = self._model(dt)
+        self._F_last, self._Q_last, self._dt_last = self.F, self.Q, dt
+        self.reset()
+
+    def _model(self, dt):
+        """Transition matrix and process noise for a constant acceleration model."""
+        F = numpy.array([[1.0, dt, 0.5 * G * dt * dt],
+                         [0.0, 1.0, G * dt],
+                         [0.0, 0.0, 1.0]])
+        g = numpy.array([G * dt ** 3 / 6, G * dt * dt / 2, dt])
+        Q = self.q_jerk / dt * numpy.outer(g, g)
+        return F, Q
+
+    def reset(self, distance=0.0, now=0.0):
+        """Zero the state at the given distance (pod at rest)."""
+        self.x = numpy.array([distance, 0.0, 0.0])
+        self.P = numpy.diag([1.0, 0.1, 0.01])
+        self.last_accept = {}
+        self.rejects = {}
+        self.reject_total = {}
+        self.now = now
+
+    def predict(self, dt):
+        """Propagate the state by dt [s]."""
+        if abs(dt - self.dt) <= self.dt_tol * self.dt:
+            F, Q = self.F, self.Q
+        elif dt == self._dt_last:
+            F, Q = self._F_last, self._Q_last
+        elif dt <= 0:
+            return
+        else:
+            F, Q = self._F_last, self._Q_last = self._model(dt)
+            self._dt_last = dt
+        self.x = F.dot(self.x)
+        self.P = F.dot(self.P).dot(F.T) + Q
+
+    def _update(self, k, z, R, name, force=False):
+        """
+        Scalar measurement z of state k with variance R.  Returns True if the
+        reading passed the innovation gate and was applied.  A forced reading
+        outside the gate is applied after opening up the variance of state k,
+        but does not count as accepted for bad_time().
+        """
+        healthy = self.status.get(name)
+        if healthy is False:
+            self.reject_total[name] = self.reject_total.get(name, 0) + 1
+            return False
+        y = z - self.x[k]
+        S = self.P[k, k] + R
+        if y * y > self.gate2 * S:
+            count = self.rejects.get(name, 0) + 1
+            self.rejects[name] = count
+            self.reject_total[name] = self.reject_total.get(name, 0) + 1
+            # Forced, or a healthy sensor has disagreed for too long: the filter is the one that's wrong
+            if not (force or (healthy and count >= self.max_rejects)):
+                return False
+            self.P[k, k] += y * y
+            S = self.P[k, k] + R
+            accepted = False
+        else:
+            accepted = True
+        K = self.P[:, k] / S
+        self.x += K * y
+        self.P -= numpy.outer(K, self.P[k])
+        if accepted:
+            self.rejects[name] = 0
+            self.last_accept[name] = self.now
+        return accepted
+
+    def update_accel(self, z1, z2):
+        """
+        Both IMU Z readings [g].  Two IMUs that agree with each other pass the gate,
+        since that is a real step in acceleration (launch/brake), not an outlier.
+        Not when either is flagged bad.  Both reading exactly 0 is a failed read
+        (HyperlynxECS.getAcceleration() returns zeros), which is not applied at all.
+        """
+        if z1 == 0 and z2 == 0:
+            for name in ('IMU1_Z', 'IMU2_Z'):
+                self.reject_total[name] = self.reject_total.get(name, 0) + 1
+            return
+        force = (abs(z1 - z2) < self.imu_pair_tol and
+                 self.status.get('IMU1_Z') is not False and self.status.get('IMU2_Z') is not False)
+        self._update(A, z1, self.imu_var, 'IMU1_Z', force)
+        self._update(A, z2, self.imu_var, 'IMU2_Z', force)
+
+    def update_rpm(self, rpm):
+        return self._update(V, rpm * self.wheel_circum / 60, self.rpm_var, 'RPM')
+
+    def update_lidar(self, lidar, tube_length):
+        """
+        LIDAR [ft] to the end of the tube.  Ignored outside its usable range, and
+        until dead reckoning puts the end of the tube within that range (so a
+        wall next to the pod in the staging area can't be mistaken for it).
+        """
+        if tube_length <= 0 or not 0 < lidar < self.lidar_max:
+            return False
+        if tube_length - self.x[D] > 2 * self.lidar_max:
+            return False
+        return self._update(D, tube_length - lidar, self.lidar_var, 'LIDAR')
+
+    def update_position(self, distance, var, name='stripe', force=False):
+        """
+        Absolute position fix [ft] with variance var [ft^2].  force skips the
+        innovation gate, for fixes the caller has already matched and gated.
+        """
+        return self._update(D, distance, var, name, force)
+
+    def update_stationary(self, var=0.01 ** 2):
+        """
+        Zero velocity update for when the pod is known to be at rest (S2A).  Keeps
+        an IMU offset from integrating into speed and distance while parked.
+        """
+        self._update(V, 0.0, var, 'stationary', True)
+        self._update(A, 0.0, var, 'stationary', True)
+
+    def bad_time(self, *names):
+        """Seconds since any of the named sensors last produced a reading that passed the gate."""
+        last = max(self.last_accept.get(name, 0.0) for name in names)
+        return self.now - last
+
+    def step(self, dt, now, sensor_data, tube_length=0, stationary=False, status=None):
+        """
+        One control loop: predict, then apply this loop's readings from sensor_data.
+        stationary applies update_stationary() first.  status is {sensor name: health
+        flag} for the sensors that have one (IMU1_Z, IMU2_Z).
+        """
+        if not self.last_accept:
+            for name in ('IMU1_Z', 'IMU2_Z', 'RPM', 'LIDAR'):
+                self.last_accept[name] = now
+        self.now = now
+        if status is not None:
+            self.status = status
+        self.predict(dt)
+        if stationary:
+            self.update_stationary()
+        self.update_accel(sensor_data['IMU1_Z'], sensor_data['IMU2_Z'])
+        self.update_rpm(sensor_data['SD_MotorData_MotorRPM'])
+        self.update_lidar(sensor_data['LIDAR'], tube_length)
+
+    def std_dev(self):
+        return numpy.sqrt(numpy.diag(self.P))
+
+
+def _check():
+    """
+    Regression check for failed sensors: neither a dead RPM channel nor two dead IMUs
+    may pull the estimate to rest, and both must show up in bad_time().
+    """
+    def fly(seconds, accel, rpm, imu, status=None):
+        kf = PodKalman()
+        t = 0.0
+        v = 0.0
+        bad = {'IMU': 0.0, 'RPM': 0.0}
+        for i in range(int(seconds / kf.dt)):
+            t += kf.dt
+            v += accel(t) * G * kf.dt
+            z = imu(t, accel(t))
+            kf.step(kf.dt, t, {'IMU1_Z': z, 'IMU2_Z': z, 'LIDAR': 0.0,
+                               'SD_MotorData_MotorRPM': rpm(t, v) * 60 / kf.wheel_circum},
+                    status=status(t) if status else None)
+            bad['IMU'] = max(bad['IMU'], kf.bad_time('IMU1_Z', 'IMU2_Z'))
+            bad['RPM'] = max(bad['RPM'], kf.bad_time('RPM'))
+        return kf, v, bad
+
+    failures = []
+
+    # 1 g for 4 s, the RPM channel reading 0 after the first second
+    kf, v, bad = fly(4.0, lambda t: 1.0, lambda t, v: v if t < 1 else 0.0, lambda t, a: a)
+    print('dead RPM:   V %.1f ft/s (true %.1f)  V bad time %.2f s' % (kf.x[V], v, bad['RPM']))
+    if abs(kf.x[V] - v) > 0.05 * v:
+        failures.append('dead RPM pulled V to %.1f ft/s' % kf.x[V])
+    if bad['RPM'] < 2.5:
+        failures.append('dead RPM bad time only %.2f s' % bad['RPM'])
+
+    # 1 g for 4 s, both IMUs failing after the first second, with and without health flags
+    for flags in (None, lambda t: {'IMU1_Z': t < 1, 'IMU2_Z': t < 1}):
+        kf, v, bad = fly(4.0, lambda t: 1.0, lambda t, v: v, lambda t, a: a if t < 1 else 0.0, flags)
+        print('dead IMUs:  A %.2f g (true 1.00)  V %.1f ft/s (true %.1f)  IMU bad time %.2f s  (%s flags)' %
+              (kf.x[A], kf.x[V], v, bad['IMU'], 'with' if flags else 'no'))
+        if abs(kf.x[A] - 1.0) > 0.1 or abs(kf.x[V] - v) > 0.05 * v:
+            failures.append('dead IMUs pulled A to %.2f g' % kf.x[A])
+        if bad['IMU'] < 2.5:
+            failures.append('dead IMUs bad time only %.2f s' % bad['IMU'])
+
+    for failure in failures:
+        print('FAIL: ' + failure)
+    return not failures
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from time import perf_counter
+
+    parser = argparse.ArgumentParser(description='Replay pod logs through PodKalman')
+    parser.add_argument('logs', nargs='*')
+    parser.add_argument('--tube', type=float, default=4150, help='tube length [ft]')
+    parser.add_argument('--check', action='store_true', help='run the sensor failure regression check')
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if _check() else 1)
+    from log_replay import iter_log_frames
+
+    for name in args.logs:
+        kf = PodKalman()
+        timings = []
+        last_t = None
+        frames = 0
+        for t, frame in iter_log_frames(name):
+            data = {'IMU1_Z': frame.get('IMU1_Z', 0.0), 'IMU2_Z': frame.get('IMU2_Z', 0.0),
+                    'SD_MotorData_MotorRPM': frame.get('SD_MotorData_MotorRPM', 0.0),
+                    'LIDAR': frame.get('LIDAR', 0.0)}
+            dt = kf.dt if last_t is None else t - last_t
+            last_t = t
+            start = perf_counter()
+            kf.step(dt, t, data, args.tube, stationary=frame.get('state', 1) == 1)
+            timings.append(perf_counter() - start)
+            frames += 1
+        if not frames:
+            print(name + ': no frames')
+            continue
+        timings = numpy.array(timings) * 1e6
+        print(name)
+        print('\tframes: %d   update [us] mean %.1f  p99 %.1f  max %.1f' %
+              (frames, timings.mean(), numpy.percentile(timings, 99), timings.max()))
+        print('\tfinal D %.2f ft  V %.2f ft/s  A %.3f g   std %s' %
+              (kf.x[D], kf.x[V], kf.x[A], numpy.round(kf.std_dev(), 3)))
+        print('\trejected: ' + str(kf.reject_total))
@@ -0,0 +1,121 @@
+"""
+   HyperLynx: stripe_map.py
+
+   Purpose:
+   Correct the pod's dead reckoned position each time the SICK lasers pass a
+   tube stripe.
+
+   The stripe positions for the tube are held as a sorted array.  When the
+   Arduino's stripe counter (Hyperlynx_ECS.getStripeCount(), MICRO_ADDR) ticks,
+   the edge is timestamped halfway between the two polls that bracket it, the
+   dead reckoned position at that instant is binary searched in the map, and if
+   the nearest stripe ahead of the last matched one is inside the gate, it is
+   applied to the Kalman filter as an absolute position fix.
+
+   The Arduino sends its count as a single byte, so the counter wraps at 256;
+   only the difference between polls is used.
+
+   WhoToBlame:
+   HyperLynx controls team
+"""
+
+import numpy
+from state_estimator import D, V
+
+
+class StripeLocalizer():
+    def __init__(self, spacing=100, first=None, positions=None, stripe_var=1.0,
+                 gate=25, odometry_error=0.1, counter_bits=8):
+        self.spacing = spacing                  # [ft] distance between stripes
+        self.first = spacing if first is None else first   # [ft] first stripe from start
+        self.fixed_positions = positions        # explicit stripe map, overrides spacing
+        self.stripe_var = stripe_var            # [ft^2] variance of a stripe position
+        self.gate = gate                        # [ft] minimum match window around dead reckoning
+        self.odometry_error = odometry_error    # worst case dead reckoning error, fraction of distance
+        self.counter_mask = (1 << counter_bits) - 1
+
+        self.positions = numpy.zeros(0)
+        self.reset(0, 0, 0)
+
+    def build(self, tube_length):
+        """Precompute the sorted stripe positions for a tube of tube_length [ft]."""
+        if self.fixed_positions is not None:
+            self.positions = numpy.sort(numpy.asarray(self.fixed_positions, dtype=float))
+        elif tube_length > 0:
+            self.positions = numpy.arange(self.first, tube_length, self.spacing, dtype=float)
+        else:
+            self.positions = numpy.zeros(0)
+
+    def reset(self, tube_length, raw_count, now):
+        """Start of a run: rebuild the map and zero the count at the current counter value."""
+        self.build(tube_length)
+        self.last_raw = int(raw_count)
+        self.last_poll = now
+        self.count = 0                  # stripes counted this run
+        self.matched = 0                # stripes matched to the map
+        self.unmatched = 0              # stripes outside the gate
+        self.last_index = -1            # map index of the last matched stripe
+        self.last_position = 0.0        # [ft] position of the last matched stripe
+        self.last_edge_time = None
+        self.fix_distance = 0.0         # [ft] estimated position right after the last fix
+
+    def update(self, raw_count, now, est):
+        """
+        Process one poll of the stripe counter.  Applies a position fix to the
+        estimator est (state_estimator.PodKalman) when a new stripe matches the
+        map.  Returns True if a correction was applied.
+        """
+        raw_count = int(raw_count)
+        new = (raw_count - self.last_raw) & self.counter_mask
+        self.last_raw = raw_count
+        prev_poll, self.last_poll = self.last_poll, now
+        if new == 0:
+            return False
+
+        self.count += new
+        edge_time = 0.5 * (prev_poll + now)
+        self.last_edge_time = edge_time
+        lag = now - edge_time
+        speed = est.x[V]
+        d_edge = est.x[D] - speed * lag         # dead reckoned position at the edge
+
+        index = self.match(d_edge, numpy.sqrt(est.P[D, D]))
+        if index is None:
+            self.unmatched += new
+            return False
+
+        self.last_index = index
+        self.last_position = self.positions[index]
+        self.matched += 1
+        # Edge time is only known to within the poll interval
+        var = self.stripe_var + (speed * lag) ** 2 / 3
+        est.update_position(self.last_position + speed * lag, var, 'stripe', force=True)
+        self.fix_distance = est.x[D]
+        return True
+
+    def match(self, d, sigma):
+        """Map index of the stripe nearest d, ahead of the last match, or None if outside the gate."""
+        i = int(numpy.searchsorted(self.positions, d))
+        best = None
+        for j in (i - 1, i):
+            if self.last_index < j < len(self.positions):
+                if best is None or abs(self.positions[j] - d) < abs(self.positions[best] - d):
+                    best = j
+        if best is None or abs(self.positions[best] - d) > max(self.gate, 3 * sigma):
+            return None
+        return best
+
+    def next_stripe(self):
+        """[ft] position of the next stripe expected, or None past the last one."""
+        if self.last_index + 1 < len(self.positions):
+            return self.positions[self.last_index + 1]
+        return None
+
+    def error_bound(self, est):
+        """
+        [ft] bound on the position error: the larger of the filter's 3 sigma and
+        the stripe accuracy plus the worst case odometry error since the last fix.
+        """
+        odometry = 3 * numpy.sqrt(self.stripe_var) + \
+            self.odometry_error * abs(est.x[D] - self.fix_distance)
+        return max(3 * numpy.sqrt(est.P[D, D]), odometry)
@@ -1,12 +1,13 @@
-# stores timeouts for each state
+# stores timeouts [s] for each state, see SDA.build_fsm()
 
 
-def get(self):
-    self.timeouts[0] = 60
-    self.timeouts[1] = 3600
-    self.timeouts[2] = 15
-    self.timeouts[3] = 60
-    self.timeouts[5] = 30
-    self.timeouts[6] = 180
-    self.timeouts[7] = 30
-    return self.timeouts
\ No newline at end of file
+def get():
+    timeouts = {}
+    timeouts[0] = 60
+    timeouts[1] = 3600
+    timeouts[2] = 15
+    timeouts[3] = 60
+    timeouts[5] = 30
+    timeouts[6] = 180
+    timeouts[7] = 30
+    return timeouts